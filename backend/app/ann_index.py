@@ -0,0 +1,138 @@
+import math
+from typing import Dict
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# Changed or removed documents force a full rebuild unless the index compacts on removal the
+# way LangChain's FAISS.delete assumes: HNSW graphs can't drop vectors, and IVF remove_ids keeps
+# the remaining ids, so later additions would reuse ids still mapped to other chunks
+SUPPORTS_REMOVAL = {"flat": True, "ivf_flat": False, "hnsw": False, "ivf_pq": False}
+
+# k-means wants ~39 points per centroid; sampling beyond this only slows training down
+TRAIN_POINTS_PER_CENTROID = 64
+
+
+def index_params(config) -> Dict:
+    """The index settings recorded in the manifest; changing any of them forces a rebuild"""
+    index_type = config.INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown INDEX_TYPE {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+
+    params = {"type": index_type}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        params["nlist"] = config.INDEX_NLIST
+    if index_type == "ivf_pq":
+        params["pq_m"] = config.INDEX_PQ_M
+        params["pq_bits"] = config.INDEX_PQ_BITS
+    if index_type == "hnsw":
+        params["hnsw_m"] = config.INDEX_HNSW_M
+        params["ef_construction"] = config.INDEX_HNSW_EF_CONSTRUCTION
+    return params
+
+
+def _nlist(config, count: int) -> int:
+    if config.INDEX_NLIST:
+        return config.INDEX_NLIST
+    # Rule of thumb: ~4*sqrt(n) lists, but never fewer than 39 training points per list
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def _training_sample(vectors: np.ndarray, size: int) -> np.ndarray:
+    if len(vectors) <= size:
+        return vectors
+    rows = np.random.default_rng(0).choice(len(vectors), size=size, replace=False)
+    return vectors[np.sort(rows)]
+
+
+def build_index(vectors: np.ndarray, config):
+    """Build the configured FAISS index over ``vectors``, keeping their order (and so the docstore ids).
+
+    Corpora too small to train the requested quantizers fall back to exact flat search.
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    index_type = config.INDEX_TYPE
+
+    if index_type == "ivf_pq":
+        if dim % config.INDEX_PQ_M:
+            raise ValueError(f"INDEX_PQ_M={config.INDEX_PQ_M} must divide the embedding dimension {dim}")
+        if count < 2 ** config.INDEX_PQ_BITS:
+            logger.warning(f"{count} vectors are too few to train IVF-PQ codebooks, using a flat index")
+            index_type = "flat"
+    if index_type in ("ivf_flat", "ivf_pq") and count < 39:
+        logger.warning(f"{count} vectors are too few to train IVF centroids, using a flat index")
+        index_type = "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.INDEX_HNSW_M)
+        index.hnsw.efConstruction = config.INDEX_HNSW_EF_CONSTRUCTION
+    else:
+        nlist = _nlist(config, count)
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+            sample = nlist * TRAIN_POINTS_PER_CENTROID
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, config.INDEX_PQ_M, config.INDEX_PQ_BITS)
+            sample = max(nlist, 2 ** config.INDEX_PQ_BITS) * TRAIN_POINTS_PER_CENTROID
+        index.train(_training_sample(vectors, sample))
+
+    index.add(vectors)
+    configure_search(index, config)
+    logger.info(f"Built {index_type} index over {count} vectors")
+    return index
+
+
+def built_index_type(index) -> str:
+    """The INDEX_TYPE an index actually is (small corpora fall back to flat whatever was asked for)"""
+    import faiss
+
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexHNSWFlat):
+        return "hnsw"
+    return "flat"
+
+
+def read_index_mapped(path: str):
+    """Read a saved index for serving with its vectors memory-mapped, not copied onto the heap.
+
+    Processes serving the same file then share its pages through the page cache. Plain
+    IO_FLAG_MMAP only maps IVF inverted lists, so flat and HNSW indexes need IO_FLAG_MMAP_IFC;
+    older faiss builds without it read those two types into memory.
+    """
+    import faiss
+
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if mmap_flag is None:
+        logger.warning("This faiss build can't memory-map flat or HNSW indexes; each process keeps its own copy")
+        mmap_flag = faiss.IO_FLAG_MMAP
+    return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+
+
+def configure_search(index, config):
+    """Apply query-time parameters (IVF nprobe, HNSW efSearch); these aren't stored in the index file"""
+    import faiss
+
+    params = faiss.ParameterSpace()
+    if "IVF" in type(index).__name__:
+        params.set_index_parameter(index, "nprobe", config.INDEX_NPROBE)
+    elif "HNSW" in type(index).__name__:
+        params.set_index_parameter(index, "efSearch", config.INDEX_HNSW_EF_SEARCH)
+
+
+def index_vectors(index) -> np.ndarray:
+    """All vectors of a flat index, in id order"""
+    return index.reconstruct_n(0, index.ntotal)
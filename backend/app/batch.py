@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.models import BatchReportResult
+from app.pdf_processor import PDFProcessor
+from app.knowledge import load_documents
+from app.lexical import KnowledgeLookup
+from app.rag_pipeline import create_pipeline, template_explanation
+from app.report_analyzer import ReportAnalyzer, detect_age, timed
+from app.value_analyzer import ValueAnalyzer
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchTooLarge(ValueError):
+    """Raised when a batch has more reports, or its archives expand to more bytes, than allowed"""
+
+
+_worker_analyzer: Optional[ReportAnalyzer] = None
+
+
+def _extract_report(pdf_path: str, tables: bool = True) -> Dict:
+    """Extraction and value analysis for one report (runs inside a worker process)"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        # One page worker per process: the batch pool already parallelizes across reports
+        _worker_analyzer = ReportAnalyzer(PDFProcessor(page_workers=1, tables=tables), ValueAnalyzer(), None)
+
+    timings = {}
+    try:
+        with timed(timings, "extraction"):
+            cleaned_text, gender, terms_data = _worker_analyzer.extract(pdf_path)
+        with timed(timings, "value_analysis"):
+            statuses = _worker_analyzer.analyze_values(terms_data, gender, detect_age(cleaned_text))
+    except Exception as e:
+        return {'path': pdf_path, 'error': str(e), 'timings': timings}
+
+    return {
+        'path': pdf_path,
+        'cleaned_text': cleaned_text,
+        'terms_data': terms_data,
+        'statuses': statuses,
+        'timings': timings,
+    }
+
+
+def collect_pdfs(inputs: List[str], extract_dir: str, max_reports: int = 0, max_extracted_bytes: int = 0) -> List[str]:
+    """Expand directories and zip archives in ``inputs`` into a flat list of PDF paths.
+
+    Raises BatchTooLarge past ``max_reports`` PDFs, or when the archives together would
+    extract to more than ``max_extracted_bytes`` (0 = no limit).
+    """
+    pdfs = []
+    extracted_bytes = 0
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                pdfs.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith('.pdf'))
+        elif zipfile.is_zipfile(path):
+            members, size = zip_pdf_members(path)
+            extracted_bytes += size
+            if max_extracted_bytes and extracted_bytes > max_extracted_bytes:
+                raise BatchTooLarge(f"Archives expand to more than {max_extracted_bytes} bytes")
+            if max_reports and len(pdfs) + len(members) > max_reports:
+                raise BatchTooLarge(f"Batch has more than {max_reports} reports")
+            pdfs.extend(extract_zip(path, extract_dir, members))
+        elif path.lower().endswith('.pdf'):
+            pdfs.append(path)
+        else:
+            logger.warning(f"Skipping {path}: not a PDF, directory or zip archive")
+        if max_reports and len(pdfs) > max_reports:
+            raise BatchTooLarge(f"Batch has more than {max_reports} reports")
+    return pdfs
+
+
+def zip_pdf_members(zip_path: str) -> Tuple[List[zipfile.ZipInfo], int]:
+    """The PDF members of an archive and their total uncompressed size, read from its directory"""
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir() and info.filename.lower().endswith('.pdf')]
+    return members, sum(info.file_size for info in members)
+
+
+def extract_zip(zip_path: str, extract_dir: str, members: Optional[List[zipfile.ZipInfo]] = None) -> List[str]:
+    """Extract the PDF members (default: all of them); zipfile stops each at its declared size"""
+    if members is None:
+        members, _ = zip_pdf_members(zip_path)
+    pdfs = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for index, info in enumerate(members):
+            # Flatten member names so archives can't write outside extract_dir
+            target = os.path.join(extract_dir, f"{index}_{os.path.basename(info.filename)}")
+            with archive.open(info) as src, open(target, 'wb') as dst:
+                while chunk := src.read(1024 * 1024):
+                    dst.write(chunk)
+            pdfs.append(target)
+    return pdfs
+
+
+class BatchRunner:
+    """Analyze many reports: extraction on a process pool, one deduplicated explanation pass"""
+
+    def __init__(self, analyzer: ReportAnalyzer, workers: int = 0, tables: bool = True, lookup: Optional[KnowledgeLookup] = None):
+        self.analyzer = analyzer
+        self.workers = workers or os.cpu_count() or 1
+        self.tables = tables
+        # Knowledge sections for template explanations when there is no RAG pipeline
+        self.lookup = lookup
+        self._pool = None
+
+    def _extraction_pool(self) -> ProcessPoolExecutor:
+        """One pool for all batches, started from a forkserver rather than by forking the threaded API process"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def run(
+        self,
+        pdf_paths: List[str],
+        names: Optional[List[str]] = None,
+        explain: bool = True,
+        summarize: bool = True
+    ) -> List[BatchReportResult]:
+        names = names or [os.path.basename(path) for path in pdf_paths]
+        if not pdf_paths:
+            return []
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pool = self._extraction_pool()
+        try:
+            extracted = await asyncio.gather(*(
+                loop.run_in_executor(pool, _extract_report, path, self.tables) for path in pdf_paths
+            ))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for the next batch
+            self._pool = None
+            pool.shutdown(wait=False)
+            raise
+        logger.info(f"Extracted {len(pdf_paths)} reports in {time.perf_counter() - start:.2f}s")
+
+        all_terms = [term_data for report in extracted if 'error' not in report for term_data in report['terms_data']]
+        explain_timings = {}
+        with timed(explain_timings, "explanations"):
+            if explain:
+                explanations = await self.analyzer.rag_pipeline.aexplain_terms(all_terms)
+            else:
+                rag_pipeline = self.analyzer.rag_pipeline
+                lookup = rag_pipeline.lookup if rag_pipeline else self.lookup
+                explanations = {
+                    term_data['term']: template_explanation(lookup, term_data['term'])
+                    for term_data in all_terms
+                }
+        logger.info(
+            f"Explained {len(explanations)} distinct terms for {len(all_terms)} term occurrences "
+            f"in {explain_timings['explanations']:.2f}s"
+        )
+
+        async def finish(name: str, report: Dict) -> BatchReportResult:
+            timings = dict(report['timings'])
+            if 'error' in report:
+                return BatchReportResult(filename=name, error=report['error'], stage_timings=timings)
+            try:
+                analysis = await self.analyzer.finish(
+                    report['cleaned_text'],
+                    report['terms_data'],
+                    report['statuses'],
+                    explanations,
+                    timings,
+                    summarize=summarize
+                )
+                return BatchReportResult(filename=name, analysis=analysis, stage_timings=timings)
+            except Exception as e:
+                logger.error(f"Batch report {name} failed: {e}")
+                return BatchReportResult(filename=name, error=str(e), stage_timings=timings)
+
+        return await asyncio.gather(*(finish(name, report) for name, report in zip(names, extracted)))
+
+
+def write_results(results: List[BatchReportResult], output_path: str):
+    """Write one row per report as JSONL, or Parquet when the path ends in .parquet"""
+    if output_path.endswith('.parquet'):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise RuntimeError("Writing Parquet requires pandas and pyarrow: pip install pandas pyarrow")
+        rows = [
+            {**result.model_dump(exclude={'analysis', 'stage_timings'}),
+             'stage_timings': json.dumps(result.stage_timings),
+             'analysis': result.analysis.model_dump_json() if result.analysis else None}
+            for result in results
+        ]
+        pd.DataFrame(rows).to_parquet(output_path, index=False)
+        return
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(result.model_dump_json() + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a batch of PDF lab reports")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or zip archives")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="Output .jsonl or .parquet file")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--no-summary", action="store_true", help="Use the template summary instead of the LLM")
+    parser.add_argument("--no-llm", action="store_true", help="Skip all LLM calls (template explanations and summary)")
+    args = parser.parse_args()
+
+    from app.config import get_settings
+
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    rag_pipeline = None if args.no_llm else create_pipeline(settings)
+    lookup = None
+    if rag_pipeline is None:
+        lookup = KnowledgeLookup.from_documents(load_documents(settings.KNOWLEDGE_PATH), PDFProcessor.MEDICAL_PATTERNS)
+    analyzer = ReportAnalyzer(None, None, rag_pipeline)
+    runner = BatchRunner(analyzer, workers=args.workers, tables=settings.PDF_TABLE_EXTRACTION, lookup=lookup)
+
+    with tempfile.TemporaryDirectory(prefix="report_batch_") as extract_dir:
+        pdfs = collect_pdfs(args.inputs, extract_dir)
+        logger.info(f"Analyzing {len(pdfs)} reports with {runner.workers} workers")
+        start = time.perf_counter()
+        try:
+            results = asyncio.run(runner.run(
+                pdfs,
+                explain=not args.no_llm,
+                summarize=not (args.no_llm or args.no_summary)
+            ))
+        finally:
+            runner.close()
+
+    write_results(results, args.output)
+    failed = sum(1 for result in results if result.error)
+    logger.info(
+        f"Wrote {len(results)} results ({failed} failed) to {args.output} "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
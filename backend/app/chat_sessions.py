@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+ChatTurns = List[Tuple[str, str]]
+
+
+def turns_from_messages(messages: List[Dict[str, str]]) -> ChatTurns:
+    """Pair ``{"role": "user"|"assistant", "content": ...}`` messages into (question, answer) turns"""
+    turns = []
+    question = None
+    for message in messages:
+        role = message.get("role")
+        content = message.get("content", "")
+        if role == "user":
+            question = content
+        elif role == "assistant" and question is not None:
+            turns.append((question, content))
+            question = None
+    return turns
+
+
+class ChatSessionStore:
+    """Per-session chat history with a bounded turn window and LRU eviction of idle sessions"""
+
+    def __init__(self, max_sessions: int = 1000, window_turns: int = 6, idle_ttl: int = 1800):
+        self.max_sessions = max_sessions
+        self.window_turns = window_turns
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, Tuple[float, ChatTurns]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def history(self, session_id: Optional[str]) -> ChatTurns:
+        if not session_id:
+            return []
+        with self._lock:
+            self._evict_idle()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            self._sessions[session_id] = (time.monotonic(), entry[1])
+            self._sessions.move_to_end(session_id)
+            return list(entry[1])
+
+    def append(self, session_id: Optional[str], question: str, answer: str):
+        if not session_id:
+            return
+        with self._lock:
+            _, turns = self._sessions.pop(session_id, (0.0, []))
+            turns = self.window(turns + [(question, answer)])
+            self._sessions[session_id] = (time.monotonic(), turns)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def window(self, turns: ChatTurns) -> ChatTurns:
+        return turns[-self.window_turns:] if self.window_turns else []
+
+    def _evict_idle(self):
+        if not self.idle_ttl:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SqliteChatSessionStore(ChatSessionStore):
+    """ChatSessionStore kept in a SQLite file, so a session's history follows it across worker processes"""
+
+    def __init__(self, path: str, max_sessions: int = 1000, window_turns: int = 6, idle_ttl: int = 1800):
+        super().__init__(max_sessions=max_sessions, window_turns=window_turns, idle_ttl=idle_ttl)
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL,
+                turns TEXT NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def history(self, session_id: Optional[str]) -> ChatTurns:
+        if not session_id:
+            return []
+        with self._lock:
+            self._evict_idle()
+            row = self._conn.execute(
+                "SELECT turns FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                self._conn.commit()
+                return []
+            self._conn.execute(
+                "UPDATE chat_sessions SET last_used = ? WHERE session_id = ?", (time.time(), session_id)
+            )
+            self._conn.commit()
+        return [tuple(turn) for turn in json.loads(row[0])]
+
+    def append(self, session_id: Optional[str], question: str, answer: str):
+        if not session_id:
+            return
+        with self._lock:
+            # BEGIN IMMEDIATE: another worker may be appending to the same session
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT turns FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            turns = [tuple(turn) for turn in json.loads(row[0])] if row else []
+            turns = self.window(turns + [(question, answer)])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, last_used, turns) VALUES (?, ?, ?)",
+                (session_id, time.time(), json.dumps(turns))
+            )
+            if self.max_sessions:
+                self._conn.execute(
+                    """DELETE FROM chat_sessions WHERE rowid IN (
+                        SELECT rowid FROM chat_sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_sessions,)
+                )
+            self._conn.commit()
+
+    def _evict_idle(self):
+        if self.idle_ttl:
+            self._conn.execute("DELETE FROM chat_sessions WHERE last_used < ?", (time.time() - self.idle_ttl,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
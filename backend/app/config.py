@@ -8,17 +8,125 @@ class Settings(BaseSettings):
     DEBUG: bool = True
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    # Worker processes for python -m app.serve (0 = one per CPU)
+    WEB_WORKERS: int = 0
     
 
+    LAZY_STARTUP: bool = True
+    KNOWLEDGE_PATH: str = "data/medical_knowledge.txt"
+    VECTOR_DB_PATH: str = "vector_db/medical_knowledge"
+    # Seconds between checks for an index published by another process (0 disables)
+    INDEX_RELOAD_INTERVAL: float = 30
+
+    # "flat" (exact), "ivf_flat", "hnsw" or "ivf_pq"; small corpora always fall back to flat
+    INDEX_TYPE: str = "flat"
+    INDEX_NLIST: int = 0  # IVF lists, 0 = about 4*sqrt(vectors)
+    INDEX_NPROBE: int = 16
+    INDEX_PQ_M: int = 48  # must divide the embedding dimension
+    INDEX_PQ_BITS: int = 8
+    INDEX_HNSW_M: int = 32
+    INDEX_HNSW_EF_CONSTRUCTION: int = 200
+    INDEX_HNSW_EF_SEARCH: int = 64
+
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # "huggingface" (PyTorch) or "onnx" (ONNX Runtime; set EMBEDDING_ONNX_FILE to an int8 export to quantize)
+    EMBEDDING_BACKEND: str = "huggingface"
+    EMBEDDING_ONNX_FILE: str = "onnx/model.onnx"
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_THREADS: int = 0
+    # Unix socket of a shared embedding server (python -m app.embedding_server); when set, this
+    # process embeds through it instead of loading the model itself
+    EMBEDDING_SERVER_SOCKET: str = ""
+    # Server side: how long to wait for concurrent requests to join a batch, and the batch size cap
+    EMBEDDING_SERVER_BATCH_WAIT: float = 0.005
+    EMBEDDING_SERVER_MAX_BATCH: int = 256
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 50
     TOP_K_RESULTS: int = 5
+    # "hybrid": analyte sections and BM25 alongside vector search; "dense": vector search only
+    RETRIEVAL_MODE: str = "hybrid"
     
   
-    LLM_MODEL: str = "gpt-3.5-turbo"
+    # "gemini", "fake" (deterministic offline stand-in), "ollama", "llamacpp" or "openai" (any OpenAI-compatible server)
+    LLM_PROVIDER: str = "gemini"
+    LLM_MODEL: str = "gemini-2.0-flash-lite"  # a GGUF file path for llamacpp
+    LLM_BASE_URL: str = ""
+    # Fake provider timing: seconds to the first token, then tokens per second (0 = instant)
+    LLM_FAKE_LATENCY: float = 0.0
+    LLM_FAKE_TOKENS_PER_SECOND: float = 0.0
+    LLM_FAKE_ANSWER_WORDS: int = 40
+    # "record" saves responses to LLM_CASSETTE_PATH, "replay" answers only from it (offline)
+    LLM_CASSETTE_MODE: str = ""
+    LLM_CASSETTE_PATH: str = "cache/llm_cassette.jsonl"
     TEMPERATURE: float = 0.3
     MAX_TOKENS: int = 500
+    EXPLAIN_BATCH_SIZE: int = 20
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_MAX_ENTRIES: int = 20000
+    QUERY_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # Set to e.g. "cache/query_cache.pkl" to keep the cache across restarts
+    QUERY_CACHE_PATH: str = ""
+
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 256
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_CHECK_INTERVAL: int = 30
+
+    CHAT_HISTORY_TURNS: int = 6
+    CHAT_MAX_SESSIONS: int = 1000
+    CHAT_SESSION_TTL: int = 1800
+
+    MAX_CONCURRENT_LLM_CALLS: int = 4
+    MAX_PENDING_LLM_CALLS: int = 32
+    # "llm", "fast" (template explanations and summary, no LLM calls) or "auto" (fast while the
+    # LLM is backed up); a request can override it with ?mode=
+    ANALYSIS_MODE: str = "auto"
+    # Auto mode switches to templates once this many LLM calls are waiting (0 = only when saturated)
+    AUTO_FAST_PENDING_LLM_CALLS: int = 16
+    # Seconds one LLM call may take (time to first token for streams; 0 = no limit)
+    LLM_TIMEOUT: float = 30
+    # Retries after a failed or timed-out call, with full-jitter exponential backoff
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE: float = 0.5
+    LLM_BACKOFF_MAX: float = 8
+    # Consecutive failures that open the circuit (calls then fall back to templates; 0 disables)
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30
+    # Send a duplicate request when a call hasn't answered after this many seconds (0 = no hedging)
+    LLM_HEDGE_DELAY: float = 0
+    # Seconds for all LLM calls of one /upload-report; terms still unexplained then get templates (0 = no limit)
+    UPLOAD_BUDGET_SECONDS: float = 60
+
+    METRICS_ENABLED: bool = True
+    # Also emit stage spans through OpenTelemetry (configure the SDK/exporter, e.g. opentelemetry-instrument)
+    OTEL_TRACES_ENABLED: bool = False
+
+    UPLOAD_MAX_BYTES: int = 20 * 1024 * 1024
+    # Uploads up to this size are analyzed straight from memory; larger ones spill to a temp file
+    UPLOAD_SPILL_BYTES: int = 8 * 1024 * 1024
+    UPLOAD_SPILL_DIR: str = ""  # default: /dev/shm when writable, else the system temp dir
+
+    PDF_PAGE_WORKERS: int = 0
+    PDF_PARALLEL_MIN_PAGES: int = 4
+    PDF_TABLE_EXTRACTION: bool = True
+
+    BATCH_WORKERS: int = 0
+    # Whole /batch-upload request body, and what its zip archives may expand to (0 = no limit)
+    BATCH_UPLOAD_MAX_BYTES: int = 200 * 1024 * 1024
+    BATCH_MAX_REPORTS: int = 500
+    BATCH_MAX_EXTRACTED_BYTES: int = 1024 * 1024 * 1024
+
+    JOB_WORKERS: int = 2
+    JOB_MAX_QUEUED: int = 100
+    JOB_RESULT_TTL: int = 3600
+    # Directory for job records and chat sessions shared by all worker processes (python -m app.serve
+    # sets one when running several workers); empty keeps them in each process's memory
+    SHARED_STATE_DIR: str = ""
+
+    EXPLANATION_CACHE_ENABLED: bool = True
+    EXPLANATION_CACHE_PATH: str = "cache/explanations.sqlite"
+    EXPLANATION_CACHE_TTL: int = 30 * 24 * 3600
+    EXPLANATION_CACHE_MAX_ENTRIES: int = 5000
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+from typing import List, Tuple
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.embeddings import create_local_embeddings
+
+
+logger = logging.getLogger(__name__)
+
+# Request: 4-byte length + JSON {"texts": [...]}. Response: rows and dim (int32, uint32) then
+# rows*dim little-endian float32; rows = -1 means an error whose message (dim bytes) follows
+REQUEST_HEADER = struct.Struct(">I")
+RESPONSE_HEADER = struct.Struct(">iI")
+
+
+def _recv_exactly(conn: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = conn.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("Embedding server closed the connection")
+        received += count
+    return bytes(buffer)
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by a shared EmbeddingServer over its Unix socket.
+
+    Each thread keeps its own connection, reopened once if the server went away.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            try:
+                conn.connect(self.socket_path)
+            except OSError:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _request(self, payload: bytes) -> Tuple[int, int, bytes]:
+        conn = self._connection()
+        try:
+            conn.sendall(REQUEST_HEADER.pack(len(payload)) + payload)
+            rows, size = RESPONSE_HEADER.unpack(_recv_exactly(conn, RESPONSE_HEADER.size))
+            body = _recv_exactly(conn, size if rows < 0 else rows * size * 4)
+        except OSError:
+            # A partial exchange leaves the stream out of step: never reuse the connection
+            conn.close()
+            self._local.conn = None
+            raise
+        return rows, size, body
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        payload = json.dumps({"texts": texts}).encode("utf-8")
+        try:
+            rows, size, body = self._request(payload)
+        except ConnectionError:
+            # The server restarted since this connection was opened
+            rows, size, body = self._request(payload)
+        if rows < 0:
+            raise RuntimeError(f"Embedding server error: {body.decode('utf-8', 'replace')}")
+        return np.frombuffer(body, dtype="<f4").reshape(rows, size)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+class EmbeddingServer:
+    """Serves one embedding model to every API worker on the node over a Unix socket.
+
+    Requests arriving within ``batch_wait`` seconds of each other are embedded in one model
+    call (up to about ``max_batch`` texts), so concurrent workers share batches instead of
+    each holding a copy of the model.
+    """
+
+    def __init__(self, embeddings: Embeddings, socket_path: str, batch_wait: float = 0.005, max_batch: int = 256):
+        self.embeddings = embeddings
+        self.socket_path = socket_path
+        self.batch_wait = batch_wait
+        self.max_batch = max(1, max_batch)
+        self.requests = 0
+        self.batches = 0
+        self._queue = None
+
+    async def serve(self):
+        self._queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        batcher = asyncio.create_task(self._batch_loop())
+        logger.info(f"Embedding server listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(REQUEST_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                payload = await reader.readexactly(REQUEST_HEADER.unpack(header)[0])
+                future = loop.create_future()
+                try:
+                    texts = json.loads(payload)["texts"]
+                    await self._queue.put((texts, future))
+                    vectors = await future
+                    writer.write(RESPONSE_HEADER.pack(*vectors.shape) + vectors.astype("<f4").tobytes())
+                except Exception as e:
+                    message = str(e).encode("utf-8")
+                    writer.write(RESPONSE_HEADER.pack(-1, len(message)) + message)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.batch_wait
+            while size < self.max_batch:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await asyncio.to_thread(self._encode, texts)
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.requests += len(batch)
+            self.batches += 1
+            start = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(item_texts)])
+                start += len(item_texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        encode = getattr(self.embeddings, "encode", None)
+        if encode is not None:
+            return np.asarray(encode(texts), dtype=np.float32)
+        return np.array(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def main():
+    import argparse
+    from app.config import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Serve the embedding model to API workers over a Unix socket")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SERVER_SOCKET, help="Socket path (default: EMBEDDING_SERVER_SOCKET)")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("no socket path: pass --socket or set EMBEDDING_SERVER_SOCKET")
+
+    logging.basicConfig(level=logging.INFO)
+    server = EmbeddingServer(
+        create_local_embeddings(settings),
+        args.socket,
+        batch_wait=settings.EMBEDDING_SERVER_BATCH_WAIT,
+        max_batch=settings.EMBEDDING_SERVER_MAX_BATCH
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
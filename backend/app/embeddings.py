@@ -0,0 +1,173 @@
+import json
+import os
+from typing import List, Optional
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("huggingface", "onnx")
+
+# fp32 exports reproduce the PyTorch vectors, so they can share an index with the huggingface backend
+FP32_ONNX_FILES = ("onnx/model.onnx",)
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence-transformers embeddings run through ONNX Runtime instead of PyTorch.
+
+    ``model_name`` is a local directory or a Hugging Face repo that ships an ONNX export
+    (all-MiniLM-L6-v2 includes fp32 ``onnx/model.onnx`` and int8 files such as
+    ``onnx/model_qint8_avx512.onnx``). Token embeddings are mean-pooled and L2-normalized,
+    matching the sentence-transformers pipeline for MiniLM models.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        onnx_file: str = "onnx/model.onnx",
+        batch_size: int = 32,
+        threads: int = 0
+    ):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise RuntimeError(
+                "The onnx embedding backend requires onnxruntime and tokenizers: "
+                "pip install onnxruntime tokenizers huggingface_hub"
+            )
+
+        model_dir = self._model_dir(model_name, onnx_file)
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self._max_length(model_dir))
+        pad_id = self.tokenizer.token_to_id("[PAD]")
+        self.tokenizer.enable_padding(pad_id=pad_id or 0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, onnx_file),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        output_names = [output.name for output in self.session.get_outputs()]
+        self.output_name = "last_hidden_state" if "last_hidden_state" in output_names else output_names[0]
+        logger.info(f"Loaded ONNX embedding model {model_name} ({onnx_file})")
+
+    @staticmethod
+    def _model_dir(model_name: str, onnx_file: str) -> str:
+        if os.path.isdir(model_name):
+            return model_name
+        from huggingface_hub import snapshot_download
+        return snapshot_download(
+            model_name,
+            allow_patterns=[onnx_file, "tokenizer.json", "sentence_bert_config.json"]
+        )
+
+    @staticmethod
+    def _max_length(model_dir: str) -> int:
+        config_path = os.path.join(model_dir, "sentence_bert_config.json")
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                return json.load(f).get("max_seq_length", 256)
+        return 256
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": mask,
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+        hidden = self.session.run([self.output_name], feeds)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in batches, grouping similar lengths together to minimize padding"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                vectors[i] = vector
+        return np.vstack(vectors).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+def create_embeddings(config, backend: Optional[str] = None) -> Embeddings:
+    """The embedding model selected by ``EMBEDDING_BACKEND``, or a client of the shared
+    embedding server when ``EMBEDDING_SERVER_SOCKET`` is set (the server runs the same backend)"""
+    if config.EMBEDDING_SERVER_SOCKET and backend is None:
+        from app.embedding_server import RemoteEmbeddings
+
+        return RemoteEmbeddings(config.EMBEDDING_SERVER_SOCKET)
+    return create_local_embeddings(config, backend)
+
+
+def create_local_embeddings(config, backend: Optional[str] = None) -> Embeddings:
+    """Load the embedding model selected by ``EMBEDDING_BACKEND`` into this process"""
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend == "huggingface":
+        from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=config.EMBEDDING_MODEL,
+            encode_kwargs={"batch_size": config.EMBEDDING_BATCH_SIZE}
+        )
+    if backend == "onnx":
+        return OnnxEmbeddings(
+            config.EMBEDDING_MODEL,
+            onnx_file=config.EMBEDDING_ONNX_FILE,
+            batch_size=config.EMBEDDING_BATCH_SIZE,
+            threads=config.EMBEDDING_THREADS
+        )
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+
+def embedding_id(config, backend: Optional[str] = None) -> str:
+    """Identify the vector space an index was built in, so quantized models trigger a rebuild"""
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend == "onnx" and config.EMBEDDING_ONNX_FILE not in FP32_ONNX_FILES:
+        return f"{config.EMBEDDING_MODEL}#{config.EMBEDDING_ONNX_FILE}"
+    return config.EMBEDDING_MODEL
+
+
+def quantize_model(model_dir: str, onnx_file: str = "onnx/model.onnx", output_file: str = "onnx/model_int8.onnx") -> str:
+    """Write a dynamically int8-quantized copy of an ONNX export (needs the onnx package)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = os.path.join(model_dir, output_file)
+    quantize_dynamic(os.path.join(model_dir, onnx_file), output_path, weight_type=QuantType.QInt8)
+    return output_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Quantize an ONNX sentence-transformers export to int8")
+    parser.add_argument("model_dir", help="Directory containing the ONNX export and tokenizer.json")
+    parser.add_argument("--input", default="onnx/model.onnx", help="fp32 model, relative to model_dir")
+    parser.add_argument("--output", default="onnx/model_int8.onnx", help="Quantized model, relative to model_dir")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Wrote {quantize_model(args.model_dir, args.input, args.output)}")
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExplanationCache:
+    """Disk-backed cache of generic term explanations, keyed by term and prompt/model version.
+
+    Several worker processes may share the file. Reads only write back an access time once it
+    is ``TOUCH_INTERVAL`` old, and a locked or failing database counts as a miss.
+    """
+
+    # Seconds before a hit refreshes the row's access time (for LRU eviction) again
+    TOUCH_INTERVAL = 3600
+
+    def __init__(self, path: str, version: str, ttl_seconds: int = 0, max_entries: int = 0):
+        self.path = path
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets readers in other workers carry on while one of them writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS explanations (
+                term TEXT NOT NULL,
+                version TEXT NOT NULL,
+                explanation TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (term, version)
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def canonical(term: str) -> str:
+        return " ".join(term.split()).lower()
+
+    def get(self, term: str) -> Optional[str]:
+        return self.get_many([term]).get(term)
+
+    def get_many(self, terms: Iterable[str]) -> Dict[str, str]:
+        """Return cached explanations for whichever of ``terms`` are present and fresh"""
+        terms = list(terms)
+        if not terms:
+            return {}
+
+        keys = {self.canonical(term): term for term in terms}
+        now = time.time()
+        placeholders = ",".join("?" for _ in keys)
+
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    f"SELECT term, explanation, created_at, accessed_at FROM explanations "
+                    f"WHERE version = ? AND term IN ({placeholders})",
+                    [self.version, *keys]
+                ).fetchall()
+
+                found = {}
+                expired = []
+                stale_access = []
+                for key, explanation, created_at, accessed_at in rows:
+                    if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                        expired.append(key)
+                    else:
+                        found[keys[key]] = explanation
+                        if now - accessed_at > self.TOUCH_INTERVAL:
+                            stale_access.append(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Explanation cache read failed, treating as a miss: {e}")
+                found, expired, stale_access = {}, [], []
+
+            # Only take the write lock when there is something to write; if another worker
+            # holds it, the hits still count and the bookkeeping waits for a later read
+            if expired or stale_access:
+                try:
+                    self._conn.executemany(
+                        "DELETE FROM explanations WHERE term = ? AND version = ?",
+                        [(key, self.version) for key in expired]
+                    )
+                    self._conn.executemany(
+                        "UPDATE explanations SET accessed_at = ? WHERE term = ? AND version = ?",
+                        [(now, key, self.version) for key in stale_access]
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    self._conn.rollback()
+                    logger.warning(f"Explanation cache bookkeeping skipped: {e}")
+
+            self.hits += len(found)
+            self.misses += len(terms) - len(found)
+
+        return found
+
+    def set(self, term: str, explanation: str):
+        self.set_many({term: explanation})
+
+    def set_many(self, explanations: Dict[str, str]):
+        if not explanations:
+            return
+
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO explanations (term, version, explanation, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(self.canonical(term), self.version, text, now, now) for term, text in explanations.items()]
+                )
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # The explanations were still generated; they just won't be reused
+                self._conn.rollback()
+                logger.warning(f"Explanation cache write failed: {e}")
+
+    def _evict(self):
+        """Drop stale versions, expired rows and the least recently used overflow"""
+        self._conn.execute("DELETE FROM explanations WHERE version != ?", (self.version,))
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM explanations WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+        if self.max_entries:
+            self._conn.execute(
+                """DELETE FROM explanations WHERE rowid IN (
+                    SELECT rowid FROM explanations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM explanations")
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute(
+                "SELECT COUNT(*) FROM explanations WHERE version = ?", (self.version,)
+            ).fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size,
+            "version": self.version,
+        }
+
+
+def warm_up(pipeline, terms: List[str]) -> Dict[str, str]:
+    """Precompute explanations for every term not already cached"""
+    cache = pipeline.explanation_cache
+    if cache is None:
+        logger.warning("Explanation cache is disabled, nothing to warm")
+        return {}
+    cached = cache.get_many(terms)
+    missing = [term for term in terms if term not in cached]
+    logger.info(f"Warming explanation cache: {len(missing)} of {len(terms)} terms missing")
+    return pipeline.explain_terms([{"term": term, "context": ""} for term in missing])
+
+
+if __name__ == "__main__":
+    from app.config import get_settings
+    from app.pdf_processor import PDFProcessor
+    from app.rag_pipeline import create_pipeline
+
+    logging.basicConfig(level=logging.INFO)
+    pipeline = create_pipeline(get_settings())
+
+    warm_up(pipeline, list(PDFProcessor.MEDICAL_PATTERNS.keys()))
+    logger.info(f"Explanation cache: {pipeline.explanation_cache.stats()}")
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+import logging
+
+from app.models import JobInfo
+from app.report_analyzer import ReportAnalyzer
+from app.uploads import ReportUpload
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue already holds the maximum number of pending jobs"""
+
+
+class JobStore(ABC):
+    """Where job records live. Subclass it for a shared (e.g. Redis) store."""
+
+    @abstractmethod
+    def put(self, job: JobInfo):
+        """Insert or replace the record for ``job.job_id``"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        """The job's latest record, or None if it is unknown or expired"""
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local job store that forgets finished jobs after ``ttl_seconds``"""
+
+    def __init__(self, ttl_seconds: int = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, JobInfo] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: JobInfo):
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._purge()
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _purge(self):
+        if not self.ttl_seconds:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class SqliteJobStore(JobStore):
+    """Job store in a SQLite file, so every worker process on the node sees every job.
+
+    Jobs still run in the worker that accepted the upload; the others only read the records.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                finished_at REAL,
+                job TEXT NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def put(self, job: JobInfo):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, finished_at, job) VALUES (?, ?, ?)",
+                (job.job_id, job.finished_at, job.model_dump_json())
+            )
+            if self.ttl_seconds:
+                self._conn.execute(
+                    "DELETE FROM jobs WHERE finished_at < ?",
+                    (time.time() - self.ttl_seconds,)
+                )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            row = self._conn.execute("SELECT job FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return JobInfo.model_validate_json(row[0]) if row else None
+
+
+class ReportJobQueue:
+    """Runs report analyses on a pool of local async workers, decoupled from HTTP requests"""
+
+    def __init__(self, analyzer: ReportAnalyzer, store: JobStore, workers: int = 2, max_queued: int = 0):
+        self.analyzer = analyzer
+        self.store = store
+        self.workers = max(1, workers)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} report job workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, upload: ReportUpload, filename: str, fast: bool = False) -> JobInfo:
+        """Queue an uploaded PDF for analysis; the worker closes ``upload`` when done"""
+        job = JobInfo(job_id=uuid.uuid4().hex, filename=filename, status="queued", created_at=time.time())
+        try:
+            self._queue.put_nowait((job.job_id, upload, fast))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"{self._queue.qsize()} report jobs already queued, try again shortly")
+        self.store.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        return self.store.get(job_id)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self, index: int):
+        while True:
+            job_id, upload, fast = await self._queue.get()
+            try:
+                await self._run(job_id, upload, fast)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, upload: ReportUpload, fast: bool = False):
+        job = self.store.get(job_id)
+        if job is None:
+            upload.close()
+            return
+
+        job = job.model_copy(update={"status": "running", "started_at": time.time()})
+        self.store.put(job)
+
+        timings = {}
+        try:
+            result = await self.analyzer.analyze(upload.source, timings, fast=fast)
+            job = job.model_copy(update={"status": "completed", "result": result})
+        except Exception as e:
+            logger.error(f"Report job {job_id} failed: {e}")
+            job = job.model_copy(update={"status": "failed", "error": str(e)})
+        finally:
+            upload.close()
+
+        self.store.put(job.model_copy(update={"finished_at": time.time(), "stage_timings": timings}))
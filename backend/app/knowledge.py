@@ -0,0 +1,56 @@
+import hashlib
+import os
+import re
+from typing import Dict
+
+
+KNOWLEDGE_EXTENSIONS = ('.txt', '.md')
+
+
+def split_sections(text: str, source: str) -> Dict[str, str]:
+    """Split a knowledge file into its blank-line separated "Title:\\n body" sections"""
+    sections = {}
+    for block in re.split(r'\n\s*\n', text.strip()):
+        block = block.strip()
+        if not block:
+            continue
+        title = block.splitlines()[0].strip().rstrip(':')
+        doc_id = f"{source}:{title}"
+        suffix = 2
+        while doc_id in sections:
+            doc_id = f"{source}:{title}~{suffix}"
+            suffix += 1
+        sections[doc_id] = block
+    return sections
+
+
+def load_documents(path: str) -> Dict[str, str]:
+    """Knowledge documents keyed by a stable id.
+
+    A directory yields one document per .txt/.md file (keyed by relative path); a single
+    file yields one document per section, so editing one entry only re-embeds that entry.
+    """
+    if not os.path.isdir(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return split_sections(f.read(), os.path.basename(path))
+
+    documents = {}
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(KNOWLEDGE_EXTENSIONS):
+                file_path = os.path.join(root, name)
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    documents[os.path.relpath(file_path, path)] = f.read()
+    return documents
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def corpus_hash(document_hashes: Dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    for doc_id in sorted(document_hashes):
+        digest.update(f"{doc_id}\0{document_hashes[doc_id]}\n".encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,170 @@
+import re
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from app.term_extractor import TermExtractor
+
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it its my of on or "
+    "that the this to was what when which why with you your".split()
+)
+# Reciprocal rank fusion constant; 60 is the usual choice and keeps any one ranking from dominating
+RRF_K = 60
+MAX_TITLE_CHARS = 80
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def fuse_rankings(rankings: Sequence[Sequence[str]], k: int) -> List[str]:
+    """Merge ranked id lists by reciprocal rank fusion, keeping the top ``k``"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+class Chunk(NamedTuple):
+    """The two Document fields KnowledgeLookup reads, for building it without a vector store"""
+    page_content: str
+    metadata: Dict
+
+
+def _chunk_number(chunk_id: str) -> int:
+    suffix = chunk_id.rpartition("#")[2]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of texts, with per-posting weights precomputed at build time"""
+
+    def __init__(self, ids: List[str], texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        tokenized = [tokenize(text) for text in texts]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        average = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+
+        counts: Dict[str, Dict[int, int]] = {}
+        for doc, tokens in enumerate(tokenized):
+            for token in tokens:
+                postings = counts.setdefault(token, {})
+                postings[doc] = postings.get(doc, 0) + 1
+
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for token, postings in counts.items():
+            docs = np.fromiter(postings, dtype=np.int64, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            idf = np.log(1 + (len(ids) - len(docs) + 0.5) / (len(docs) + 0.5))
+            weight = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[docs] / average))
+            self.postings[token] = (docs, weight.astype(np.float32))
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for token in set(tokenize(query)):
+            if token in self.postings:
+                docs, weight = self.postings[token]
+                scores[docs] += weight
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+
+class KnowledgeLookup:
+    """Lexical access to the knowledge chunks: a BM25 index and a direct analyte -> section map.
+
+    Sections are the knowledge base's "Title:" blocks; each is filed under the catalog term
+    whose pattern matches earliest in its title ("HbA1c (Hemoglobin A1c)" is HbA1c, not
+    Hemoglobin), so a report term finds its section without embedding anything.
+    """
+
+    def __init__(self, chunks: Dict[str, object], patterns: Dict[str, str]):
+        self.documents = chunks
+        ids = list(chunks)
+        self.bm25 = BM25Index(ids, [doc.page_content for doc in chunks.values()])
+        self.extractor = TermExtractor(patterns)
+
+        # Chunk ids per source document, in chunk order ("doc#0", "doc#1", ...)
+        by_source: Dict[str, List[str]] = {}
+        for chunk_id, doc in chunks.items():
+            by_source.setdefault(doc.metadata.get("source", chunk_id), []).append(chunk_id)
+
+        self.sections: Dict[str, List[str]] = {}
+        self.titles: Dict[str, str] = {}
+        for chunk_ids in by_source.values():
+            chunk_ids.sort(key=_chunk_number)
+            for position, chunk_id in enumerate(chunk_ids):
+                for line_number, title in self._titles(chunks[chunk_id].page_content, position == 0):
+                    # A title opening the document names all of it (one section per document);
+                    # one further in (older multi-section chunks) names just that chunk
+                    section = chunk_ids if position == 0 and line_number == 0 else [chunk_id]
+                    term = self._title_term(title)
+                    for key in (title.lower(), term.lower() if term else None):
+                        if key and key not in self.sections:
+                            self.sections[key] = section
+                            self.titles[key] = title
+
+    @staticmethod
+    def _titles(text: str, opens_document: bool) -> List[Tuple[int, str]]:
+        """"Title:" lines; the splitter can leave a long section's title alone in its first chunk"""
+        lines = text.splitlines()
+        return [
+            (i, line.strip().rstrip(":"))
+            for i, line in enumerate(lines)
+            if line.strip().endswith(":") and len(line) <= MAX_TITLE_CHARS
+            and (i + 1 < len(lines) or (opens_document and i == 0))
+        ]
+
+    @classmethod
+    def from_documents(cls, documents: Dict[str, str], patterns: Dict[str, str]) -> "KnowledgeLookup":
+        """Build from knowledge documents directly (one chunk each), e.g. when nothing is embedded"""
+        return cls(
+            {f"{doc_id}#0": Chunk(text, {"source": doc_id}) for doc_id, text in documents.items()},
+            patterns
+        )
+
+    def _title_term(self, title: str):
+        matches = self.extractor.find_first_matches(title)
+        if not matches:
+            return None
+        return min(matches, key=lambda term: (matches[term][0], -(matches[term][1] - matches[term][0])))
+
+    def section(self, term: str) -> List[str]:
+        """Chunk ids of the section for a catalog term or section title, or [] if there is none"""
+        return self.sections.get(term.lower(), [])
+
+    def section_text(self, term: str) -> str:
+        """The body of a term's section (without its title), or "" if it has none"""
+        key = term.lower()
+        for chunk_id in self.section(term):
+            lines = self.documents[chunk_id].page_content.splitlines()
+            title_line = f"{self.titles[key]}:"
+            start = next((i + 1 for i, line in enumerate(lines) if line.strip() == title_line), 0)
+            body = []
+            for line in lines[start:]:
+                # A blank line ends the section in chunks that hold several
+                if not line.strip():
+                    break
+                body.append(line.strip())
+            if body:
+                return " ".join(body)
+        return ""
+
+    def mentioned(self, text: str) -> List[str]:
+        """Chunk ids of the sections for every analyte named in ``text``, in order of mention"""
+        matches = self.extractor.find_first_matches(text)
+        chunk_ids = []
+        for term in sorted(matches, key=lambda term: matches[term][0]):
+            for chunk_id in self.section(term):
+                if chunk_id not in chunk_ids:
+                    chunk_ids.append(chunk_id)
+        return chunk_ids
+
+    def search(self, query: str, k: int) -> List[str]:
+        return [chunk_id for chunk_id, _ in self.bm25.search(query, k)]
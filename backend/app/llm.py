@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDERS = ("gemini", "fake", "ollama", "llamacpp", "openai")
+CASSETTE_MODES = ("", "record", "replay")
+
+
+class CassetteMiss(RuntimeError):
+    """Raised in replay mode when a prompt was never recorded"""
+
+
+class Cassette:
+    """Recorded LLM responses keyed by model and prompt, stored as JSON lines.
+
+    Recording appends one line per new prompt, so a cassette can be grown across runs and
+    checked into a benchmark fixture directory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.records: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[record["key"]] = record["response"]
+            logger.info(f"Loaded {len(self.records)} recorded LLM responses from {path}")
+
+    @staticmethod
+    def key(model: str, messages: List[Dict], stop: Optional[List[str]] = None) -> str:
+        payload = json.dumps({"model": model, "messages": messages, "stop": stop}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self.records.get(key)
+
+    def put(self, key: str, response: str, model: str, prompt: str):
+        with self._lock:
+            if key in self.records:
+                return
+            self.records[key] = response
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "model": model, "prompt": prompt[:200], "response": response}) + "\n")
+
+
+def _provider_llm(config, provider: str):
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        os.environ["GOOGLE_API_KEY"] = config.OPENAI_API_KEY
+        return ChatGoogleGenerativeAI(
+            model=config.LLM_MODEL,
+            temperature=config.TEMPERATURE,
+            convert_system_message_to_human=True
+        )
+    if provider == "fake":
+        from app.llm_models import FakeChatModel
+
+        return FakeChatModel(
+            latency=config.LLM_FAKE_LATENCY,
+            tokens_per_second=config.LLM_FAKE_TOKENS_PER_SECOND,
+            answer_words=config.LLM_FAKE_ANSWER_WORDS
+        )
+    if provider == "ollama":
+        from langchain_community.chat_models import ChatOllama
+
+        return ChatOllama(
+            model=config.LLM_MODEL,
+            base_url=config.LLM_BASE_URL or "http://localhost:11434",
+            temperature=config.TEMPERATURE,
+            num_predict=config.MAX_TOKENS
+        )
+    if provider == "llamacpp":
+        from langchain_community.chat_models import ChatLlamaCpp
+
+        # LLM_MODEL is the path of a local GGUF file; needs llama-cpp-python
+        return ChatLlamaCpp(
+            model_path=config.LLM_MODEL,
+            temperature=config.TEMPERATURE,
+            max_tokens=config.MAX_TOKENS
+        )
+    if provider == "openai":
+        # Any OpenAI-compatible server (vLLM, llama.cpp server, LM Studio) at LLM_BASE_URL
+        from langchain_community.chat_models import ChatOpenAI
+
+        return ChatOpenAI(
+            model=config.LLM_MODEL,
+            openai_api_base=config.LLM_BASE_URL or None,
+            openai_api_key=config.OPENAI_API_KEY or "not-needed",
+            temperature=config.TEMPERATURE,
+            max_tokens=config.MAX_TOKENS
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER {provider!r}, expected one of {', '.join(LLM_PROVIDERS)}")
+
+
+def create_llm(config, provider: Optional[str] = None):
+    """Build the chat model selected by ``LLM_PROVIDER``, wrapped for ``LLM_CASSETTE_MODE``"""
+    provider = provider or config.LLM_PROVIDER
+    mode = config.LLM_CASSETTE_MODE
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"Unknown LLM_CASSETTE_MODE {mode!r}, expected 'record', 'replay' or empty")
+
+    # Replay never talks to the provider, so it works offline and without keys
+    llm = None if mode == "replay" else _provider_llm(config, provider)
+    if mode:
+        from app.llm_models import CassetteChatModel
+
+        llm = CassetteChatModel(
+            inner=llm,
+            cassette=Cassette(config.LLM_CASSETTE_PATH),
+            mode=mode,
+            model_id=llm_id(config, provider)
+        )
+
+    if config.METRICS_ENABLED:
+        from app.metrics import llm_callback_handler
+
+        llm.callbacks = [llm_callback_handler()]
+    return llm
+
+
+def needs_api_key(config) -> bool:
+    """Whether the configured provider can't start without OPENAI_API_KEY (only Gemini; replay never calls it)"""
+    return config.LLM_PROVIDER == "gemini" and config.LLM_CASSETTE_MODE != "replay"
+
+
+def llm_id(config, provider: Optional[str] = None) -> str:
+    """Identify the model answering prompts; part of the explanation and report cache keys"""
+    provider = provider or config.LLM_PROVIDER
+    if provider == "gemini":
+        return config.LLM_MODEL
+    if provider == "fake":
+        return "fake"
+    return f"{provider}:{config.LLM_MODEL}"
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.llm import CassetteMiss
+
+
+# The batched explanation prompt lists terms as "1. Hemoglobin" under this heading
+EXPLAIN_TERMS = re.compile(r'^Explain each of these terms[^\n]*\n((?:\d+\. .+\n?)+)', re.MULTILINE)
+EXPLAIN_TERM = re.compile(r'^\d+\. (.+)$', re.MULTILINE)
+
+
+def _prompt(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into word-sized stream chunks that join back to the original"""
+    return re.findall(r'\S+\s*', text) or [text]
+
+
+def _usage(prompt: str, text: str) -> dict:
+    """Word counts standing in for token usage"""
+    input_tokens, output_tokens = len(prompt.split()), len(_tokens(text))
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic local stand-in for the hosted chat model.
+
+    The same prompt always gets the same answer. Batched explanation prompts get a JSON
+    object with every requested term, so the upload path runs end to end. Timing follows
+    ``latency`` seconds to the first token plus one token per 1/``tokens_per_second``
+    (0 = instant), so benchmarks measure our own overhead against a known provider cost.
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    answer_words: int = 40
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def respond(self, prompt: str) -> str:
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        vocabulary = sorted(set(re.findall(r'[a-z]{4,}', prompt.lower()))) or ["result"]
+
+        def filler(count: int) -> str:
+            return " ".join(rng.choice(vocabulary) for _ in range(count))
+
+        listed = EXPLAIN_TERMS.search(prompt)
+        terms = EXPLAIN_TERM.findall(listed.group(1)) if listed else []
+        if terms:
+            per_term = max(self.answer_words // 4, 5)
+            return json.dumps({term: f"{term} is a laboratory test ({filler(per_term)})." for term in terms})
+        return f"• {filler(self.answer_words).capitalize()}."
+
+    def _duration(self, text: str) -> float:
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        return self.latency + per_token * len(_tokens(text))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        self.calls += 1
+        prompt = _prompt(messages)
+        text = self.respond(prompt)
+        time.sleep(self._duration(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=_usage(prompt, text)))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        self.calls += 1
+        prompt = _prompt(messages)
+        text = self.respond(prompt)
+        await asyncio.sleep(self._duration(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=_usage(prompt, text)))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        time.sleep(self.latency)
+        prompt = _prompt(messages)
+        text = self.respond(prompt)
+        tokens = _tokens(text)
+        for i, token in enumerate(tokens):
+            time.sleep(per_token)
+            usage = _usage(prompt, text) if i == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        per_token = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        await asyncio.sleep(self.latency)
+        prompt = _prompt(messages)
+        text = self.respond(prompt)
+        tokens = _tokens(text)
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(per_token)
+            usage = _usage(prompt, text) if i == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class CassetteChatModel(BaseChatModel):
+    """Record/replay wrapper around a chat model.
+
+    ``record`` answers from the cassette when it can and otherwise calls ``inner`` and
+    saves the response; ``replay`` only answers from the cassette and raises CassetteMiss
+    for unknown prompts. Streams are recorded whole and replayed word by word.
+    """
+
+    inner: Optional[BaseChatModel] = None
+    cassette: Any
+    mode: str = "replay"
+    model_id: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def _key(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> str:
+        return self.cassette.key(
+            self.model_id,
+            [{"type": message.type, "content": message.content} for message in messages],
+            stop
+        )
+
+    def _recorded(self, key: str, messages: List[BaseMessage]) -> Optional[str]:
+        response = self.cassette.get(key)
+        if response is None and self.mode == "replay":
+            raise CassetteMiss(f"No recorded {self.model_id} response for prompt {_prompt(messages)[:80]!r}")
+        return response
+
+    @staticmethod
+    def _result(text: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        key = self._key(messages, stop)
+        text = self._recorded(key, messages)
+        if text is None:
+            text = str(self.inner.invoke(messages, stop=stop, **kwargs).content)
+            self.cassette.put(key, text, self.model_id, _prompt(messages))
+        return self._result(text)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        key = self._key(messages, stop)
+        text = self._recorded(key, messages)
+        if text is None:
+            text = str((await self.inner.ainvoke(messages, stop=stop, **kwargs)).content)
+            self.cassette.put(key, text, self.model_id, _prompt(messages))
+        return self._result(text)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        key = self._key(messages, stop)
+        text = self._recorded(key, messages)
+        if text is not None:
+            for token in _tokens(text):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            return
+
+        parts = []
+        for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+            parts.append(str(chunk.content))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+        self.cassette.put(key, "".join(parts), self.model_id, _prompt(messages))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key = self._key(messages, stop)
+        text = self._recorded(key, messages)
+        if text is not None:
+            for token in _tokens(text):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            return
+
+        parts = []
+        async for chunk in self.inner.astream(messages, stop=stop, **kwargs):
+            parts.append(str(chunk.content))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+        self.cassette.put(key, "".join(parts), self.model_id, _prompt(messages))
@@ -1,14 +1,34 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-import shutil
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.formparsers import MultiPartParser
+import asyncio
+import json
 import os
+import shutil
+import tempfile
+import time
 import logging
 
 from app.config import get_settings
-from app.models import ReportAnalysis, ChatRequest, ChatResponse, ValueCheckRequest, MedicalTerm
+from app.models import (
+    ReportAnalysis, ChatRequest, ChatResponse, ValueCheckRequest, ValuesCheckRequest, JobInfo, BatchReportResult
+)
 from app.pdf_processor import PDFProcessor
 from app.value_analyzer import ValueAnalyzer
-from app.rag_pipeline import MedicalRAGPipeline
+from app.llm import llm_id, needs_api_key
+from app.metrics import ANALYSES, HTTP_SECONDS, REGISTRY, configure_tracing, span
+from app.rag_pipeline import MedicalRAGPipeline, create_pipeline, EXPLANATION_PROMPT_VERSION
+from app.scheduler import LLMScheduler, SchedulerSaturated
+from app.report_analyzer import ANALYSIS_MODES, ReportAnalyzer, SUMMARY_PROMPT_VERSION
+from app.result_cache import ReportResultCache
+from app.chat_sessions import ChatSessionStore, SqliteChatSessionStore, turns_from_messages
+from app.jobs import InMemoryJobStore, JobQueueFull, ReportJobQueue, SqliteJobStore
+from app.batch import BatchRunner, BatchTooLarge, collect_pdfs
+from app.knowledge import load_documents
+from app.uploads import ReportUpload, UploadLimitMiddleware, UploadTooLarge, read_upload
+from app.resilience import request_budget
 
 
 logging.basicConfig(level=logging.INFO)
@@ -28,183 +48,541 @@ app.add_middleware(
 
 
 settings = get_settings()
-pdf_processor = PDFProcessor()
+configure_tracing(settings.OTEL_TRACES_ENABLED)
+
+# Starlette spools multipart files to disk past 1 MB; keep them in memory up to our own spill size.
+# This is a class attribute, so it raises the in-memory limit for every multipart route in the
+# process (/batch-upload too, whose archives are copied to disk anyway): any file part up to
+# UPLOAD_SPILL_BYTES is held in RAM, so keep that setting small enough for concurrent uploads
+MultiPartParser.spool_max_size = settings.UPLOAD_SPILL_BYTES
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=settings.UPLOAD_MAX_BYTES,
+    paths=["/upload-report", "/upload-report/stream", "/jobs/upload-report"]
+)
+app.add_middleware(UploadLimitMiddleware, max_bytes=settings.BATCH_UPLOAD_MAX_BYTES, paths=["/batch-upload"])
+pdf_processor = PDFProcessor(
+    page_workers=settings.PDF_PAGE_WORKERS,
+    tables=settings.PDF_TABLE_EXTRACTION,
+    parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES
+)
 value_analyzer = ValueAnalyzer()
 rag_pipeline = None
+llm_scheduler = LLMScheduler(settings.MAX_CONCURRENT_LLM_CALLS, settings.MAX_PENDING_LLM_CALLS)
+report_analyzer = None
+job_queue = None
+batch_runner = None
+if settings.SHARED_STATE_DIR:
+    chat_sessions = SqliteChatSessionStore(
+        os.path.join(settings.SHARED_STATE_DIR, "chat_sessions.sqlite"),
+        max_sessions=settings.CHAT_MAX_SESSIONS,
+        window_turns=settings.CHAT_HISTORY_TURNS,
+        idle_ttl=settings.CHAT_SESSION_TTL
+    )
+else:
+    chat_sessions = ChatSessionStore(
+        max_sessions=settings.CHAT_MAX_SESSIONS,
+        window_turns=settings.CHAT_HISTORY_TURNS,
+        idle_ttl=settings.CHAT_SESSION_TTL
+    )
+result_cache = None
+if settings.RESULT_CACHE_ENABLED:
+    result_cache = ReportResultCache(
+        version=(
+            f"{llm_id(settings)}:{EXPLANATION_PROMPT_VERSION}:{SUMMARY_PROMPT_VERSION}:"
+            f"tables={settings.PDF_TABLE_EXTRACTION}"
+        ),
+        source_paths=["data/reference_ranges.json", settings.KNOWLEDGE_PATH],
+        max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+        max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+        check_interval=settings.RESULT_CACHE_CHECK_INTERVAL
+    )
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize RAG pipeline on startup"""
-    global rag_pipeline
-    
+startup_state = {"status": "pending", "error": None}
+
+
+def _load_pipeline() -> MedicalRAGPipeline:
+    """Import LangChain, load the embedding model and memory-map the saved index (blocking)"""
+    logger.info("🚀 Initializing RAG pipeline...")
+    pipeline = create_pipeline(settings)
+    pipeline.llm_scheduler = llm_scheduler
+    return pipeline
+
+
+def _job_store():
+    if settings.SHARED_STATE_DIR:
+        # Any worker can be asked about a job another worker accepted
+        return SqliteJobStore(os.path.join(settings.SHARED_STATE_DIR, "jobs.sqlite"), ttl_seconds=settings.JOB_RESULT_TTL)
+    return InMemoryJobStore(ttl_seconds=settings.JOB_RESULT_TTL)
+
+
+async def _init_rag():
+    global rag_pipeline, report_analyzer, job_queue, batch_runner
+
+    startup_state["status"] = "loading"
     try:
-        if not settings.OPENAI_API_KEY:
-            logger.warning("⚠️ OpenAI API key not set!")
-            return
-        
-        knowledge_path = "data/medical_knowledge.txt"
-        if not os.path.exists(knowledge_path):
-            logger.error(f"❌ File not found: {knowledge_path}")
-            return
-            
-        with open(knowledge_path, 'r', encoding='utf-8') as f:
-            medical_docs = [f.read()]
-        
-        logger.info("🚀 Initializing RAG pipeline...")
-        rag_pipeline = MedicalRAGPipeline(settings)
-        
-        if os.path.exists("vector_db/medical_knowledge"):
-            logger.info("📂 Loading knowledge base...")
-            rag_pipeline.load_knowledge_base()
-        else:
-            logger.info("🔨 Building knowledge base...")
-            rag_pipeline.build_knowledge_base(medical_docs)
-        
-        rag_pipeline.setup_qa_chain()
+        pipeline = await asyncio.to_thread(_load_pipeline)
         logger.info("✅ RAG pipeline ready!")
+
+        report_analyzer = ReportAnalyzer(pdf_processor, value_analyzer, pipeline)
+        job_queue = ReportJobQueue(
+            report_analyzer,
+            _job_store(),
+            workers=settings.JOB_WORKERS,
+            max_queued=settings.JOB_MAX_QUEUED
+        )
+        job_queue.start()
+        batch_runner = BatchRunner(
+            report_analyzer,
+            workers=settings.BATCH_WORKERS,
+            tables=settings.PDF_TABLE_EXTRACTION
+        )
+        rag_pipeline = pipeline
+        startup_state["status"] = "ready"
+        if settings.INDEX_RELOAD_INTERVAL > 0:
+            startup_state["watcher"] = asyncio.create_task(_watch_index())
         
     except Exception as e:
         logger.error(f"❌ Error: {e}")
+        startup_state.update(status="failed", error=str(e))
         import traceback
         traceback.print_exc()
 
 
+async def _watch_index():
+    """Pick up indexes published by other workers or the ``python -m app.rag_pipeline`` CLI"""
+    while True:
+        await asyncio.sleep(settings.INDEX_RELOAD_INTERVAL)
+        try:
+            if await asyncio.to_thread(rag_pipeline.reload_if_changed) and result_cache:
+                result_cache.check_sources(force=True)
+        except Exception as e:
+            logger.warning(f"Index reload check failed: {e}")
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize RAG pipeline on startup (in the background unless LAZY_STARTUP is off)"""
+    if needs_api_key(settings) and not settings.OPENAI_API_KEY:
+        logger.warning("⚠️ OpenAI API key not set!")
+        startup_state.update(status="failed", error="API key not set")
+        return
+    
+    if not os.path.exists(settings.KNOWLEDGE_PATH):
+        logger.error(f"❌ File not found: {settings.KNOWLEDGE_PATH}")
+        startup_state.update(status="failed", error=f"{settings.KNOWLEDGE_PATH} not found")
+        return
+
+    if settings.LAZY_STARTUP:
+        # Keep a reference so the task isn't garbage collected while it runs
+        startup_state["task"] = asyncio.create_task(_init_rag())
+    else:
+        await _init_rag()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if "watcher" in startup_state:
+        startup_state["watcher"].cancel()
+    if rag_pipeline and rag_pipeline.query_cache:
+        rag_pipeline.query_cache.save()
+    if job_queue:
+        await job_queue.stop()
+    if batch_runner:
+        batch_runner.close()
+    pdf_processor.close()
+
+
 @app.get("/")
 async def root():
     return {
         "message": "Medical Report Explainer API",
         "status": "running",
-        "rag_initialized": rag_pipeline is not None
+        "rag_initialized": rag_pipeline is not None,
+        "startup": startup_state["status"],
+        "explanation_cache": (
+            rag_pipeline.explanation_cache.stats()
+            if rag_pipeline and rag_pipeline.explanation_cache else None
+        ),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_circuit": rag_pipeline.llm_guard.breaker.stats() if rag_pipeline else None,
+        "queued_jobs": job_queue.queued if job_queue else 0,
+        "result_cache": result_cache.stats() if result_cache else None,
+        "query_cache": (
+            rag_pipeline.query_cache.stats()
+            if rag_pipeline and rag_pipeline.query_cache else None
+        ),
+        "chat_sessions": len(chat_sessions)
     }
 
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the RAG pipeline is loaded, 503 while it is loading or if it failed"""
+    body = {
+        "status": startup_state["status"],
+        "error": startup_state["error"],
+        "components": rag_pipeline.components() if rag_pipeline else None,
+    }
+    if rag_pipeline is None:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+def _collect_component_metrics():
+    """Cache and scheduler counters, read from the components' own stats at scrape time"""
+    hits, misses = {}, {}
+    caches = [("result", result_cache)]
+    if rag_pipeline is not None:
+        caches += [("explanation", rag_pipeline.explanation_cache), ("query", rag_pipeline.query_cache)]
+    for name, cache in caches:
+        if cache is None:
+            continue
+        stats = cache.stats()
+        if "hits" in stats:
+            hits[(("cache", name),)] = stats["hits"]
+            misses[(("cache", name),)] = stats["misses"]
+        for kind in ("embedding", "results"):
+            if f"{kind}_hits" in stats:
+                hits[(("cache", f"{name}_{kind}"),)] = stats[f"{kind}_hits"]
+                misses[(("cache", f"{name}_{kind}"),)] = stats[f"{kind}_misses"]
+
+    scheduler = llm_scheduler.stats()
+    families = [
+        ("cache_hits_total", "counter", "Cache hits by cache", hits),
+        ("cache_misses_total", "counter", "Cache misses by cache", misses),
+        ("llm_scheduler_in_flight", "gauge", "LLM calls currently running", {(): scheduler["in_flight"]}),
+        ("llm_scheduler_pending", "gauge", "LLM calls waiting for a slot", {(): scheduler["pending"]}),
+        ("llm_scheduler_rejected_total", "counter", "LLM calls rejected as over capacity", {(): scheduler["rejected"]}),
+    ]
+    if rag_pipeline is not None:
+        breaker = rag_pipeline.llm_guard.breaker.stats()
+        families += [
+            ("llm_circuit_open", "gauge", "1 while the LLM circuit breaker is open", {(): int(breaker["state"] == "open")}),
+            ("llm_circuit_opened_total", "counter", "Times the LLM circuit breaker opened", {(): breaker["times_opened"]}),
+        ]
+    return families
+
+
+if settings.METRICS_ENABLED:
+    REGISTRY.collectors.append(_collect_component_metrics)
+
+    @app.middleware("http")
+    async def record_request_duration(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Label by route template, not raw path, so job ids don't explode the label set
+            route = request.scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=getattr(route, "path", "unmatched"),
+                status=str(status)
+            )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus text-format scrape endpoint"""
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+def _too_busy(e: SchedulerSaturated) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+
+def _fast_mode(mode: Optional[str]) -> bool:
+    """Whether a report request should skip the LLM and answer from templates"""
+    mode = mode or settings.ANALYSIS_MODE
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(ANALYSIS_MODES)}")
+    if mode == "auto":
+        threshold = settings.AUTO_FAST_PENDING_LLM_CALLS
+        fast = (
+            llm_scheduler.saturated
+            or bool(threshold and llm_scheduler.pending >= threshold)
+            or bool(rag_pipeline and rag_pipeline.llm_guard.breaker.is_open)
+        )
+    else:
+        fast = mode == "fast"
+    return fast
+
+
+def _start_analysis(fast: bool):
+    """Admit a report analysis that will actually run (not a cache hit) and count it"""
+    if not fast:
+        try:
+            llm_scheduler.check()
+        except SchedulerSaturated as e:
+            raise _too_busy(e)
+    ANALYSES.inc(mode="fast" if fast else "llm")
+
+
 @app.post("/upload-report", response_model=ReportAnalysis)
-async def upload_report(file: UploadFile = File(...)):
+async def upload_report(file: UploadFile = File(...), mode: Optional[str] = None):
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files allowed")
     
     if not rag_pipeline:
         raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
-    
-    temp_path = f"temp_{file.filename}"
+
+    fast = _fast_mode(mode)
+    upload = None
     try:
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
+        upload = await asyncio.to_thread(_read_upload, file)
+
+        # A cached report needs no LLM call, so it is served even while the LLM is saturated
+        if result_cache:
+            cached = result_cache.get(upload.sha256)
+            if cached:
+                logger.info(f"Serving cached analysis for {file.filename}")
+                return cached
+        _start_analysis(fast)
+
         logger.info(f"Processing: {file.filename}")
-        extracted_text = pdf_processor.extract_text_from_pdf(temp_path)
-        cleaned_text = pdf_processor.clean_text(extracted_text)
-        gender = None
-        if any(x in cleaned_text.lower() for x in [' female', '/f', 'f/', ' f ']):
-            gender = 'female'
-        elif any(x in cleaned_text.lower() for x in [' male', '/m', 'm/', ' m ']):
-            gender = 'male'
-        logger.info(f"Detected gender: {gender}")
-        terms_data = pdf_processor.extract_medical_terms(cleaned_text)
-        logger.info(f"Found {len(terms_data)} medical terms")
-
-        medical_terms = []
-        for term_data in terms_data:
-            try:
-                explanation = rag_pipeline.explain_term(
-                    term_data['term'],
-                    term_data['context']
-                )
-                
-                status_info = {"is_abnormal": False}
-                if term_data['value']:
-                    try:
-                        value_float = float(term_data['value'])
-                        status_info = value_analyzer.analyze_value(
-                            term_data['term'],
-                            value_float,
-                            term_data['unit'],
-                            gender=gender
-                        )
-                    except ValueError:
-                        logger.warning(f"Could not parse value: {term_data['value']}")
-                
-                medical_terms.append(MedicalTerm(
-                    term=term_data['term'],
-                    value=term_data['value'],
-                    unit=term_data['unit'],
-                    explanation=explanation,
-                    is_abnormal=status_info.get('is_abnormal', False),
-                    status=status_info.get('status')
-                ))
-                
-            except Exception as e:
-                logger.error(f"Error processing {term_data['term']}: {e}")
-                continue
+        with request_budget(settings.UPLOAD_BUDGET_SECONDS) as budget:
+            analysis = await report_analyzer.analyze(upload.source, fast=fast)
+        # Template results (requested, or fallbacks after LLM failures) are never cached, so a
+        # later LLM request isn't served one
+        if result_cache and not fast and not budget.degraded:
+            result_cache.put(upload.sha256, analysis)
+        return analysis
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        if upload:
+            upload.close()
 
-        logger.info("Generating key findings summary...")
-        
-        abnormal_findings = [
-            f"{term.term} is {term.status.upper()} at {term.value} {term.unit}"
-            for term in medical_terms
-            if term.is_abnormal and term.value
-        ]
-        
-        normal_findings = [
-            f"{term.term}: {term.value} {term.unit}"
-            for term in medical_terms
-            if not term.is_abnormal and term.value
-        ]
-        
-        findings_summary = f"""Test Results Summary:
-- Total tests: {len(medical_terms)}
-- Abnormal values: {len(abnormal_findings)}
-- Normal values: {len(normal_findings)}
 
-Key Abnormal Results:
-{chr(10).join(['• ' + f for f in abnormal_findings[:5]]) if abnormal_findings else '• All values within normal range'}
+def _read_upload(file: UploadFile, copy: bool = False) -> ReportUpload:
+    """Hash a report upload, using its in-memory buffer in place (or a spill file past UPLOAD_SPILL_BYTES).
 
-Sample Normal Results:
-{chr(10).join(['• ' + f for f in normal_findings[:3]]) if normal_findings else ''}
-"""
-        
-        summary_prompt = f"""You are a medical assistant. Based on this blood test report, write a clear summary in 4-5 bullet points for the patient.
+    The result must be closed before the request ends unless ``copy`` is set.
+    """
+    with span("upload_read"):
+        return read_upload(
+            file.file,
+            max_bytes=settings.UPLOAD_MAX_BYTES,
+            spill_bytes=settings.UPLOAD_SPILL_BYTES,
+            spill_dir=settings.UPLOAD_SPILL_DIR,
+            copy=copy
+        )
 
-{findings_summary}
 
-Report Context:
-{cleaned_text[:500]}
+def _save_upload(file: UploadFile, path: str):
+    """Copy the upload to ``path`` in chunks (batch workers open reports by path)"""
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer, 1024 * 1024)
 
-Write 4-5 bullet points that:
-• State what type of tests were performed
-• Highlight any abnormal values and briefly explain what they might indicate
-• Mention important normal values
-• Suggest next steps or what to discuss with doctor
 
-Use simple, empathetic English. Format as bullet points starting with •."""
-        
+@app.post("/jobs/upload-report", response_model=JobInfo, status_code=202)
+async def submit_report_job(file: UploadFile = File(...), mode: Optional[str] = None):
+    """Queue a report for background analysis and return its job id immediately"""
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+    
+    if not job_queue:
+        raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
+    
+    fast = _fast_mode(mode)
+    upload = None
+    try:
+        # The job runs after this request has closed the upload, so it needs its own copy
+        upload = await asyncio.to_thread(_read_upload, file, True)
+        job = job_queue.submit(upload, file.filename, fast=fast)
+        ANALYSES.inc(mode="fast" if fast else "llm")
+        return job
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except JobQueueFull as e:
+        upload.close()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        if upload:
+            upload.close()
+        logger.error(f"Job submit error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_report_job(job_id: str):
+    job = job_queue.get(job_id) if job_queue else None
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.model_copy(update={"result": None})
+
+
+@app.get("/jobs/{job_id}/result", response_model=ReportAnalysis)
+async def get_report_job_result(job_id: str):
+    job = job_queue.get(job_id) if job_queue else None
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+
+@app.post("/batch-upload", response_model=List[BatchReportResult])
+async def batch_upload(files: List[UploadFile] = File(...), mode: Optional[str] = None):
+    """Analyze many PDFs (or zip archives of PDFs) with shared extraction workers and explanations"""
+    if not batch_runner:
+        raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
+
+    fast = _fast_mode(mode)
+    _start_analysis(fast)
+
+    with tempfile.TemporaryDirectory(prefix="report_batch_") as batch_dir:
+        uploads = []
+        for index, file in enumerate(files):
+            name = os.path.basename(file.filename or f"upload_{index}")
+            if not name.lower().endswith(('.pdf', '.zip')):
+                raise HTTPException(status_code=400, detail=f"{name}: only PDF or zip files allowed")
+            path = os.path.join(batch_dir, f"upload_{index}_{name}")
+            await asyncio.to_thread(_save_upload, file, path)
+            uploads.append(path)
+
         try:
-            summary_result = rag_pipeline.answer_question(summary_prompt, cleaned_text[:400])
-            summary_text = summary_result['answer']
+            pdfs = await asyncio.to_thread(
+                collect_pdfs,
+                uploads,
+                batch_dir,
+                max_reports=settings.BATCH_MAX_REPORTS,
+                max_extracted_bytes=settings.BATCH_MAX_EXTRACTED_BYTES
+            )
+            logger.info(f"Batch of {len(pdfs)} reports from {len(files)} uploads")
+            return await batch_runner.run(pdfs, explain=not fast, summarize=not fast)
+        except BatchTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
-            logger.error(f"Summary generation failed: {e}")
-            summary_text = f"""• Complete Blood Count (CBC) and related tests were performed to assess your overall health.
-• {len(abnormal_findings)} value(s) are outside normal range: {', '.join([f.split(' is ')[0] for f in abnormal_findings[:3]])}
-• {len(normal_findings)} value(s) are within normal limits, which is positive.
-• Please consult your doctor to discuss these results and determine next steps."""
-        
-        return ReportAnalysis(
-            extracted_text=cleaned_text[:1000],
-            medical_terms=medical_terms,
-            summary=summary_text
-        )
-        
+            logger.error(f"Batch upload error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _event_stream(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/upload-report/stream")
+async def upload_report_stream(file: UploadFile = File(...), mode: Optional[str] = None):
+    """Server-Sent Events version of /upload-report: term events as they are explained, then the summary"""
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+    
+    if not rag_pipeline:
+        raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
+
+    fast = _fast_mode(mode)
+    try:
+        upload = await asyncio.to_thread(_read_upload, file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Upload error: {e}")
-        import traceback
-        traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+    cached = result_cache.get(upload.sha256) if result_cache else None
+    if not cached:
+        try:
+            _start_analysis(fast)
+        except HTTPException:
+            upload.close()
+            raise
+
+    async def events():
+        try:
+            if cached:
+                yield _sse("extracted", {"terms": len(cached.medical_terms), "cached": True})
+                for term in cached.medical_terms:
+                    yield _sse("term", term.model_dump())
+                yield _sse("summary_token", {"text": cached.summary})
+                yield _sse("done", cached.model_dump())
+                return
+
+            # Same budget as /upload-report; the stream is consumed by a single task, so the
+            # budget's context variable stays set across the yields
+            with request_budget(settings.UPLOAD_BUDGET_SECONDS) as budget:
+                async for event in report_analyzer.stream(upload.source, fast=fast):
+                    if event["type"] == "extracted":
+                        yield _sse("extracted", {"terms": event["terms"], "gender": event["gender"]})
+                    elif event["type"] == "term":
+                        yield _sse("term", event["term"])
+                    elif event["type"] == "summary_token":
+                        yield _sse("summary_token", {"text": event["text"]})
+                    elif event["type"] == "done":
+                        # Don't cache an analysis with template fallbacks from failed LLM calls
+                        if result_cache and not fast and not budget.degraded:
+                            result_cache.put(upload.sha256, event["analysis"])
+                        yield _sse("done", event["analysis"].model_dump())
+        except Exception as e:
+            logger.error(f"Streaming upload error: {e}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            upload.close()
+
+    return _event_stream(events())
+
+
+@app.post("/cache/invalidate")
+async def invalidate_result_cache():
+    """Drop cached report results, e.g. after editing reference ranges or the knowledge base"""
+    if result_cache:
+        result_cache.invalidate()
+    return {"result_cache": result_cache.stats() if result_cache else None}
+
+
+@app.post("/knowledge/reload")
+async def reload_knowledge():
+    """Re-index the knowledge base, embedding only added or changed documents, and swap it in"""
+    if not rag_pipeline:
+        raise HTTPException(status_code=503, detail="RAG pipeline not initialized")
+
+    try:
+        documents = await asyncio.to_thread(load_documents, settings.KNOWLEDGE_PATH)
+        stats = await asyncio.to_thread(rag_pipeline.update_knowledge_base, documents)
+    except Exception as e:
+        logger.error(f"Knowledge reload error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if result_cache:
+        result_cache.check_sources(force=True)
+    return {**stats, "index_version": rag_pipeline.index_version}
+
+
+def _chat_history(request: ChatRequest):
+    """Client-supplied history wins; otherwise use the server-side history for the session"""
+    if request.chat_history:
+        return chat_sessions.window(turns_from_messages(request.chat_history))
+    return chat_sessions.history(request.session_id)
 
 
 @app.post("/chat", response_model=ChatResponse)
@@ -213,14 +591,25 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=503, detail="RAG not initialized")
     
     try:
-        result = rag_pipeline.answer_question(
-            request.question,
-            request.report_context
-        )
+        llm_scheduler.check()
+    except SchedulerSaturated as e:
+        raise _too_busy(e)
+    
+    try:
+        with span("chat"):
+            result = await rag_pipeline.aanswer_question(
+                request.question,
+                request.report_context,
+                _chat_history(request)
+            )
+        # Keep the fallback apology out of the history the next turn is conditioned on
+        if not result.get("error"):
+            chat_sessions.append(request.session_id, request.question, result['answer'])
         
         return ChatResponse(
             answer=result['answer'],
-            sources=result['sources'][:3]
+            sources=result['sources'][:3],
+            session_id=request.session_id
         )
         
     except Exception as e:
@@ -228,6 +617,43 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Server-Sent Events version of /chat: a sources event, then answer tokens as they are generated"""
+    if not rag_pipeline:
+        raise HTTPException(status_code=503, detail="RAG not initialized")
+
+    try:
+        llm_scheduler.check()
+    except SchedulerSaturated as e:
+        raise _too_busy(e)
+
+    history = _chat_history(request)
+
+    async def events():
+        try:
+            answer = []
+            failed = False
+            async for event in rag_pipeline.astream_answer(request.question, request.report_context, history):
+                if event["type"] == "sources":
+                    yield _sse("sources", event["sources"][:3])
+                else:
+                    if event["type"] == "token":
+                        answer.append(event["text"])
+                    elif event["type"] == "error":
+                        failed = True
+                    yield _sse(event["type"], {"text": event["text"]})
+            # A partial answer cut off by an error isn't worth keeping in the history either
+            if answer and not failed:
+                chat_sessions.append(request.session_id, request.question, "".join(answer))
+            yield _sse("done", {"session_id": request.session_id})
+        except Exception as e:
+            logger.error(f"Streaming chat error: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return _event_stream(events())
+
+
 @app.post("/check-value")
 async def check_value(request: ValueCheckRequest):
     try:
@@ -242,3 +668,20 @@ async def check_value(request: ValueCheckRequest):
     except Exception as e:
         logger.error(f"Value check error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/check-values")
+async def check_values(request: ValuesCheckRequest):
+    """Check many values (a whole report or cohort) against reference ranges in one vectorized pass"""
+    try:
+        checks = request.values
+        return value_analyzer.analyze_values(
+            [check.term for check in checks],
+            [check.value for check in checks],
+            [check.unit for check in checks],
+            ages=[check.age for check in checks],
+            genders=[check.gender for check in checks]
+        )
+    except Exception as e:
+        logger.error(f"Value check error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
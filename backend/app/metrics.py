@@ -0,0 +1,236 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Name of the innermost active span; LLM calls are labelled with the stage that made them
+current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("current_stage", default="other")
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {value:g}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts incl. +Inf, sum, count)
+        self._values: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield f"{self.name}_bucket{_labels(names, key + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {total:g}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors, and renders the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: List = []
+        # Callables returning (name, kind, description, {labels: value}) read at scrape time,
+        # for values other components already track (cache and scheduler stats)
+        self.collectors: List[Callable[[], List[Tuple[str, str, str, Dict[Tuple[Tuple[str, str], ...], float]]]]] = []
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, description, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, description, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+                continue
+            for name, kind, description, values in families:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in values.items():
+                    names = tuple(label for label, _ in labels)
+                    lines.append(f"{name}{_labels(names, tuple(v for _, v in labels))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "report_stage_duration_seconds", "Time spent in each processing stage", ["stage"]
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts", ["method", "route", "status"]
+)
+LLM_CALLS = REGISTRY.counter("llm_calls_total", "LLM calls by calling stage and outcome", ["stage", "outcome"])
+LLM_SECONDS = REGISTRY.histogram("llm_call_duration_seconds", "LLM call latency by calling stage", ["stage"])
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "LLM tokens reported by the provider", ["stage", "type"])
+LLM_RETRIES = REGISTRY.counter("llm_retries_total", "Repeated LLM requests", ["stage", "reason"])
+LLM_SHORT_CIRCUITS = REGISTRY.counter(
+    "llm_short_circuits_total", "LLM calls skipped for a fallback (circuit open or request budget spent)", ["stage", "reason"]
+)
+ANALYSES = REGISTRY.counter("report_analyses_total", "Report analyses by mode (llm or template fast path)", ["mode"])
+
+_tracer = None
+
+
+def configure_tracing(enabled: bool):
+    """Also emit every span as an OpenTelemetry span (exporters are configured by the OTel SDK)"""
+    global _tracer
+    if not enabled:
+        _tracer = None
+        return
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        raise RuntimeError("OTEL_TRACES_ENABLED requires opentelemetry: pip install opentelemetry-api opentelemetry-sdk")
+    _tracer = trace.get_tracer("medical-report-explainer")
+    logger.info("OpenTelemetry tracing enabled")
+
+
+@contextmanager
+def span(stage: str, timings: Optional[Dict[str, float]] = None, **attributes):
+    """Time a stage into the stage histogram (and ``timings``, and an OTel span when tracing is on)"""
+    token = current_stage.set(stage)
+    otel_span = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer else None
+    if otel_span is not None:
+        otel_span.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(elapsed, 4)
+        if otel_span is not None:
+            otel_span.__exit__(None, None, None)
+        current_stage.reset(token)
+
+
+def observe(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere (e.g. summed over pages)"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def llm_callback_handler():
+    """A LangChain callback handler counting LLM calls, latency, tokens and errors per stage"""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsHandler(BaseCallbackHandler):
+        # Run in the caller's context (not an executor) so current_stage is the caller's
+        run_inline = True
+
+        def __init__(self):
+            self._started: Dict = {}
+
+        def _start(self, run_id, metadata: Optional[Dict]):
+            # Async generators can't hold a span across yields, so they pass the stage as run metadata
+            stage = (metadata or {}).get("stage") or current_stage.get()
+            otel_span = _tracer.start_span("llm") if _tracer else None
+            self._started[run_id] = (time.perf_counter(), stage, otel_span)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+            self._start(run_id, metadata)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+            self._start(run_id, metadata)
+
+        def _finish(self, run_id, outcome: str) -> Optional[str]:
+            started, stage, otel_span = self._started.pop(run_id, (None, current_stage.get(), None))
+            LLM_CALLS.inc(stage=stage, outcome=outcome)
+            if started is not None:
+                LLM_SECONDS.observe(time.perf_counter() - started, stage=stage)
+            if otel_span is not None:
+                otel_span.set_attribute("stage", stage)
+                otel_span.set_attribute("outcome", outcome)
+                otel_span.end()
+            return stage
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            stage = self._finish(run_id, "ok")
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    if usage.get("input_tokens"):
+                        LLM_TOKENS.inc(usage["input_tokens"], stage=stage, type="input")
+                    if usage.get("output_tokens"):
+                        LLM_TOKENS.inc(usage["output_tokens"], stage=stage, type="output")
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._finish(run_id, "error")
+
+    return LLMMetricsHandler()
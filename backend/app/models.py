@@ -13,15 +13,18 @@ class ReportAnalysis(BaseModel):
     extracted_text: str
     medical_terms: List[MedicalTerm]
     summary: str
+    mode: str = "llm"  # "fast": summary (and explanations) from templates, no LLM calls
 
 class ChatRequest(BaseModel):
     question: str
     report_context: str
     chat_history: List[Dict[str, str]] = []
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[str]
+    session_id: Optional[str] = None
     
 class ValueCheckRequest(BaseModel):
     term: str
@@ -29,3 +32,23 @@ class ValueCheckRequest(BaseModel):
     unit: str
     age: Optional[int] = None
     gender: Optional[str] = None
+
+class ValuesCheckRequest(BaseModel):
+    values: List[ValueCheckRequest]
+
+class JobInfo(BaseModel):
+    job_id: str
+    filename: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stage_timings: Dict[str, float] = {}
+    error: Optional[str] = None
+    result: Optional[ReportAnalysis] = None
+
+class BatchReportResult(BaseModel):
+    filename: str
+    analysis: Optional[ReportAnalysis] = None
+    error: Optional[str] = None
+    stage_timings: Dict[str, float] = {}
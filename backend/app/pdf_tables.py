@@ -0,0 +1,164 @@
+import io
+import re
+from typing import Dict, List, Optional, Union
+
+
+# A path on disk, or the PDF's bytes (or a view of them) for uploads kept in memory
+PDFSource = Union[str, bytes, memoryview]
+
+HEADER_KEYWORDS = {
+    'test': ('test', 'investigation', 'parameter', 'analyte', 'description'),
+    'value': ('result', 'value', 'observed'),
+    'unit': ('unit',),
+    'reference_range': ('reference', 'range', 'normal', 'interval'),
+}
+
+VALUE_PATTERN = re.compile(r'^[<>]?\s*(\d+\.?\d*)\s*(.*)$')
+
+# "Haemoglobin 13.1 g/dL 12-20 g/dL (0-1Month)" style result lines for reports without ruled tables
+RESULT_LINE_PATTERN = re.compile(
+    r'^(?P<test>[A-Za-z][A-Za-z0-9 ().,/\-]*?[A-Za-z)])\s+'
+    r'(?P<value>\d+\.?\d*)\s*'
+    r'(?P<unit>(?:[a-zA-Z%µ^/0-9\.]*[a-zA-Z%µ][a-zA-Z%µ^/0-9\.]*)?)'
+    r'(?:\s+(?P<reference_range>\d.*?))?\s*$'
+)
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only stream over a bytes-like object.
+
+    io.BytesIO only avoids copying a ``bytes`` object; this also reads memoryviews (an
+    upload's spooled buffer) in place.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        count = max(0, min(len(target), len(self._view) - self._position))
+        target[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        if base + offset < 0:
+            raise ValueError(f"negative seek position {base + offset}")
+        self._position = base + offset
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self):
+        # Let go of the buffer so its owner can free or resize it
+        self._view.release()
+        super().close()
+
+
+def open_pdf(source: PDFSource):
+    """pdfplumber.open, imported on first use so importing the API stays fast"""
+    import pdfplumber
+    if isinstance(source, bytes):
+        # BytesIO over bytes shares the buffer until written to, so this doesn't copy
+        return pdfplumber.open(io.BytesIO(source))
+    if isinstance(source, (bytearray, memoryview)):
+        # pdfplumber.open leaves streams it is handed open; a PDF built on the stream closes it,
+        # releasing the view before the upload that owns the buffer is closed
+        stream = io.BufferedReader(BufferReader(source))
+        try:
+            return pdfplumber.PDF(stream)
+        except BaseException:
+            stream.close()
+            raise
+    return pdfplumber.open(source)
+
+
+def _row(test: str, value: str, unit: str = "", reference_range: str = "") -> Dict:
+    return {
+        'test': " ".join(test.split()),
+        'value': value,
+        'unit': unit.strip(),
+        'reference_range': " ".join(reference_range.split()),
+    }
+
+
+def _header_columns(header: List[Optional[str]]) -> Optional[Dict[str, int]]:
+    columns = {}
+    for index, cell in enumerate(header):
+        text = (cell or "").lower()
+        for field, keywords in HEADER_KEYWORDS.items():
+            if field not in columns and any(keyword in text for keyword in keywords):
+                columns[field] = index
+                break
+    if 'test' in columns and 'value' in columns:
+        return columns
+    return None
+
+
+def _cell(cells: List[Optional[str]], columns: Dict[str, int], field: str) -> str:
+    index = columns.get(field)
+    if index is None or index >= len(cells):
+        return ""
+    return cells[index] or ""
+
+
+def rows_from_table(table: List[List[Optional[str]]]) -> List[Dict]:
+    """Turn one pdfplumber table into (test, value, unit, reference range) rows"""
+    if not table:
+        return []
+
+    columns = _header_columns(table[0])
+    body = table[1:] if columns else table
+    if not columns:
+        columns = {'test': 0, 'value': 1, 'unit': 2, 'reference_range': 3}
+
+    rows = []
+    for cells in body:
+        test = _cell(cells, columns, 'test').strip()
+        match = VALUE_PATTERN.match(_cell(cells, columns, 'value').strip())
+        if not test or not match:
+            continue
+        unit = _cell(cells, columns, 'unit') or match.group(2)
+        rows.append(_row(test, match.group(1), unit, _cell(cells, columns, 'reference_range')))
+    return rows
+
+
+def rows_from_text(text: str) -> List[Dict]:
+    """Parse result lines out of plain page text when a page has no detectable tables"""
+    rows = []
+    for line in text.splitlines():
+        match = RESULT_LINE_PATTERN.match(line.strip())
+        if match:
+            rows.append(_row(
+                match.group('test'),
+                match.group('value'),
+                match.group('unit') or "",
+                match.group('reference_range') or ""
+            ))
+    return rows
+
+
+def page_result(page, page_number: int, tables: bool = True) -> Dict:
+    """Text and structured result rows for one pdfplumber page"""
+    text = page.extract_text() or ""
+    rows = []
+    if tables:
+        for table in page.extract_tables():
+            rows.extend(rows_from_table(table))
+        if not rows:
+            rows = rows_from_text(text)
+    return {'page': page_number, 'text': text, 'rows': rows}
+
+
+def extract_pages(source: PDFSource, start: int, stop: int, tables: bool = True) -> List[Dict]:
+    """Open the PDF and extract pages ``start`` to ``stop - 1`` (runs inside a worker process)"""
+    with open_pdf(source) as pdf:
+        return [page_result(pdf.pages[page_number], page_number, tables) for page_number in range(start, stop)]
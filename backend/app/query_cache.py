@@ -0,0 +1,119 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """LRU cache of query embeddings and top-k retrieval results shared by all requests in a worker.
+
+    Keys are the normalized query text plus the embedding model (for vectors) or the index
+    version and k (for results), so rebuilding the index or switching models never serves
+    stale hits. Results are stored as docstore ids and resolved against the live docstore.
+    Bounded by ``max_entries`` and ``max_bytes``; persisted to ``path`` when one is given.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, max_entries: int = 20000, max_bytes: int = 32 * 1024 * 1024, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = {"embedding": 0, "results": 0}
+        self.misses = {"embedding": 0, "results": 0}
+
+        self._entries: "OrderedDict[Tuple, Tuple[object, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _get(self, kind: str, key: Tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses[kind] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits[kind] += 1
+            return entry[0]
+
+    def _put(self, key: Tuple, value, size: int):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get_embedding(self, space: str, query: str) -> Optional[np.ndarray]:
+        return self._get("embedding", ("embedding", space, self.normalize(query)))
+
+    def put_embedding(self, space: str, query: str, vector: np.ndarray):
+        normalized = self.normalize(query)
+        self._put(("embedding", space, normalized), vector, vector.nbytes + len(normalized))
+
+    def get_results(self, index_version: str, k: int, query: str) -> Optional[List[str]]:
+        return self._get("results", ("results", index_version, k, self.normalize(query)))
+
+    def put_results(self, index_version: str, k: int, query: str, doc_ids: List[str]):
+        normalized = self.normalize(query)
+        size = len(normalized) + sum(len(doc_id) for doc_id in doc_ids)
+        self._put(("results", index_version, k, normalized), list(doc_ids), size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def save(self):
+        """Write the cache to ``path`` (atomically) so a restarted worker starts warm"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            payload = {"format": self.FORMAT_VERSION, "entries": list(self._entries.items())}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(payload['entries'])} query cache entries to {self.path}")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable query cache {self.path}: {e}")
+            return
+        if payload.get("format") != self.FORMAT_VERSION:
+            return
+        for key, (value, size) in payload["entries"]:
+            self._put(key, value, size)
+        logger.info(f"Loaded {len(self._entries)} query cache entries from {self.path}")
+
+    def stats(self) -> Dict:
+        stats = {"entries": len(self._entries), "bytes": self._bytes}
+        for kind in ("embedding", "results"):
+            total = self.hits[kind] + self.misses[kind]
+            stats[f"{kind}_hits"] = self.hits[kind]
+            stats[f"{kind}_misses"] = self.misses[kind]
+            stats[f"{kind}_hit_rate"] = self.hits[kind] / total if total else 0.0
+        return stats
@@ -1,159 +1,828 @@
 import os
-from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores.faiss import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import ConversationalRetrievalChain
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.memory import ConversationBufferMemory
-from langchain.prompts import PromptTemplate
-from typing import List, Dict
+import asyncio
+import json
+import pickle
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+import numpy as np
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import logging
 
+from app.ann_index import (
+    SUPPORTS_REMOVAL, build_index, built_index_type, configure_search, index_params, index_vectors,
+    read_index_mapped
+)
+from app.explanation_cache import ExplanationCache
+from app.knowledge import corpus_hash, document_hash, load_documents
+from app.lexical import KnowledgeLookup, fuse_rankings
+from app.llm import create_llm, llm_id
+from app.metrics import LLM_RETRIES, span
+from app.query_cache import QueryCache
+from app.resilience import LLMGuard
+
 
 logger = logging.getLogger(__name__)
 
 
+FRENCH_INDICATORS = ['est', 'sont', 'votre', 'vous', 'pour', 'dans']
+
+# Bump when the explanation prompts change so cached answers are regenerated
+EXPLANATION_PROMPT_VERSION = "2"
+# Sentences of a knowledge section used as a template (LLM-free) explanation
+TEMPLATE_SENTENCES = 3
+# Bump when the on-disk index layout changes so old artifacts are rebuilt
+INDEX_FORMAT_VERSION = 2
+
+QA_PROMPT_TEMPLATE = """You are a helpful medical assistant that explains medical terms and reports in simple English.
+Use the following context from medical knowledge base and the patient's report to answer the question.
+
+Context from knowledge base:
+{context}
+
+Chat History:
+{chat_history}
+
+Question: {question}
+
+Instructions:
+- CRITICAL: Respond ONLY in English, never in French or other languages
+- Explain medical terms in simple, easy-to-understand language
+- If discussing lab values, mention whether they're normal, high, or low
+- Be empathetic and clear
+- If you don't have enough information, say "I don't have enough information about [topic] in the provided context"
+- Keep explanations concise (2-3 sentences)
+
+Answer in English:"""
+
+
+def template_explanation(lookup: Optional[KnowledgeLookup], term: str) -> str:
+    """Explain a term without the LLM: the opening sentences of its knowledge section"""
+    text = lookup.section_text(term) if lookup else ""
+    if not text:
+        return f"A {term} is a medical test that measures specific values in your blood to assess your health."
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    return " ".join(sentences[:TEMPLATE_SENTENCES])
+
+
 class MedicalRAGPipeline:
-    """RAG pipeline for medical knowledge retrieval and question answering"""
+    """RAG pipeline for medical knowledge retrieval and question answering.
+
+    LangChain, the embedding model and the LLM client are imported when the pipeline
+    is constructed rather than at module import, so the API process starts quickly and
+    can build the pipeline in the background.
+    """
     
     def __init__(self, config):
+        from app.embeddings import create_embeddings, embedding_id
+
         self.config = config
-        
-        os.environ["GOOGLE_API_KEY"] = config.OPENAI_API_KEY
-        
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=config.EMBEDDING_MODEL
-        )
+
+        self.embeddings = create_embeddings(config)
+        self.embedding_space = embedding_id(config)
         self.vector_store = None
+        # BM25 and analyte-section indexes over the vector store's chunks, rebuilt with it; used
+        # for retrieval in hybrid mode and for template explanations in any mode
+        self.lookup = None
+        # Identifies the loaded index build; part of every cached retrieval result key
+        self.index_version = None
+        self._index_lock = threading.Lock()
         self.qa_chain = None
         
-     
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-lite",
-            temperature=config.TEMPERATURE,
-            convert_system_message_to_human=True
-        )
+
+        self.llm = create_llm(config)
+
+        # Set by the API to an LLMScheduler to cap concurrent async LLM calls
+        self.llm_scheduler = None
+        # Deadlines, retries, hedging and the circuit breaker around every LLM call
+        self.llm_guard = LLMGuard.from_config(config)
+
+        self.explanation_cache = None
+        if config.EXPLANATION_CACHE_ENABLED:
+            self.explanation_cache = ExplanationCache(
+                config.EXPLANATION_CACHE_PATH,
+                version=f"{llm_id(config)}:{EXPLANATION_PROMPT_VERSION}",
+                ttl_seconds=config.EXPLANATION_CACHE_TTL,
+                max_entries=config.EXPLANATION_CACHE_MAX_ENTRIES
+            )
+
+        self.query_cache = None
+        if config.QUERY_CACHE_ENABLED:
+            self.query_cache = QueryCache(
+                max_entries=config.QUERY_CACHE_MAX_ENTRIES,
+                max_bytes=config.QUERY_CACHE_MAX_BYTES,
+                path=config.QUERY_CACHE_PATH or None
+            )
         
-    def build_knowledge_base(self, documents: List[str]):
-        """Build FAISS vector store from medical documents"""
+    @contextmanager
+    def _build_lock(self):
+        """Hold the index directory's lock file, so one process at a time builds and publishes"""
+        import fcntl
+
+        path = self.config.VECTOR_DB_PATH
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def build_knowledge_base(self, documents: Dict[str, str]):
+        """Build FAISS vector store from medical documents (keyed by document id)"""
+        with self._index_lock, self._build_lock():
+            self._build_knowledge_base(documents)
+
+    def _build_knowledge_base(self, documents: Dict[str, str]):
+        from langchain_community.vectorstores.faiss import FAISS
+
         logger.info("Building knowledge base...")
-        
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.config.CHUNK_SIZE,
-            chunk_overlap=self.config.CHUNK_OVERLAP,
-            length_function=len,
-        )
-        
-        texts = []
-        for doc in documents:
-            chunks = text_splitter.split_text(doc)
-            texts.extend(chunks)
-        
+        texts, metadatas, ids = self._chunk_documents(documents)
         logger.info(f"Created {len(texts)} text chunks")
         
-        self.vector_store = FAISS.from_texts(
+        vector_store = FAISS.from_texts(
             texts=texts,
-            embedding=self.embeddings
+            embedding=self.embeddings,
+            metadatas=metadatas,
+            ids=ids
         )
+        if self.config.INDEX_TYPE != "flat":
+            vector_store.index = build_index(index_vectors(vector_store.index), self.config)
         
-        os.makedirs("vector_db", exist_ok=True)
-        self.vector_store.save_local("vector_db/medical_knowledge")
+        self._publish(vector_store, self._index_manifest(documents, vector_store.index))
         logger.info("Vector store saved successfully")
+
+    def update_knowledge_base(self, documents: Dict[str, str]) -> Dict:
+        """Re-embed only added or changed documents, drop removed ones and swap the result in.
+
+        The live index is never modified: changes are applied to a copy that replaces it on
+        disk and in this process once complete, so in-flight queries keep a consistent view.
+        Falls back to a full build when there is no compatible saved index. Other processes
+        (API workers, the CLI) wait for the build lock and then diff against what was published.
+        """
+        with self._index_lock, self._build_lock():
+            manifest = self._read_manifest()
+            if manifest is None or not self._manifest_compatible(manifest):
+                self._build_knowledge_base(documents)
+                return {"mode": "full", "documents": len(documents)}
+
+            previous = manifest["documents"]
+            hashes = {doc_id: document_hash(text) for doc_id, text in documents.items()}
+            added = [doc_id for doc_id in hashes if doc_id not in previous]
+            changed = [doc_id for doc_id in hashes if doc_id in previous and previous[doc_id]["sha256"] != hashes[doc_id]]
+            removed = [doc_id for doc_id in previous if doc_id not in hashes]
+            stats = {"mode": "incremental", "added": len(added), "changed": len(changed), "removed": len(removed)}
+            built = manifest.get("index_built", manifest.get("index", {}).get("type", "flat"))
+            if (changed or removed) and not SUPPORTS_REMOVAL[built]:
+                self._build_knowledge_base(documents)
+                return {**stats, "mode": "full", "documents": len(documents)}
+            # The diff is against the saved manifest, so start from the saved index
+            if self.vector_store is None or self.index_version != self._index_version(manifest):
+                self.load_knowledge_base()
+            if not (added or changed or removed):
+                return {**stats, "mode": "unchanged"}
+
+            vector_store = self._copy_vector_store(self.vector_store)
+
+            stale_ids = [
+                self._chunk_id(doc_id, i)
+                for doc_id in changed + removed
+                for i in range(previous[doc_id]["chunks"])
+            ]
+            if stale_ids:
+                vector_store.delete(stale_ids)
+
+            texts, metadatas, ids = self._chunk_documents({doc_id: documents[doc_id] for doc_id in added + changed})
+            if texts:
+                vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+
+            self._publish(vector_store, self._index_manifest(documents, vector_store.index))
+            logger.info(
+                f"Knowledge base updated: {len(added)} added, {len(changed)} changed, {len(removed)} removed "
+                f"({len(stale_ids)} chunks deleted, {len(texts)} embedded)"
+            )
+            return {**stats, "chunks_deleted": len(stale_ids), "chunks_embedded": len(texts)}
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the saved index if another process has published a newer one"""
+        manifest = self._read_manifest()
+        if manifest is None or self._index_version(manifest) == self.index_version:
+            return False
+        with self._index_lock:
+            self.load_knowledge_base()
+        logger.info(f"Reloaded knowledge base version {self.index_version}")
+        return True
+
+    def _splitter(self):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.config.CHUNK_SIZE,
+            chunk_overlap=self.config.CHUNK_OVERLAP,
+            length_function=len,
+        )
+
+    @staticmethod
+    def _chunk_id(doc_id: str, chunk: int) -> str:
+        return f"{doc_id}#{chunk}"
+
+    def _chunk_documents(self, documents: Dict[str, str]) -> Tuple[List[str], List[Dict], List[str]]:
+        """Chunk texts with stable per-document ids, so a document's vectors can be replaced later"""
+        text_splitter = self._splitter()
+        texts, metadatas, ids = [], [], []
+        for doc_id, text in documents.items():
+            for i, chunk in enumerate(text_splitter.split_text(text)):
+                texts.append(chunk)
+                metadatas.append({"source": doc_id})
+                ids.append(self._chunk_id(doc_id, i))
+        return texts, metadatas, ids
+
+    def _copy_vector_store(self, vector_store):
+        """Modifiable in-memory copy of the loaded (memory-mapped, read-only) vector store"""
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores.faiss import FAISS
+
+        # Re-read the saved index: mmapped IVF inverted lists can't be cloned in memory
+        index = faiss.read_index(os.path.join(self.config.VECTOR_DB_PATH, "index.faiss"))
+        configure_search(index, self.config)
+        return FAISS(
+            self.embeddings,
+            index,
+            InMemoryDocstore(dict(vector_store.docstore._dict)),
+            dict(vector_store.index_to_docstore_id)
+        )
+
+    def _publish(self, vector_store, manifest: Dict):
+        """Write the index and its manifest to a staging dir, swap it into place, then start serving it"""
+        path = self.config.VECTOR_DB_PATH
+        staging = f"{path}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        vector_store.save_local(staging)
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        previous = f"{path}.old"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, previous)
+        os.rename(staging, path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        # Store before version: see retrieve()
+        self.lookup = self._build_lookup(vector_store)
+        self.vector_store = vector_store
+        self.index_version = self._index_version(manifest)
+
+    def _index_manifest(self, documents: Dict[str, str], index) -> Dict:
+        from app.embeddings import embedding_id
+
+        text_splitter = self._splitter()
+        hashes = {doc_id: document_hash(text) for doc_id, text in documents.items()}
+        return {
+            "format": INDEX_FORMAT_VERSION,
+            "embedding_model": embedding_id(self.config),
+            "chunk_size": self.config.CHUNK_SIZE,
+            "chunk_overlap": self.config.CHUNK_OVERLAP,
+            "index": index_params(self.config),
+            # What was built from those settings: a small corpus gets a flat index whatever was asked for
+            "index_built": built_index_type(index),
+            "knowledge_sha256": corpus_hash(hashes),
+            "documents": {
+                doc_id: {"sha256": hashes[doc_id], "chunks": len(text_splitter.split_text(text))}
+                for doc_id, text in documents.items()
+            },
+            "built_at": time.time(),
+        }
+
+    def _read_manifest(self) -> Optional[Dict]:
+        manifest_path = os.path.join(self.config.VECTOR_DB_PATH, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {manifest_path}: {e}")
+            return None
+
+    def _manifest_compatible(self, manifest: Dict) -> bool:
+        """Whether the saved index can be updated in place (same format, model, chunking and index type)"""
+        from app.embeddings import embedding_id
+
+        return (
+            manifest.get("format") == INDEX_FORMAT_VERSION
+            and manifest.get("embedding_model") == embedding_id(self.config)
+            and manifest.get("chunk_size") == self.config.CHUNK_SIZE
+            and manifest.get("chunk_overlap") == self.config.CHUNK_OVERLAP
+            and manifest.get("index", {"type": "flat"}) == index_params(self.config)
+        )
+
+    def index_is_current(self, documents: Dict[str, str]) -> bool:
+        """Whether the saved index was built from these documents with the current settings"""
+        path = self.config.VECTOR_DB_PATH
+        if not os.path.exists(os.path.join(path, "index.faiss")):
+            return False
+
+        manifest = self._read_manifest()
+        if manifest is None:
+            # Older indexes predate the manifest: reuse them if at least the vector size matches
+            index = read_index_mapped(os.path.join(path, "index.faiss"))
+            matches = index.d == len(self.embeddings.embed_query("dimension check"))
+            logger.warning(f"{path} has no manifest, {'reusing' if matches else 'rebuilding'} it")
+            return matches
+
+        hashes = {doc_id: document_hash(text) for doc_id, text in documents.items()}
+        if not self._manifest_compatible(manifest):
+            logger.info("Saved index was built with different settings")
+            return False
+        if manifest.get("knowledge_sha256") != corpus_hash(hashes):
+            logger.info("Saved index is stale (knowledge base changed)")
+            return False
+        return True
         
     def load_knowledge_base(self):
-        """Load existing vector store"""
+        """Load the saved vector store, memory-mapping the FAISS index instead of reading it into RAM"""
+        from langchain_community.vectorstores.faiss import FAISS
+
+        path = self.config.VECTOR_DB_PATH
         try:
-            self.vector_store = FAISS.load_local(
-                "vector_db/medical_knowledge",
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            logger.info("Vector store loaded successfully")
+            manifest = self._read_manifest()
+            index = read_index_mapped(os.path.join(path, "index.faiss"))
+            configure_search(index, self.config)
+            with open(os.path.join(path, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+
+            # Store before version: see retrieve()
+            vector_store = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+            self.lookup = self._build_lookup(vector_store)
+            self.vector_store = vector_store
+            if manifest:
+                self.index_version = self._index_version(manifest)
+            else:
+                self.index_version = f"legacy:{os.path.getmtime(os.path.join(path, 'index.faiss'))}"
+            logger.info(f"Vector store loaded successfully ({index.ntotal} vectors)")
         except Exception as e:
             logger.error(f"Error loading vector store: {e}")
             raise
+
+    def _build_lookup(self, vector_store) -> KnowledgeLookup:
+        from app.pdf_processor import PDFProcessor
+
+        chunks = {
+            chunk_id: vector_store.docstore.search(chunk_id)
+            for chunk_id in vector_store.index_to_docstore_id.values()
+        }
+        # Section titles are matched against the same analyte catalog the reports are parsed with
+        return KnowledgeLookup(chunks, PDFProcessor.MEDICAL_PATTERNS)
+
+    @staticmethod
+    def _index_version(manifest: Dict) -> str:
+        return f"{manifest['knowledge_sha256'][:16]}:{manifest['built_at']}"
+
+    def components(self) -> Dict[str, bool]:
+        """Which parts of the pipeline are loaded, for readiness reporting"""
+        return {
+            "embeddings": self.embeddings is not None,
+            "llm": self.llm is not None,
+            "vector_store": self.vector_store is not None,
+            "qa_chain": self.qa_chain is not None,
+        }
     
     def setup_qa_chain(self):
         """Setup conversational QA chain"""
-        
-        prompt_template = """You are a helpful medical assistant that explains medical terms and reports in simple English.
-        Use the following context from medical knowledge base and the patient's report to answer the question.
-        
-        Context from knowledge base:
-        {context}
-        
-        Chat History:
-        {chat_history}
-        
-        Question: {question}
-        
-        Instructions:
-        - CRITICAL: Respond ONLY in English, never in French or other languages
-        - Explain medical terms in simple, easy-to-understand language
-        - If discussing lab values, mention whether they're normal, high, or low
-        - Be empathetic and clear
-        - If you don't have enough information, say "I don't have enough information about [topic] in the provided context"
-        - Keep explanations concise (2-3 sentences)
-        
-        Answer in English:"""
+        from langchain.chains import ConversationalRetrievalChain
+        from langchain.prompts import PromptTemplate
+        from app.retriever import PipelineRetriever
         
         PROMPT = PromptTemplate(
-            template=prompt_template,
+            template=QA_PROMPT_TEMPLATE,
             input_variables=["context", "chat_history", "question"]
         )
         
-        memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer"
-        )
-        
         self.qa_chain = ConversationalRetrievalChain.from_llm(
             llm=self.llm,
-            retriever=self.vector_store.as_retriever(
-                search_kwargs={"k": self.config.TOP_K_RESULTS}
-            ),
-            memory=memory,
+            retriever=PipelineRetriever(pipeline=self),
             return_source_documents=True,
             combine_docs_chain_kwargs={"prompt": PROMPT}
         )
         
         logger.info("QA chain setup complete")
     
-    def explain_term(self, term: str, context: str = "") -> str:
-        """Explain a medical term in simple language"""
+    def explain_term(self, term: str) -> str:
+        """Explain a medical term in simple language.
+
+        Explanations are cached per term and shared by every report, so the prompt holds
+        nothing from the patient's report.
+        """
+        if self.explanation_cache:
+            cached = self.explanation_cache.get(term)
+            if cached:
+                return cached
+
         try:
             query = f"Explain what {term} means in simple English. Be specific and concise (2-3 sentences)."
-            if context:
-                query += f" Context from patient report: {context[:200]}"
             
-            result = self.qa_chain({"question": query})
+            result = self.llm_guard.call_sync(lambda: self.qa_chain({"question": query, "chat_history": []}))
             answer = result["answer"]
             
-           
-            french_indicators = ['est', 'sont', 'votre', 'vous', 'pour', 'dans']
-            if any(word in answer.lower().split() for word in french_indicators):
+            if self._looks_french(answer):
                 logger.warning(f"French response detected for {term}, retrying...")
-               
+                LLM_RETRIES.inc(stage="explanations", reason="non_english")
                 query = f"IN ENGLISH ONLY: What is {term}? Explain briefly."
-                result = self.qa_chain({"question": query})
+                result = self.llm_guard.call_sync(lambda: self.qa_chain({"question": query, "chat_history": []}))
                 answer = result["answer"]
             
+            if self.explanation_cache and not self._looks_french(answer):
+                self.explanation_cache.set(term, answer)
             return answer
             
         except Exception as e:
             logger.error(f"Error explaining {term}: {e}")
          
-            return f"A {term} is a medical test that measures specific values in your blood to assess your health."
+            return template_explanation(self.lookup, term)
+
+    async def aexplain_term(self, term: str) -> str:
+        """Async variant of explain_term using the chain's async API"""
+        if self.explanation_cache:
+            cached = self.explanation_cache.get(term)
+            if cached:
+                return cached
+
+        try:
+            query = f"Explain what {term} means in simple English. Be specific and concise (2-3 sentences)."
+
+            result = await self._acall_chain({"question": query, "chat_history": []})
+            answer = result["answer"]
+
+            if self._looks_french(answer):
+                logger.warning(f"French response detected for {term}, retrying...")
+                LLM_RETRIES.inc(stage="explanations", reason="non_english")
+                query = f"IN ENGLISH ONLY: What is {term}? Explain briefly."
+                result = await self._acall_chain({"question": query, "chat_history": []})
+                answer = result["answer"]
+
+            if self.explanation_cache and not self._looks_french(answer):
+                self.explanation_cache.set(term, answer)
+            return answer
+
+        except Exception as e:
+            logger.error(f"Error explaining {term}: {e}")
+            return template_explanation(self.lookup, term)
+
+    def explain_terms(self, terms_data: List[Dict]) -> Dict[str, str]:
+        """Explain many terms with one retrieval pass and batched LLM calls"""
+        terms = self._collect_terms(terms_data)
+        explanations, terms = self._cached_explanations(terms)
+        if not terms:
+            return explanations
+
+        retrieved = self._safe_retrieve_batch(terms)
+
+        generated = {}
+        unavailable = set()
+        for batch, batch_docs in self._batches(terms, retrieved):
+            answers = self._explain_batch(batch, batch_docs)
+            if answers is None:
+                unavailable.update(batch)
+            else:
+                generated.update(answers)
+
+        retry = [term for term in terms if term in generated and self._looks_french(generated[term])]
+        if retry:
+            logger.warning(f"French response detected for {len(retry)} terms, retrying batch...")
+            LLM_RETRIES.inc(stage="explanations", reason="non_english")
+            retry_docs = [retrieved[terms.index(term)] for term in retry]
+            for term, answer in (self._explain_batch(retry, retry_docs, strict_english=True) or {}).items():
+                if not self._looks_french(answer):
+                    generated[term] = answer
+
+        explanations.update(self._store_explanations(generated))
+
+        for term in terms:
+            if term in explanations:
+                continue
+            if term in unavailable:
+                # The batch call already used up its retries; one call per term would only wait longer
+                explanations[term] = template_explanation(self.lookup, term)
+            else:
+                logger.warning(f"No batched explanation for {term}, falling back to single call")
+                explanations[term] = self.explain_term(term)
+
+        return explanations
+
+    async def aexplain_terms(self, terms_data: List[Dict]) -> Dict[str, str]:
+        """Async variant of explain_terms; batches run concurrently within the LLM scheduler's cap"""
+        explanations = {}
+        async for ready in self.aiter_explanations(terms_data):
+            explanations.update(ready)
+        return explanations
+
+    async def aiter_explanations(self, terms_data: List[Dict]) -> AsyncIterator[Dict[str, str]]:
+        """Yield ``{term: explanation}`` chunks as soon as each cache lookup or LLM batch finishes"""
+        terms = self._collect_terms(terms_data)
+        cached, terms = self._cached_explanations(terms)
+        if cached:
+            yield cached
+        if not terms:
+            return
+
+        retrieved = await asyncio.to_thread(self._safe_retrieve_batch, terms)
+
+        async def explain(batch: List[str], batch_docs: List[List[str]]):
+            return batch, await self._aexplain_batch(batch, batch_docs)
+
+        answered = set()
+        unavailable = set()
+        french = {}
+        tasks = [
+            asyncio.ensure_future(explain(batch, batch_docs))
+            for batch, batch_docs in self._batches(terms, retrieved)
+        ]
+        try:
+            for next_batch in asyncio.as_completed(tasks):
+                batch, answers = await next_batch
+                if answers is None:
+                    unavailable.update(batch)
+                    continue
+                ready = {}
+                for term, answer in answers.items():
+                    if self._looks_french(answer):
+                        french[term] = answer
+                    else:
+                        ready[term] = answer
+                if ready:
+                    answered.update(ready)
+                    yield self._store_explanations(ready)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if french:
+            logger.warning(f"French response detected for {len(french)} terms, retrying batch...")
+            LLM_RETRIES.inc(stage="explanations", reason="non_english")
+            retry = list(french)
+            retry_docs = [retrieved[terms.index(term)] for term in retry]
+            answers = await self._aexplain_batch(retry, retry_docs, strict_english=True)
+            for term, answer in (answers or {}).items():
+                if not self._looks_french(answer):
+                    french[term] = answer
+            answered.update(french)
+            yield self._store_explanations(french)
+
+        # Batches that failed outright already used up their retries: answer from the knowledge
+        # sections now rather than waiting on one more call per term
+        templated = [term for term in terms if term in unavailable and term not in answered]
+        if templated:
+            answered.update(templated)
+            yield {term: template_explanation(self.lookup, term) for term in templated}
+
+        missing = [term for term in terms if term not in answered]
+        if missing:
+            logger.warning(f"No batched explanation for {len(missing)} terms, falling back to single calls")
+            answers = await asyncio.gather(*(self.aexplain_term(term) for term in missing))
+            yield dict(zip(missing, answers))
+
+    @staticmethod
+    def _collect_terms(terms_data: List[Dict]) -> List[str]:
+        """Distinct terms in order of appearance.
+
+        Report context is dropped: one explanation serves every occurrence of a term (across
+        reports, in batches), so it must not depend on any one report's text.
+        """
+        return list(dict.fromkeys(term_data['term'] for term_data in terms_data))
+
+    def _cached_explanations(self, terms: List[str]):
+        """Split terms into cached explanations and the ones still to generate"""
+        if not self.explanation_cache:
+            return {}, terms
+        explanations = self.explanation_cache.get_many(terms)
+        return explanations, [term for term in terms if term not in explanations]
+
+    def _store_explanations(self, generated: Dict[str, str]) -> Dict[str, str]:
+        if self.explanation_cache:
+            self.explanation_cache.set_many({
+                term: answer for term, answer in generated.items() if not self._looks_french(answer)
+            })
+        return generated
+
+    def _batches(self, terms: List[str], retrieved: List[List[str]]):
+        batch_size = max(1, self.config.EXPLAIN_BATCH_SIZE)
+        for start in range(0, len(terms), batch_size):
+            yield terms[start:start + batch_size], retrieved[start:start + batch_size]
+
+    def _llm_slot(self):
+        return self.llm_scheduler.slot() if self.llm_scheduler else nullcontext()
+
+    async def _acall_chain(self, inputs: Dict) -> Dict:
+        return await self.llm_guard.call(lambda: self.qa_chain.acall(inputs), self._llm_slot)
+
+    def _safe_retrieve_batch(self, terms: List[str]) -> List[List[str]]:
+        try:
+            # A term with its own knowledge section needs only that section: no embedding, shorter prompt
+            retrieved = [self._section(term) for term in terms]
+            missing = [i for i, docs in enumerate(retrieved) if not docs]
+            if missing:
+                searched = self._retrieve_batch([f"What is {terms[i]}?" for i in missing])
+                for i, docs in zip(missing, searched):
+                    retrieved[i] = docs
+            return retrieved
+        except Exception as e:
+            logger.error(f"Batch retrieval failed: {e}")
+            return [[] for _ in terms]
+
+    def _hybrid_lookup(self) -> Optional[KnowledgeLookup]:
+        return self.lookup if self.config.RETRIEVAL_MODE == "hybrid" else None
+
+    def _section(self, term: str) -> List[str]:
+        lookup = self._hybrid_lookup()
+        if lookup is None:
+            return []
+        return [lookup.documents[chunk_id].page_content for chunk_id in lookup.section(term)]
+
+    def _retrieve_batch(self, queries: List[str]) -> List[List[str]]:
+        return [[doc.page_content for doc in docs] for docs in self.retrieve(queries)]
+
+    def retrieve(self, queries: List[str], k: Optional[int] = None) -> List[List]:
+        """Top-k documents for each query.
+
+        In hybrid mode a query naming analytes gets just their knowledge sections, without
+        embedding the query; other queries fuse the vector and BM25 rankings.
+        """
+        k = k or self.config.TOP_K_RESULTS
+        # Read the version before the store (they are swapped store-first), so results from a
+        # newer store may land under an old key but never the reverse
+        index_version = self.index_version
+        vector_store = self.vector_store
+        lookup = self._hybrid_lookup()
+
+        doc_ids: List[Optional[List[str]]] = [None] * len(queries)
+        dense = []
+        for i, query in enumerate(queries):
+            sections = lookup.mentioned(query)[:k] if lookup else []
+            if sections:
+                doc_ids[i] = sections
+            else:
+                dense.append(i)
+
+        if dense:
+            dense_ids = self._vector_search(vector_store, index_version, [queries[i] for i in dense], k)
+            for i, ids in zip(dense, dense_ids):
+                doc_ids[i] = fuse_rankings([ids, lookup.search(queries[i], k)], k) if lookup else ids
+
+        results = []
+        for ids in doc_ids:
+            docs = [vector_store.docstore.search(doc_id) for doc_id in ids]
+            results.append([doc for doc in docs if hasattr(doc, "page_content")])
+        return results
+
+    def _vector_search(self, vector_store, index_version: str, queries: List[str], k: int) -> List[List[str]]:
+        """Nearest chunk ids per query: cached results first, then one FAISS search for the rest"""
+        doc_ids: List[Optional[List[str]]] = [
+            self.query_cache.get_results(index_version, k, query) if self.query_cache else None
+            for query in queries
+        ]
+
+        missing = [i for i, ids in enumerate(doc_ids) if ids is None]
+        if missing:
+            vectors = self._embed_queries([queries[i] for i in missing])
+            with span("vector_search", queries=len(missing)):
+                _, indices = vector_store.index.search(vectors, k)
+            for i, row in zip(missing, indices):
+                doc_ids[i] = [vector_store.index_to_docstore_id[j] for j in row if j != -1]
+                if self.query_cache:
+                    self.query_cache.put_results(index_version, k, queries[i], doc_ids[i])
+        return doc_ids
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries in one batch, reusing cached vectors for queries seen before"""
+        vectors = [
+            self.query_cache.get_embedding(self.embedding_space, query) if self.query_cache else None
+            for query in queries
+        ]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            with span("query_embedding", queries=len(missing)):
+                embedded = np.array(self.embeddings.embed_documents([queries[i] for i in missing]), dtype=np.float32)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                if self.query_cache:
+                    self.query_cache.put_embedding(self.embedding_space, queries[i], vector)
+        return np.vstack(vectors).astype(np.float32)
+
+    def _explain_batch(
+        self,
+        terms: List[str],
+        docs: List[List[str]],
+        strict_english: bool = False
+    ) -> Optional[Dict[str, str]]:
+        """Ask the LLM for every explanation in one structured request; None if the call failed"""
+        prompt = self._batch_prompt(terms, docs, strict_english)
+        try:
+            response = self.llm_guard.call_sync(lambda: self.llm.invoke(prompt))
+        except Exception as e:
+            logger.error(f"Batch explanation failed for {len(terms)} terms: {e}")
+            return None
+        return self._parse_batch_response(getattr(response, "content", response), terms)
+
+    async def _aexplain_batch(
+        self,
+        terms: List[str],
+        docs: List[List[str]],
+        strict_english: bool = False
+    ) -> Optional[Dict[str, str]]:
+        prompt = self._batch_prompt(terms, docs, strict_english)
+        try:
+            response = await self.llm_guard.call(lambda: self.llm.ainvoke(prompt), self._llm_slot)
+        except Exception as e:
+            logger.error(f"Batch explanation failed for {len(terms)} terms: {e}")
+            return None
+        return self._parse_batch_response(getattr(response, "content", response), terms)
+
+    @staticmethod
+    def _batch_prompt(
+        terms: List[str],
+        docs: List[List[str]],
+        strict_english: bool = False
+    ) -> str:
+        knowledge = []
+        for chunks in docs:
+            for chunk in chunks:
+                if chunk not in knowledge:
+                    knowledge.append(chunk)
+
+        term_lines = "\n".join(f"{i}. {term}" for i, term in enumerate(terms, 1))
+        language = "IN ENGLISH ONLY. " if strict_english else ""
+        return f"""{language}You are a helpful medical assistant that explains medical terms in simple English.
+Use the following context from the medical knowledge base.
+
+Context from knowledge base:
+{chr(10).join(knowledge)}
+
+Explain each of these terms in 2-3 simple sentences:
+{term_lines}
+
+Respond ONLY with a JSON object mapping each term name exactly as written above to its explanation, e.g. {{"Hemoglobin": "..."}}.
+Respond ONLY in English, never in French or other languages."""
+
+    @staticmethod
+    def _parse_batch_response(text: str, terms: List[str]) -> Dict[str, str]:
+        """Map a JSON (or numbered-list) LLM answer back onto the requested terms"""
+        text = str(text).strip()
+        text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+
+        by_name = {term.lower(): term for term in terms}
+        parsed = {}
+        try:
+            match = re.search(r'\{.*\}', text, re.DOTALL)
+            data = json.loads(match.group(0) if match else text)
+            for key, value in data.items():
+                term = by_name.get(str(key).strip().lower())
+                if term and isinstance(value, str) and value.strip():
+                    parsed[term] = value.strip()
+            return parsed
+        except (ValueError, AttributeError):
+            pass
+
+        # Fall back to "1. Term: explanation" style answers
+        for line in text.splitlines():
+            match = re.match(r'^\s*(?:\d+[\.\)]\s*)?\**([^:*]+?)\**\s*:\s*(.+)$', line)
+            if match:
+                term = by_name.get(match.group(1).strip().lower())
+                if term and term not in parsed:
+                    parsed[term] = match.group(2).strip()
+        return parsed
+
+    @staticmethod
+    def _looks_french(answer: str) -> bool:
+        return any(word in answer.lower().split() for word in FRENCH_INDICATORS)
+
+    @staticmethod
+    def _full_question(question: str, report_context: str = "") -> str:
+        if report_context:
+            return f"Based on this medical report excerpt: {report_context[:400]}...\n\nQuestion (answer in English): {question}"
+        return f"Answer in English: {question}"
+
+    def template_explanations(self, terms_data: List[Dict]) -> Dict[str, str]:
+        return {term_data['term']: template_explanation(self.lookup, term_data['term']) for term_data in terms_data}
     
-    def answer_question(self, question: str, report_context: str = "") -> Dict:
-        """Answer a question about the medical report"""
+    def answer_question(
+        self,
+        question: str,
+        report_context: str = "",
+        chat_history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict:
+        """Answer a question about the medical report, given the caller's (question, answer) history"""
         try:
-            full_question = f"Answer in English: {question}"
-            if report_context:
-                full_question = f"Based on this medical report excerpt: {report_context[:400]}...\n\nQuestion (answer in English): {question}"
+            full_question = self._full_question(question, report_context)
             
-            result = self.qa_chain({"question": full_question})
+            result = self.llm_guard.call_sync(
+                lambda: self.qa_chain({"question": full_question, "chat_history": chat_history or []})
+            )
             
             return {
                 "answer": result["answer"],
@@ -164,5 +833,100 @@ class MedicalRAGPipeline:
             logger.error(f"Error answering question: {e}")
             return {
                 "answer": "I'm having trouble answering this question. Please try rephrasing it.",
-                "sources": []
+                "sources": [],
+                "error": str(e)
+            }
+
+    async def aanswer_question(
+        self,
+        question: str,
+        report_context: str = "",
+        chat_history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict:
+        """Async variant of answer_question"""
+        try:
+            full_question = self._full_question(question, report_context)
+
+            result = await self._acall_chain({"question": full_question, "chat_history": chat_history or []})
+
+            return {
+                "answer": result["answer"],
+                "sources": [doc.page_content for doc in result.get("source_documents", [])]
+            }
+
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            return {
+                "answer": "I'm having trouble answering this question. Please try rephrasing it.",
+                "sources": [],
+                "error": str(e)
             }
+
+    async def astream_answer(
+        self,
+        question: str,
+        report_context: str = "",
+        chat_history: Optional[List[Tuple[str, str]]] = None
+    ) -> AsyncIterator[Dict]:
+        """Stream an answer: one ``sources`` event, then ``token`` events as the LLM generates them"""
+        full_question = self._full_question(question, report_context)
+        try:
+            docs = (await asyncio.to_thread(self.retrieve, [full_question]))[0]
+        except Exception as e:
+            logger.error(f"Retrieval failed while streaming: {e}")
+            docs = []
+        yield {"type": "sources", "sources": [doc.page_content for doc in docs]}
+
+        prompt = QA_PROMPT_TEMPLATE.format(
+            context="\n\n".join(doc.page_content for doc in docs),
+            chat_history="\n".join(
+                f"Human: {human}\nAssistant: {ai}" for human, ai in chat_history or []
+            ),
+            question=full_question
+        )
+        try:
+            async for chunk in self.llm_guard.stream(
+                lambda: self.llm.astream(prompt, config={"metadata": {"stage": "answer_stream"}}),
+                self._llm_slot,
+                stage="answer_stream"
+            ):
+                text = getattr(chunk, "content", chunk)
+                if text:
+                    yield {"type": "token", "text": text}
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            yield {"type": "error", "text": "I'm having trouble answering this question. Please try rephrasing it."}
+
+
+def create_pipeline(config, knowledge_path: Optional[str] = None) -> MedicalRAGPipeline:
+    """Build a ready-to-use pipeline, loading the saved index if it is current or updating it"""
+    medical_docs = load_documents(knowledge_path or config.KNOWLEDGE_PATH)
+
+    pipeline = MedicalRAGPipeline(config)
+    if pipeline.index_is_current(medical_docs):
+        pipeline.load_knowledge_base()
+    else:
+        pipeline.update_knowledge_base(medical_docs)
+    pipeline.setup_qa_chain()
+    return pipeline
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.config import get_settings
+
+    parser = argparse.ArgumentParser(description="Build or incrementally update the saved knowledge-base index")
+    parser.add_argument("--full", action="store_true", help="Rebuild every document instead of only changed ones")
+    parser.add_argument("--if-stale", action="store_true", help="Leave the index alone if it is current (as the API would)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    pipeline = MedicalRAGPipeline(settings)
+    documents = load_documents(settings.KNOWLEDGE_PATH)
+    if args.if_stale and pipeline.index_is_current(documents):
+        logger.info("Index is current")
+    elif args.full:
+        pipeline.build_knowledge_base(documents)
+    else:
+        logger.info(f"Index update: {pipeline.update_knowledge_base(documents)}")
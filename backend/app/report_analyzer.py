@@ -0,0 +1,304 @@
+import asyncio
+import re
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import logging
+
+from app.metrics import span
+from app.models import ReportAnalysis, MedicalTerm
+from app.pdf_tables import PDFSource
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the summary prompt changes so cached report results are regenerated
+SUMMARY_PROMPT_VERSION = "1"
+ANALYSIS_MODES = ("llm", "fast", "auto")
+
+
+def timed(timings: Optional[Dict[str, float]], stage: str):
+    """Record how long a stage took (in seconds) into ``timings`` and the stage metrics"""
+    return span(stage, timings)
+
+
+def detect_gender(cleaned_text: str) -> Optional[str]:
+    text = cleaned_text.lower()
+    if any(x in text for x in [' female', '/f', 'f/', ' f ']):
+        return 'female'
+    if any(x in text for x in [' male', '/m', 'm/', ' m ']):
+        return 'male'
+    return None
+
+
+AGE_PATTERN = re.compile(
+    r'\bAge(?:\s*/\s*(?:Gender|Sex))?\s*[:\-]?\s*(\d{1,3})\s*(?:Y\b|Yrs?\b|Years?\b)',
+    re.IGNORECASE
+)
+
+
+def detect_age(cleaned_text: str) -> Optional[int]:
+    """Patient age in years from an "Age: 34 Years" / "Age/Gender 20Y/F" style header"""
+    match = AGE_PATTERN.search(cleaned_text)
+    return int(match.group(1)) if match else None
+
+
+class ReportAnalyzer:
+    """Run the PDFProcessor -> ValueAnalyzer -> MedicalRAGPipeline stages for one report"""
+
+    def __init__(self, pdf_processor, value_analyzer, rag_pipeline):
+        self.pdf_processor = pdf_processor
+        self.value_analyzer = value_analyzer
+        self.rag_pipeline = rag_pipeline
+
+    def extract(self, source: PDFSource) -> Tuple[str, Optional[str], List[Dict]]:
+        """Extract cleaned text, detected gender and raw term records from a PDF"""
+        page_texts = []
+        terms_data = []
+        for page, new_terms in self.pdf_processor.iter_medical_terms(source):
+            page_texts.append(page['text'])
+            terms_data.extend(new_terms)
+
+        with span("clean_text"):
+            cleaned_text = self.pdf_processor.clean_text("\n".join(page_texts))
+        logger.info(f"Successfully extracted {len(cleaned_text)} characters from {len(page_texts)} pages")
+        gender = detect_gender(cleaned_text)
+        logger.info(f"Detected gender: {gender}")
+        logger.info(f"Found {len(terms_data)} medical terms")
+        return cleaned_text, gender, terms_data
+
+    def analyze_values(
+        self,
+        terms_data: List[Dict],
+        gender: Optional[str] = None,
+        age: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        """Check every parsed value of the report against its reference range in one batch"""
+        statuses = {term_data['term']: {"is_abnormal": False} for term_data in terms_data}
+        parsed = []
+        for term_data in terms_data:
+            if term_data['value']:
+                try:
+                    parsed.append((term_data, float(term_data['value'])))
+                except ValueError:
+                    logger.warning(f"Could not parse value: {term_data['value']}")
+
+        results = self.value_analyzer.analyze_values(
+            [term_data['term'] for term_data, _ in parsed],
+            [value for _, value in parsed],
+            [term_data['unit'] for term_data, _ in parsed],
+            ages=age,
+            genders=gender
+        )
+        for (term_data, _), status_info in zip(parsed, results):
+            statuses[term_data['term']] = status_info
+        return statuses
+
+    @staticmethod
+    def build_term(term_data: Dict, explanation: str, status_info: Dict) -> MedicalTerm:
+        return MedicalTerm(
+            term=term_data['term'],
+            value=term_data['value'],
+            unit=term_data['unit'],
+            explanation=explanation,
+            is_abnormal=status_info.get('is_abnormal', False),
+            status=status_info.get('status')
+        )
+
+    @staticmethod
+    def findings(medical_terms: List[MedicalTerm]) -> Tuple[List[str], List[str]]:
+        abnormal_findings = [
+            f"{term.term} is {term.status.upper()} at {term.value} {term.unit}"
+            for term in medical_terms
+            if term.is_abnormal and term.value
+        ]
+
+        normal_findings = [
+            f"{term.term}: {term.value} {term.unit}"
+            for term in medical_terms
+            if not term.is_abnormal and term.value
+        ]
+        return abnormal_findings, normal_findings
+
+    def summary_prompt(self, medical_terms: List[MedicalTerm], cleaned_text: str) -> str:
+        abnormal_findings, normal_findings = self.findings(medical_terms)
+
+        findings_summary = f"""Test Results Summary:
+- Total tests: {len(medical_terms)}
+- Abnormal values: {len(abnormal_findings)}
+- Normal values: {len(normal_findings)}
+
+Key Abnormal Results:
+{chr(10).join(['• ' + f for f in abnormal_findings[:5]]) if abnormal_findings else '• All values within normal range'}
+
+Sample Normal Results:
+{chr(10).join(['• ' + f for f in normal_findings[:3]]) if normal_findings else ''}
+"""
+
+        return f"""You are a medical assistant. Based on this blood test report, write a clear summary in 4-5 bullet points for the patient.
+
+{findings_summary}
+
+Report Context:
+{cleaned_text[:500]}
+
+Write 4-5 bullet points that:
+• State what type of tests were performed
+• Highlight any abnormal values and briefly explain what they might indicate
+• Mention important normal values
+• Suggest next steps or what to discuss with doctor
+
+Use simple, empathetic English. Format as bullet points starting with •."""
+
+    def template_summary(self, medical_terms: List[MedicalTerm], statuses: Optional[Dict[str, Dict]] = None) -> str:
+        """Summarize the findings without the LLM, from the range checks alone"""
+        statuses = statuses or {}
+        measured = [term for term in medical_terms if term.value]
+        abnormal = [term for term in measured if term.is_abnormal]
+        normal = [term for term in measured if not term.is_abnormal]
+
+        def finding(term: MedicalTerm) -> str:
+            text = f"{term.term} is {term.status or 'abnormal'} at {term.value} {term.unit or ''}".rstrip()
+            reference_range = statuses.get(term.term, {}).get('reference_range')
+            return f"{text} (normal: {reference_range})" if reference_range else text
+
+        names = ", ".join(term.term for term in medical_terms[:6])
+        more = f" and {len(medical_terms) - 6} more" if len(medical_terms) > 6 else ""
+        bullets = [f"• Your report includes {len(medical_terms)} test results: {names}{more}."]
+        if abnormal:
+            bullets.append(f"• {len(abnormal)} value(s) are outside the normal range: {'; '.join(finding(term) for term in abnormal[:5])}.")
+        elif measured:
+            bullets.append("• All measured values are within their normal ranges.")
+        if normal:
+            bullets.append(f"• {len(normal)} value(s) are within normal limits, including {', '.join(term.term for term in normal[:3])}.")
+        bullets.append("• Please discuss these results with your doctor, especially any values outside the normal range.")
+        return "\n".join(bullets)
+
+    async def summarize(
+        self,
+        medical_terms: List[MedicalTerm],
+        cleaned_text: str,
+        statuses: Optional[Dict[str, Dict]] = None
+    ) -> str:
+        logger.info("Generating key findings summary...")
+        try:
+            summary_result = await self.rag_pipeline.aanswer_question(
+                self.summary_prompt(medical_terms, cleaned_text),
+                cleaned_text[:400]
+            )
+            if summary_result.get('error'):
+                return self.template_summary(medical_terms, statuses)
+            return summary_result['answer']
+        except Exception as e:
+            logger.error(f"Summary generation failed: {e}")
+            return self.template_summary(medical_terms, statuses)
+
+    async def analyze(
+        self,
+        source: PDFSource,
+        timings: Optional[Dict[str, float]] = None,
+        fast: bool = False
+    ) -> ReportAnalysis:
+        """Analyze a PDF report, recording per-stage timings if a dict is given.
+
+        ``fast`` skips the LLM: explanations and summary come from the knowledge sections
+        and range checks, in milliseconds.
+        """
+        with timed(timings, "extraction"):
+            cleaned_text, gender, terms_data = await asyncio.to_thread(self.extract, source)
+
+        with timed(timings, "value_analysis"):
+            statuses = self.analyze_values(terms_data, gender, detect_age(cleaned_text))
+
+        with timed(timings, "explanations"):
+            if fast:
+                explanations = self.rag_pipeline.template_explanations(terms_data)
+            else:
+                explanations = await self.rag_pipeline.aexplain_terms(terms_data)
+
+        return await self.finish(cleaned_text, terms_data, statuses, explanations, timings, summarize=not fast)
+
+    async def finish(
+        self,
+        cleaned_text: str,
+        terms_data: List[Dict],
+        statuses: Dict[str, Dict],
+        explanations: Dict[str, str],
+        timings: Optional[Dict[str, float]] = None,
+        summarize: bool = True
+    ) -> ReportAnalysis:
+        """Assemble the ReportAnalysis from already extracted, checked and explained terms"""
+        medical_terms = []
+        for term_data in terms_data:
+            try:
+                medical_terms.append(self.build_term(
+                    term_data,
+                    explanations[term_data['term']],
+                    statuses[term_data['term']]
+                ))
+            except Exception as e:
+                logger.error(f"Error processing {term_data['term']}: {e}")
+                continue
+
+        with timed(timings, "summary"):
+            if summarize:
+                summary_text = await self.summarize(medical_terms, cleaned_text, statuses)
+            else:
+                summary_text = self.template_summary(medical_terms, statuses)
+
+        return ReportAnalysis(
+            extracted_text=cleaned_text[:1000],
+            medical_terms=medical_terms,
+            summary=summary_text,
+            mode="llm" if summarize else "fast"
+        )
+
+    async def stream(self, source: PDFSource, fast: bool = False) -> AsyncIterator[Dict]:
+        """Analyze a PDF, yielding each term as soon as it is explained and then the summary tokens"""
+        cleaned_text, gender, terms_data = await asyncio.to_thread(self.extract, source)
+        statuses = self.analyze_values(terms_data, gender, detect_age(cleaned_text))
+        yield {"type": "extracted", "terms": len(terms_data), "gender": gender}
+
+        by_term = {term_data['term']: term_data for term_data in terms_data}
+        explanations = {}
+        if fast:
+            ready_explanations = self._ready(self.rag_pipeline.template_explanations(terms_data))
+        else:
+            ready_explanations = self.rag_pipeline.aiter_explanations(terms_data)
+        async for ready in ready_explanations:
+            for term, explanation in ready.items():
+                explanations[term] = explanation
+                medical_term = self.build_term(by_term[term], explanation, statuses[term])
+                yield {"type": "term", "term": medical_term.model_dump()}
+
+        medical_terms = [
+            self.build_term(term_data, explanations[term_data['term']], statuses[term_data['term']])
+            for term_data in terms_data
+        ]
+
+        summary_parts = []
+        if not fast:
+            async for event in self.rag_pipeline.astream_answer(
+                self.summary_prompt(medical_terms, cleaned_text),
+                cleaned_text[:400]
+            ):
+                if event["type"] == "token":
+                    summary_parts.append(event["text"])
+                    yield {"type": "summary_token", "text": event["text"]}
+
+        summary_text = "".join(summary_parts)
+        if not summary_text:
+            summary_text = self.template_summary(medical_terms, statuses)
+            yield {"type": "summary_token", "text": summary_text}
+
+        yield {
+            "type": "done",
+            "analysis": ReportAnalysis(
+                extracted_text=cleaned_text[:1000],
+                medical_terms=medical_terms,
+                summary=summary_text,
+                mode="fast" if fast else "llm"
+            )
+        }
+
+    @staticmethod
+    async def _ready(explanations: Dict[str, str]) -> AsyncIterator[Dict[str, str]]:
+        yield explanations
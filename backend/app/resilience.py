@@ -0,0 +1,364 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager, nullcontext
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+import logging
+
+from app.metrics import LLM_RETRIES, LLM_SHORT_CIRCUITS, current_stage
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LLMUnavailable(Exception):
+    """Raised instead of waiting on the LLM; callers fall back to templates"""
+
+
+class CircuitOpen(LLMUnavailable):
+    """Raised while the circuit breaker is open"""
+
+
+class BudgetExhausted(LLMUnavailable):
+    """Raised once the current request's LLM budget is spent"""
+
+
+class RequestBudget:
+    """Wall-clock allowance for all the LLM calls made on behalf of one request"""
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds if seconds > 0 else None
+        # Set when any LLM call under this budget failed, i.e. the result contains fallbacks
+        self.degraded = False
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+
+_budget: contextvars.ContextVar[Optional[RequestBudget]] = contextvars.ContextVar("llm_budget", default=None)
+
+
+@contextmanager
+def request_budget(seconds: float) -> Iterator[RequestBudget]:
+    """Bound the LLM calls made inside the block (including from tasks it starts) to ``seconds`` in total"""
+    budget = RequestBudget(seconds)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def _mark_degraded():
+    budget = _budget.get()
+    if budget is not None:
+        budget.degraded = True
+
+
+class CircuitBreaker:
+    """Stops calling a failing provider.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls fail fast
+    for ``reset_seconds``; then a single trial call is let through (half-open), which closes
+    the circuit on success or opens it again on failure. A threshold of 0 disables it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Open and not yet due for a trial call"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_seconds
+
+    def allow(self) -> bool:
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    return False
+                self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("LLM circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                # Late failures of calls admitted before it opened don't extend the open window
+                if self.state != self.OPEN:
+                    logger.warning(f"LLM circuit open after {self.failures} failures, using fallbacks for {self.reset_seconds:g}s")
+                    self.times_opened += 1
+                    self.opened_at = time.monotonic()
+                self.state = self.OPEN
+
+    def release(self):
+        """Give back a trial call that ended without a verdict (cancelled or out of budget)"""
+        with self._lock:
+            self._trial = False
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.OPEN if self.is_open else (self.CLOSED if self.state == self.CLOSED else self.HALF_OPEN),
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+        }
+
+
+class LLMGuard:
+    """Per-call deadlines, retries with jittered exponential backoff, a circuit breaker and
+    optional hedging around LLM calls, all within the current request budget if there is one.
+
+    Calls that cannot be made (open circuit, spent budget) raise LLMUnavailable at once, and
+    calls that still fail after their retries re-raise the last error, so callers keep their
+    existing template fallbacks.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 0,
+        max_retries: int = 0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge_delay: float = 0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_delay = hedge_delay
+        self.breaker = breaker or CircuitBreaker(0, 0)
+        self._sync_pool = None
+
+    @classmethod
+    def from_config(cls, config) -> "LLMGuard":
+        return cls(
+            timeout=config.LLM_TIMEOUT,
+            max_retries=config.LLM_MAX_RETRIES,
+            backoff_base=config.LLM_BACKOFF_BASE,
+            backoff_max=config.LLM_BACKOFF_MAX,
+            hedge_delay=config.LLM_HEDGE_DELAY,
+            breaker=CircuitBreaker(config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_RESET_SECONDS)
+        )
+
+    def _admit(self, stage: str):
+        budget = _budget.get()
+        if budget is not None and budget.remaining() == 0:
+            reason, error = "budget", BudgetExhausted("Request LLM budget spent")
+        elif not self.breaker.allow():
+            reason, error = "circuit_open", CircuitOpen("LLM circuit open")
+        else:
+            return
+        LLM_SHORT_CIRCUITS.inc(stage=stage, reason=reason)
+        _mark_degraded()
+        raise error
+
+    async def _within_deadline(self, call: Awaitable[T]) -> T:
+        """Await ``call`` for at most LLM_TIMEOUT or the budget left, whichever is shorter"""
+        limit = self.timeout or None
+        budget = _budget.get()
+        remaining = budget.remaining() if budget is not None else None
+        if remaining is not None and (limit is None or remaining < limit):
+            try:
+                return await asyncio.wait_for(call, remaining)
+            except asyncio.TimeoutError:
+                raise BudgetExhausted("Request LLM budget spent waiting for the LLM")
+        if limit is None:
+            return await call
+        return await asyncio.wait_for(call, limit)
+
+    def _retry_delay(self, error: Exception, attempt: int, stage: str) -> Optional[float]:
+        """Seconds to back off before retrying after ``error``, or None to give up"""
+        if attempt >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        budget = _budget.get()
+        if budget is not None and budget.remaining() is not None and delay >= budget.remaining():
+            return None
+        reason = "timeout" if isinstance(error, asyncio.TimeoutError) else "error"
+        LLM_RETRIES.inc(stage=stage, reason=reason)
+        logger.warning(f"LLM call failed ({reason}: {error!r}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    async def call(self, request: Callable[[], Awaitable[T]], slot: Callable = nullcontext) -> T:
+        """Await ``request()`` (made afresh for each attempt) inside ``slot()``, with the full policy"""
+        stage = current_stage.get()
+        attempt = 0
+        while True:
+            self._admit(stage)
+            try:
+                result = await self._attempt(request, slot, stage)
+            except LLMUnavailable:
+                self.breaker.release()
+                _mark_degraded()
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                delay = self._retry_delay(e, attempt, stage)
+                if delay is None:
+                    _mark_degraded()
+                    raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _attempt(self, request: Callable[[], Awaitable[T]], slot: Callable, stage: str) -> T:
+        async def once():
+            async with slot():
+                return await self._within_deadline(request())
+
+        # Hedge only against a healthy provider; a failing one would just get twice the load
+        if not self.hedge_delay or self.breaker.state != CircuitBreaker.CLOSED:
+            return await once()
+
+        tasks = [asyncio.ensure_future(once())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                LLM_RETRIES.inc(stage=stage, reason="hedge")
+                tasks.append(asyncio.ensure_future(once()))
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # The first success wins, even if the other copy failed in the same round
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    # Every copy failed: raise the failure like an unhedged call would
+                    return next(iter(done)).result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(
+        self,
+        request: Callable[[], AsyncIterator[T]],
+        slot: Callable = nullcontext,
+        stage: Optional[str] = None
+    ) -> AsyncIterator[T]:
+        """Stream ``request()`` inside ``slot()``.
+
+        The deadline covers the wait for the first chunk. Streams are not retried or hedged:
+        once a token has been sent there is no taking it back.
+        """
+        stage = stage or current_stage.get()
+        self._admit(stage)
+        chunks = request().__aiter__()
+        try:
+            async with slot():
+                try:
+                    first = await self._within_deadline(chunks.__anext__())
+                except StopAsyncIteration:
+                    self.breaker.record_success()
+                    return
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+        except LLMUnavailable:
+            self.breaker.release()
+            _mark_degraded()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            _mark_degraded()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        self.breaker.record_success()
+
+    def _within_deadline_sync(self, request: Callable[[], T]) -> T:
+        """Run ``request()`` for at most LLM_TIMEOUT or the budget left.
+
+        The call runs on a helper thread so the caller can stop waiting; a call that overruns
+        is abandoned there, since a blocking client call can't be interrupted.
+        """
+        limit = self.timeout or None
+        budget = _budget.get()
+        remaining = budget.remaining() if budget is not None else None
+        if remaining is not None and (limit is None or remaining < limit):
+            limit, error = remaining, BudgetExhausted("Request LLM budget spent waiting for the LLM")
+        else:
+            error = None
+        if limit is None:
+            return request()
+
+        if self._sync_pool is None:
+            self._sync_pool = ThreadPoolExecutor(thread_name_prefix="llm-call")
+        future = self._sync_pool.submit(contextvars.copy_context().run, request)
+        try:
+            return future.result(timeout=limit)
+        except FutureTimeout:
+            future.cancel()
+            if error is not None:
+                raise error
+            raise
+
+    def call_sync(self, request: Callable[[], T]) -> T:
+        """Blocking variant for the synchronous pipeline methods (CLIs, cache warm-up): no hedging"""
+        stage = current_stage.get()
+        attempt = 0
+        while True:
+            self._admit(stage)
+            try:
+                result = self._within_deadline_sync(request)
+            except LLMUnavailable:
+                self.breaker.release()
+                _mark_degraded()
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                delay = self._retry_delay(e, attempt, stage)
+                if delay is None:
+                    _mark_degraded()
+                    raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            time.sleep(delay)
+            attempt += 1
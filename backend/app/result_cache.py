@@ -0,0 +1,136 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import logging
+
+from app.models import ReportAnalysis
+
+
+logger = logging.getLogger(__name__)
+
+
+def _expand(paths: List[str]) -> List[str]:
+    """Replace directories with the files inside them"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names))
+        else:
+            files.append(path)
+    return files
+
+
+def file_fingerprint(paths: List[str]) -> str:
+    """Hash the contents of the given files or directories (missing files hash as empty)"""
+    digest = hashlib.sha256()
+    for path in _expand(paths):
+        digest.update(path.encode())
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class ReportResultCache:
+    """LRU cache of ReportAnalysis results keyed by the SHA-256 of the uploaded PDF.
+
+    Entries are only valid for one ``version`` (model/prompt versions plus a fingerprint of
+    the reference ranges and knowledge base). ``source_paths`` are re-fingerprinted at most
+    every ``check_interval`` seconds and the cache is cleared when any of them changes.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        source_paths: List[str],
+        max_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        check_interval: float = 30
+    ):
+        self.base_version = version
+        self.source_paths = source_paths
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._source_mtimes = self._mtimes()
+        self._last_check = time.monotonic()
+        self.version = f"{version}:{file_fingerprint(source_paths)}"
+
+    def _mtimes(self) -> Dict[str, float]:
+        return {path: os.path.getmtime(path) if os.path.exists(path) else 0.0 for path in _expand(self.source_paths)}
+
+    def check_sources(self, force: bool = False):
+        """Invalidate everything if the reference ranges or knowledge base changed on disk"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        mtimes = self._mtimes()
+        if mtimes == self._source_mtimes:
+            return
+        self._source_mtimes = mtimes
+
+        version = f"{self.base_version}:{file_fingerprint(self.source_paths)}"
+        if version != self.version:
+            logger.info("Report sources changed, invalidating cached results")
+            self.invalidate()
+            self.version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def get(self, content_hash: str) -> Optional[ReportAnalysis]:
+        self.check_sources()
+        key = f"{self.version}:{content_hash}"
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return ReportAnalysis.model_validate_json(payload)
+
+    def put(self, content_hash: str, analysis: ReportAnalysis):
+        payload = analysis.model_dump_json()
+        if len(payload) > self.max_bytes:
+            return
+
+        key = f"{self.version}:{content_hash}"
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = payload
+            self._bytes += len(payload)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "invalidations": self.invalidations,
+            "version": self.version,
+        }
@@ -0,0 +1,14 @@
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+class PipelineRetriever(BaseRetriever):
+    """Retriever for the QA chain that goes through MedicalRAGPipeline.retrieve and its query cache"""
+
+    pipeline: Any
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.pipeline.retrieve([query])[0]
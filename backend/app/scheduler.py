@@ -0,0 +1,63 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerSaturated(Exception):
+    """Raised when too many LLM calls are already waiting for a slot"""
+
+
+class LLMScheduler:
+    """Caps in-flight LLM calls and rejects new work once the wait queue is full"""
+
+    def __init__(self, max_in_flight: int, max_pending: int = 0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.in_flight = 0
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def saturated(self) -> bool:
+        return bool(self.max_pending) and self.pending >= self.max_pending
+
+    def check(self):
+        """Raise ``SchedulerSaturated`` instead of queueing more work behind a full scheduler"""
+        if self.saturated:
+            self.rejected += 1
+            logger.warning(f"LLM scheduler saturated ({self.in_flight} in flight, {self.pending} pending)")
+            raise SchedulerSaturated(
+                f"{self.pending} LLM calls already waiting, try again shortly"
+            )
+
+    @asynccontextmanager
+    async def slot(self):
+        self.pending += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.pending -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
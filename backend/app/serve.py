@@ -0,0 +1,96 @@
+"""Serve the API from several worker processes sharing one embedding model and one index.
+
+    python -m app.serve --workers 8
+
+Starts the embedding server (``python -m app.embedding_server``), brings the saved index up
+to date once (``python -m app.rag_pipeline --if-stale``), then runs uvicorn workers that
+embed through the server and memory-map the same read-only index files. The model is
+loaded once per node, and the index pages are shared between workers through the page
+cache, so adding workers adds little memory beyond each worker's Python heap.
+
+With more than one worker, job records and chat sessions go to SQLite files in a temporary
+``SHARED_STATE_DIR`` (unless one is set), so any worker can answer ``GET /jobs/{id}`` and
+continue a chat session; ``POST /knowledge/reload`` may hit any worker, which rebuilds under a
+file lock while the others pick the new index up within ``INDEX_RELOAD_INTERVAL``.
+
+Under gunicorn (``-k uvicorn.workers.UvicornWorker``) or another process manager, run the
+embedding server and the index update yourself and set ``EMBEDDING_SERVER_SOCKET`` and
+``SHARED_STATE_DIR`` for the workers.
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import logging
+
+from app.config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+SERVER_START_TIMEOUT = 300
+
+
+def _wait_for_socket(path: str, server: subprocess.Popen, timeout: float):
+    """Block until the embedding server accepts connections (it loads the model first)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Embedding server exited with status {server.returncode}")
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.connect(path)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Embedding server not ready on {path} after {timeout:g}s")
+
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the API with several workers sharing one embedding model and index")
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--socket", default=settings.EMBEDDING_SERVER_SOCKET, help="Embedding server socket path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    cpus = os.cpu_count() or 1
+    workers = args.workers or cpus
+    socket_path = args.socket or os.path.join(tempfile.gettempdir(), f"medical-embeddings-{os.getpid()}.sock")
+
+    env = dict(os.environ, EMBEDDING_SERVER_SOCKET=socket_path)
+    if not settings.PDF_PAGE_WORKERS:
+        # Each worker would otherwise start a page pool with one process per CPU
+        env["PDF_PAGE_WORKERS"] = str(max(1, cpus // workers))
+    state_dir = None
+    if workers > 1 and not settings.SHARED_STATE_DIR:
+        state_dir = tempfile.mkdtemp(prefix="medical-state-")
+        env["SHARED_STATE_DIR"] = state_dir
+
+    server = subprocess.Popen([sys.executable, "-m", "app.embedding_server", "--socket", socket_path])
+    try:
+        _wait_for_socket(socket_path, server, SERVER_START_TIMEOUT)
+        # One process builds or updates the index, so workers only ever load it
+        subprocess.run([sys.executable, "-m", "app.rag_pipeline", "--if-stale"], env=env, check=True)
+
+        import uvicorn
+
+        # Workers are spawned from this process and read their settings from the environment
+        os.environ.update(env)
+        logger.info(f"Starting {workers} workers on {args.host}:{args.port}")
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=workers)
+    finally:
+        server.terminate()
+        server.wait()
+        if state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
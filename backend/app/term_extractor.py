@@ -0,0 +1,131 @@
+import re
+from typing import Dict, List, Tuple
+
+
+# Checked in order; the first unit pattern found in the context wins
+UNIT_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in [
+        r'(\d+\.?\d*)\s*(g/dL|g/dl|gm/dl)',
+        r'(\d+\.?\d*)\s*(mm/hr|mm/h)',
+        r'(\d+\.?\d*)\s*(10\^3/uL|x10\^3/uL|10\^3/µL)',
+        r'(\d+\.?\d*)\s*(million/cumm|10\^6/µL)',
+        r'(\d+\.?\d*)\s*(Cells/cumm|cells/µL|10\^3/µL)',
+        r'(\d+\.?\d*)\s*(%)',
+        r'(\d+\.?\d*)\s*(um\^3|fL|fl)',
+        r'(\d+\.?\d*)\s*(mg/dL|mg/dl|mmol/L)',
+        r'(\d+\.?\d*)\s*([a-zA-Z]+/[a-zA-Z]+)',
+    ]
+]
+NUMBER_PATTERN = re.compile(r'(\d+\.?\d*)')
+
+CONTEXT_CHARS = 100
+
+
+def extract_value_and_unit(context: str) -> Tuple[str, str]:
+    """Extract numeric value and unit from context"""
+    for pattern in UNIT_PATTERNS:
+        match = pattern.search(context)
+        if match:
+            return match.group(1), match.group(2)
+
+    number_match = NUMBER_PATTERN.search(context)
+    if number_match:
+        return number_match.group(1), ""
+
+    return "", ""
+
+
+class TermExtractor:
+    """Find the first occurrence of every catalog term in a single scan of the text.
+
+    Each pattern in the catalog has the form ``\\b(alias|alias|...)\\b``. All aliases are
+    indexed by their leading word, one trie-shaped regex over those words finds every
+    position where any alias could start, and only the handful of terms sharing that
+    leading word are tried there. The records returned are identical to running every
+    pattern with ``re.finditer`` and keeping its first match.
+    """
+
+    def __init__(self, patterns: Dict[str, str]):
+        self.terms = list(patterns)
+        self._order = {term: i for i, term in enumerate(self.terms)}
+        self._term_patterns = {
+            term: re.compile(pattern, re.IGNORECASE) for term, pattern in patterns.items()
+        }
+
+        self._by_lead: Dict[str, List[str]] = {}
+        for term, pattern in patterns.items():
+            for alias in self._aliases(pattern):
+                lead = re.match(r'\w+', alias).group(0).lower()
+                candidates = self._by_lead.setdefault(lead, [])
+                if term not in candidates:
+                    candidates.append(term)
+
+        self._lead_pattern = re.compile(
+            r'\b' + self._trie_regex(self._by_lead) + r'\b',
+            re.IGNORECASE
+        )
+
+    @staticmethod
+    def _aliases(pattern: str) -> List[str]:
+        body = re.fullmatch(r'\\b\((.*)\)\\b', pattern)
+        if not body:
+            raise ValueError(f"Unsupported term pattern: {pattern}")
+        return [alias.replace('\\.', '.') for alias in body.group(1).split('|')]
+
+    @classmethod
+    def _trie_regex(cls, words) -> str:
+        """Build a regex from a character trie of ``words`` so the scan never backtracks across alternatives"""
+        trie: Dict = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        return cls._trie_node_regex(trie)
+
+    @classmethod
+    def _trie_node_regex(cls, node: Dict) -> str:
+        branches = [re.escape(char) + cls._trie_node_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        regex = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            regex = '(?:' + regex + ')?'
+        return regex
+
+    def find_first_matches(self, text: str) -> Dict[str, Tuple[int, int]]:
+        """Return the span of the first match of each term present in ``text``"""
+        found: Dict[str, Tuple[int, int]] = {}
+        for candidate in self._lead_pattern.finditer(text):
+            start = candidate.start()
+            for term in self._by_lead[candidate.group(0).lower()]:
+                if term in found:
+                    continue
+                match = self._term_patterns[term].match(text, start)
+                if match:
+                    found[term] = match.span()
+            if len(found) == len(self.terms):
+                break
+        return found
+
+    def extract(self, text: str) -> List[Dict]:
+        """Extract medical terms with their values and context"""
+        found = self.find_first_matches(text)
+
+        terms_found = []
+        for term in sorted(found, key=self._order.__getitem__):
+            match_start, match_end = found[term]
+            start = max(0, match_start - CONTEXT_CHARS)
+            end = min(len(text), match_end + CONTEXT_CHARS)
+            context = text[start:end]
+
+            value, unit = extract_value_and_unit(context)
+
+            terms_found.append({
+                'term': term,
+                'value': value,
+                'unit': unit,
+                'context': context.strip()
+            })
+
+        return terms_found
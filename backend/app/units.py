@@ -0,0 +1,165 @@
+import re
+from typing import Dict, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+# Spellings seen in lab reports, after lower-casing, µ -> u and dropping spaces
+UNIT_ALIASES = {
+    'gm/dl': 'g/dl', 'gm%': 'g/dl', 'g%': 'g/dl', 'gms/dl': 'g/dl',
+    'mm/h': 'mm/hr', 'mm/1sthr': 'mm/hr', 'mm/1sthour': 'mm/hr',
+    'um^3': 'fl', 'cu.microns': 'fl',
+    'mcg/dl': 'ug/dl', 'mcg/l': 'ug/l', 'mcg/ml': 'ug/ml',
+    'iu/l': 'u/l', 'uiu/ml': 'miu/l',
+    'k/ul': '10^3/ul', 'thou/ul': '10^3/ul', 'thousand/ul': '10^3/ul', '10*3/ul': '10^3/ul', '10e3/ul': '10^3/ul',
+    'm/ul': '10^6/ul', 'mill/ul': '10^6/ul', 'million/ul': '10^6/ul', '10*6/ul': '10^6/ul', '10e6/ul': '10^6/ul',
+    'lakh/ul': '10^5/ul', 'lakhs/ul': '10^5/ul',
+    '10^9/l': '10^3/ul', '10^12/l': '10^6/ul',
+    'cells/ul': '/ul',
+}
+
+# Unit -> (dimension, factor to the dimension's base unit)
+UNIT_SCALES = {
+    # mass concentration, base g/L
+    'g/l': ('mass_conc', 1.0), 'g/dl': ('mass_conc', 10.0), 'mg/dl': ('mass_conc', 1e-2),
+    'mg/l': ('mass_conc', 1e-3), 'ug/ml': ('mass_conc', 1e-3), 'ug/dl': ('mass_conc', 1e-5),
+    'ug/l': ('mass_conc', 1e-6), 'ng/ml': ('mass_conc', 1e-6), 'ng/dl': ('mass_conc', 1e-8),
+    'pg/ml': ('mass_conc', 1e-9), 'ng/l': ('mass_conc', 1e-9),
+    # amount concentration, base mol/L
+    'mol/l': ('molar', 1.0), 'mmol/l': ('molar', 1e-3), 'umol/l': ('molar', 1e-6),
+    'nmol/l': ('molar', 1e-9), 'pmol/l': ('molar', 1e-12),
+    'meq/l': ('equivalent', 1e-3),
+    # cell counts, base cells/uL
+    '/ul': ('count', 1.0), '10^3/ul': ('count', 1e3), '10^5/ul': ('count', 1e5), '10^6/ul': ('count', 1e6),
+    # fractions, base L/L
+    '%': ('fraction', 1e-2), 'l/l': ('fraction', 1.0),
+    # enzyme activity, base U/L
+    'u/l': ('activity', 1.0), 'ukat/l': ('activity', 60.0),
+    # hormone units, base mIU/L (1 mIU/mL = 1 IU/L = 1000 mIU/L)
+    'miu/l': ('hormone', 1.0), 'miu/ml': ('hormone', 1e3), 'iu/ml': ('hormone', 1e6),
+    'fl': ('volume', 1.0), 'pg': ('mass', 1.0), 'mm/hr': ('rate', 1.0),
+    'mmol/mol': ('ifcc', 1.0),
+}
+
+# g/mol used to convert between mass and amount concentrations (BUN is urea nitrogen, N2;
+# hemoglobin is per heme monomer, the basis of mmol/L reports)
+MOLAR_MASS = {
+    'Glucose': 180.16, 'Cholesterol': 386.65, 'LDL': 386.65, 'HDL': 386.65, 'VLDL': 386.65,
+    'Triglycerides': 885.7, 'Creatinine': 113.12, 'BUN': 28.014, 'Uric Acid': 168.11,
+    'Bilirubin': 584.66, 'Calcium': 40.078, 'Iron': 55.845, 'Hemoglobin': 16114.0, 'MCHC': 16114.0,
+    'Vitamin D': 400.64, 'Vitamin B12': 1355.37, 'T4': 776.87, 'T3': 650.98, 'Albumin': 66500.0,
+    'Sodium': 22.99, 'Potassium': 39.098, 'Chloride': 35.45,
+}
+
+VALENCE = {'Sodium': 1, 'Potassium': 1, 'Chloride': 1, 'Calcium': 2}
+
+# Conversions that aren't a pure scale: (term, unit) -> (scale, offset); HbA1c IFCC -> NGSP
+AFFINE = {('HbA1c', 'mmol/mol'): (0.09148, 2.152)}
+
+IDENTITY = (1.0, 0.0)
+
+# A converted value must land within [min / F, max * F] of the term's ranges to be used; this
+# catches mislabeled units (e.g. "Platelets 386 Cells/cumm", really 386 x 10^3/uL)
+PLAUSIBLE_FACTOR = 20.0
+
+
+def normalize_unit(unit: str) -> str:
+    """Canonical spelling of a unit string ("Cells/cumm" -> "/ul", "gm/dl" -> "g/dl")"""
+    u = (unit or '').strip().lower().replace('µ', 'u').replace('μ', 'u').replace(' ', '')
+    u = re.sub(r'^x(?=10)', '', u)
+    u = re.sub(r'(cumm|cu\.mm|mm3|mm\^3)$', 'ul', u)
+    return UNIT_ALIASES.get(u, u)
+
+
+class UnitRegistry:
+    """Convert extracted values into the unit each analyte's reference range uses.
+
+    Canonical units come from reference_ranges.json; conversion factors per (term, raw unit)
+    are resolved once and cached. Values with unrecognized or incompatible units, or whose
+    conversion would be implausible for the analyte, are compared as extracted.
+    """
+
+    def __init__(self, reference_ranges: Dict):
+        self.canonical: Dict[str, str] = {}
+        self.plausible: Dict[str, Tuple[float, float]] = {}
+        for term, ranges in reference_ranges.items():
+            bands = [band for entry in ranges.values() for band in (entry if isinstance(entry, list) else [entry])]
+            self.canonical[term] = normalize_unit(bands[0]['unit'])
+            self.plausible[term] = (
+                min(band['min'] for band in bands) / PLAUSIBLE_FACTOR,
+                max(band['max'] for band in bands) * PLAUSIBLE_FACTOR,
+            )
+        self._conversions: Dict[Tuple[str, str], Optional[Tuple[float, float]]] = {}
+
+    def conversion(self, term: str, unit: str) -> Optional[Tuple[float, float]]:
+        """(scale, offset) taking ``unit`` to the term's canonical unit, or None if incompatible"""
+        key = (term, unit)
+        if key not in self._conversions:
+            self._conversions[key] = self._resolve(term, normalize_unit(unit))
+        return self._conversions[key]
+
+    def _resolve(self, term: str, source: str) -> Optional[Tuple[float, float]]:
+        target = self.canonical.get(term)
+        if not target or source == target or source not in UNIT_SCALES or target not in UNIT_SCALES:
+            return IDENTITY
+        if (term, source) in AFFINE:
+            return AFFINE[(term, source)]
+
+        source_dim, source_scale = UNIT_SCALES[source]
+        target_dim, target_scale = UNIT_SCALES[target]
+        if source_dim == target_dim:
+            return source_scale / target_scale, 0.0
+
+        # Bridge mass, amount and equivalent concentrations through mol/L
+        to_molar = {'molar': 1.0}
+        if term in MOLAR_MASS:
+            to_molar['mass_conc'] = 1.0 / MOLAR_MASS[term]
+        if term in VALENCE:
+            to_molar['equivalent'] = 1.0 / VALENCE[term]
+        if source_dim in to_molar and target_dim in to_molar:
+            return source_scale * to_molar[source_dim] / (target_scale * to_molar[target_dim]), 0.0
+
+        logger.debug(f"Cannot convert {term} from {source} to {target}")
+        return None
+
+    def convert_value(self, term: str, value: float, unit: str) -> float:
+        """Scalar version of ``convert``"""
+        conversion = self.conversion(term, unit or '')
+        if conversion is None or conversion == IDENTITY:
+            return value
+        converted = value * conversion[0] + conversion[1]
+        low, high = self.plausible[term]
+        if not low <= converted <= high and low <= value <= high:
+            return value
+        return converted
+
+    def convert(self, terms: Sequence[str], values: np.ndarray, units: Optional[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert all values in one pass; returns (converted values, unit-compatible mask)"""
+        values = np.asarray(values, dtype=np.float64)
+        if units is None:
+            return values, np.ones(len(values), dtype=bool)
+        if isinstance(units, np.ndarray):
+            units = units.tolist()
+        if isinstance(terms, np.ndarray):
+            terms = terms.tolist()
+
+        # One row (scale, offset, compatible, plausible low/high) per distinct (term, unit) pair
+        keys = list(zip(terms, units))
+        distinct = {key: i for i, key in enumerate(set(keys))}
+        rows = np.array([self._row(term, unit) for term, unit in distinct], dtype=np.float64).reshape(-1, 5)
+        rows = rows[np.fromiter(map(distinct.__getitem__, keys), dtype=np.int64, count=len(keys))]
+
+        scale, offset, compatible, low, high = rows.T
+        converted = values * scale + offset
+        keep_raw = ~((converted >= low) & (converted <= high)) & (values >= low) & (values <= high)
+        return np.where(keep_raw, values, converted), compatible.astype(bool)
+
+    def _row(self, term: str, unit: Optional[str]) -> Tuple[float, float, float, float, float]:
+        conversion = self.conversion(term, unit or '')
+        low, high = self.plausible.get(term, (-np.inf, np.inf))
+        scale, offset = conversion or IDENTITY
+        return scale, offset, float(conversion is not None), low, high
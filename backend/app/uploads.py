@@ -0,0 +1,167 @@
+import hashlib
+import io
+import os
+import tempfile
+from typing import BinaryIO, Optional, Sequence, Union
+
+from app.pdf_tables import PDFSource
+
+CHUNK_SIZE = 1024 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload is bigger than UPLOAD_MAX_BYTES"""
+
+
+def default_spill_dir() -> str:
+    """tmpfs when the host has one, so spilled uploads still never touch a real disk"""
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+class ReportUpload:
+    """An uploaded PDF, held in memory or (above the spill threshold) in a private temp file"""
+
+    def __init__(self, data: Optional[Union[bytes, memoryview]], path: Optional[str], sha256: str, size: int):
+        self.data = data
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+
+    @property
+    def source(self) -> PDFSource:
+        """What the PDF readers open: the bytes themselves, or the spill file's path"""
+        return self.path if self.path else self.data
+
+    def close(self):
+        if isinstance(self.data, memoryview):
+            # The upload's own buffer can't be closed while a view of it is exported
+            self.data.release()
+        self.data = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+def _spooled_buffer(file: BinaryIO) -> Optional[memoryview]:
+    """A view of the upload's in-memory buffer, or None once it has rolled over to disk"""
+    buffer = getattr(file, "_file", file)
+    return buffer.getbuffer() if isinstance(buffer, io.BytesIO) else None
+
+
+def read_upload(file: BinaryIO, max_bytes: int, spill_bytes: int, spill_dir: str = "",
+                copy: bool = False) -> ReportUpload:
+    """Read an upload stream into a ReportUpload, hashing it on the way.
+
+    Stops with UploadTooLarge as soon as ``max_bytes`` is passed. Uploads up to
+    ``spill_bytes`` stay in memory; larger ones continue into a uniquely named file in
+    ``spill_dir`` (default: tmpfs when available).
+
+    An upload Starlette still holds in memory is used in place, as a view of its spooled
+    buffer, so it must be closed before the upload is. Pass ``copy`` when the ReportUpload
+    outlives the request (background jobs).
+    """
+    view = _spooled_buffer(file)
+    if view is not None and view.nbytes <= spill_bytes:
+        if max_bytes and view.nbytes > max_bytes:
+            view.release()
+            raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+        sha256 = hashlib.sha256(view).hexdigest()
+        if copy:
+            data = view.tobytes()
+            view.release()
+            return ReportUpload(data, None, sha256, len(data))
+        return ReportUpload(view, None, sha256, view.nbytes)
+    if view is not None:
+        view.release()
+
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    spill = None
+    path = None
+    try:
+        while chunk := file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            digest.update(chunk)
+            if spill is None and size > spill_bytes:
+                fd, path = tempfile.mkstemp(prefix="report_upload_", suffix=".pdf", dir=spill_dir or default_spill_dir())
+                spill = os.fdopen(fd, "wb")
+                spill.writelines(chunks)
+                chunks = []
+            if spill is not None:
+                spill.write(chunk)
+            else:
+                chunks.append(chunk)
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            os.remove(path)
+        raise
+
+    if spill is not None:
+        spill.close()
+        return ReportUpload(None, path, digest.hexdigest(), size)
+    data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    return ReportUpload(data, None, digest.hexdigest(), size)
+
+
+class UploadLimitMiddleware:
+    """Rejects report uploads over the size limit with 413 while the body is still arriving.
+
+    Declared Content-Length is checked before anything is read; chunked bodies are counted
+    as they stream in, so an oversized upload is never parsed or spooled in full.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Sequence[str]):
+        self.app = app
+        self.max_bytes = max_bytes + MULTIPART_OVERHEAD
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                return await self._reject(send)
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes and not rejected:
+                    # The body is still being read, so no response has started yet
+                    rejected = True
+                    await self._reject(send)
+                    raise UploadTooLarge("Request body too large")
+            return message
+
+        async def guarded_send(message):
+            # Drop whatever error response the app builds from the aborted body read
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if not rejected:
+                raise
+
+    async def _reject(self, send):
+        body = b'{"detail":"Upload too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,15 +1,234 @@
 import json
+from bisect import bisect_left
 import os
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence, Union
 import logging
 
+import numpy as np
+
+from app.units import UnitRegistry
+
 logger = logging.getLogger(__name__)
 
+
+def _select_range(ranges: Dict, gender: Optional[str], age: Optional[float]) -> Dict:
+    """Pick the reference range for one demographic.
+
+    A demographic entry is either a single range or a list of age bands with optional
+    inclusive ``min_age``/``max_age`` (years); the first matching band wins. Without an
+    age the band that has no age bounds (the adult range) is used.
+    """
+    # Robust gender logic
+    g = (gender or '').lower()
+
+    if g and g in ranges:
+        ref_range = ranges[g]
+    elif 'default' in ranges:
+        ref_range = ranges['default']
+    elif 'all' in ranges:
+        ref_range = ranges['all']
+    elif 'female' in ranges:
+        ref_range = ranges['female']
+    elif 'male' in ranges:
+        ref_range = ranges['male']
+    else:
+        ref_range = list(ranges.values())[0]
+
+    if isinstance(ref_range, dict):
+        return ref_range
+
+    unbounded = [band for band in ref_range if 'min_age' not in band and 'max_age' not in band]
+    if age is not None:
+        for band in ref_range:
+            if band.get('min_age', float('-inf')) <= age <= band.get('max_age', float('inf')):
+                return band
+    return unbounded[0] if unbounded else ref_range[-1]
+
+
+class ReferenceTable:
+    """reference_ranges.json compiled into NumPy arrays for vectorized evaluation.
+
+    Every (term, gender, age bucket) cell holds the index of the range that ``_select_range``
+    picks for it, so a whole cohort is checked with a few array gathers and comparisons.
+    Age buckets are the points and open intervals between all band boundaries, plus one
+    bucket for unknown ages.
+    """
+
+    GENDERS = {'male': 1, 'female': 2}
+    STATUSES = np.array(['low', 'normal', 'high'])
+
+    def __init__(self, reference_ranges: Dict):
+        self.terms = {term: i for i, term in enumerate(reference_ranges)}
+        self.age_bounds = np.array(sorted({
+            band[key]
+            for ranges in reference_ranges.values()
+            for entry in ranges.values() if isinstance(entry, list)
+            for band in entry
+            for key in ('min_age', 'max_age') if key in band
+        }), dtype=np.float64)
+        self._age_bounds_list = self.age_bounds.tolist()
+
+        n_buckets = 2 * len(self.age_bounds) + 2
+        self.rules = np.full((max(len(self.terms), 1), 3, n_buckets), -1, dtype=np.int32)
+        ranges_seen = {}
+        low, high, messages, reference = [], [], [], []
+        for term, t in self.terms.items():
+            for gender, g in (None, 0), ('male', 1), ('female', 2):
+                for bucket in range(n_buckets):
+                    ref_range = _select_range(reference_ranges[term], gender, self._bucket_age(bucket))
+                    key = (term, id(ref_range))
+                    if key not in ranges_seen:
+                        ranges_seen[key] = len(low)
+                        low.append(ref_range['min'])
+                        high.append(ref_range['max'])
+                        normal = f'{ref_range["min"]}-{ref_range["max"]} {ref_range["unit"]}'
+                        reference.append(normal)
+                        messages.append([
+                            f'{term} is below normal range (normal: {normal})',
+                            f'{term} is within normal range ({normal})',
+                            f'{term} is above normal range (normal: {normal})',
+                        ])
+                    self.rules[t, g, bucket] = ranges_seen[key]
+
+        self.low = np.array(low, dtype=np.float64)
+        self.high = np.array(high, dtype=np.float64)
+        self.messages = np.array(messages, dtype=object).reshape(-1, 3)
+        self.reference = np.array(reference, dtype=object)
+
+    def _bucket_age(self, bucket: int) -> Optional[float]:
+        """A representative age for a bucket (None for the unknown-age bucket)"""
+        bounds = self.age_bounds
+        if bucket == 2 * len(bounds) + 1:
+            return None
+        i, on_bound = divmod(bucket, 2)
+        if on_bound:
+            return float(bounds[i])
+        if not len(bounds):
+            return 0.0
+        if i == 0:
+            return float(bounds[0]) - 1
+        if i == len(bounds):
+            return float(bounds[-1]) + 1
+        return float(bounds[i - 1] + bounds[i]) / 2
+
+    def _age_buckets(self, ages: np.ndarray) -> np.ndarray:
+        bounds = self.age_bounds
+        below = np.searchsorted(bounds, ages, side='left')
+        on_bound = bounds[np.minimum(below, max(len(bounds) - 1, 0))] == ages if len(bounds) else np.zeros(len(ages), bool)
+        buckets = 2 * below + on_bound
+        return np.where(np.isnan(ages), 2 * len(bounds) + 1, buckets)
+
+    @staticmethod
+    def _codes(labels: Sequence, mapping: Dict[str, int], default: int, normalize=None) -> np.ndarray:
+        """Map labels to integer codes with one dict lookup each"""
+        if isinstance(labels, np.ndarray):
+            labels = labels.tolist()
+        if normalize:
+            mapping = {label: mapping.get(normalize(label), default) for label in set(labels)}
+        get = mapping.get
+        return np.fromiter((get(label, default) for label in labels), dtype=np.int32, count=len(labels))
+
+    def evaluate(
+        self,
+        terms: Sequence[str],
+        values: Sequence[float],
+        genders: Union[None, str, Sequence[Optional[str]]] = None,
+        ages: Union[None, float, Sequence[Optional[float]]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Check every value in one pass; ``genders``/``ages`` may be per value or a single value for all.
+
+        Returns arrays: ``rule`` (-1 for terms without a reference range), ``status``
+        (-1 unknown, 0 low, 1 normal, 2 high), ``is_abnormal``, ``low`` and ``high``.
+        Values must already be in the reference range's unit (see ``app.units``).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        count = len(values)
+        term_codes = self._codes(terms, self.terms, -1)
+
+        if genders is None or isinstance(genders, str):
+            gender_codes = np.full(count, self.GENDERS.get((genders or '').lower(), 0), dtype=np.int32)
+        else:
+            gender_codes = self._codes(genders, self.GENDERS, 0, normalize=lambda gender: (gender or '').lower())
+
+        if ages is None or np.isscalar(ages):
+            ages = np.full(count, np.nan if ages is None else ages, dtype=np.float64)
+        ages = np.asarray(ages, dtype=np.float64)
+
+        known = term_codes >= 0
+        rule = np.full(count, -1, dtype=np.int32)
+        rule[known] = self.rules[term_codes[known], gender_codes[known], self._age_buckets(ages[known])]
+
+        low = np.where(known, self.low[rule], np.nan)
+        high = np.where(known, self.high[rule], np.nan)
+        status = np.where(values < low, 0, np.where(values > high, 2, 1)).astype(np.int8)
+        status[~known] = -1
+        return {
+            'rule': rule,
+            'status': status,
+            'is_abnormal': (status == 0) | (status == 2),
+            'low': low,
+            'high': high,
+        }
+
+    def result(self, term: str, value: float, gender: Optional[str] = None, age: Optional[float] = None) -> Dict:
+        """Single-value lookup against the same compiled tables, without array overhead"""
+        t = self.terms.get(term)
+        if t is None:
+            return {
+                'is_abnormal': False,
+                'status': 'unknown',
+                'message': f'Reference range for {term} not available'
+            }
+
+        g = self.GENDERS.get((gender or '').lower(), 0)
+        bounds = self._age_bounds_list
+        if age is None:
+            bucket = 2 * len(bounds) + 1
+        else:
+            below = bisect_left(bounds, age)
+            bucket = 2 * below + (below < len(bounds) and bounds[below] == age)
+        rule = int(self.rules[t, g, bucket])
+        status = 0 if value < self.low[rule] else 2 if value > self.high[rule] else 1
+        return {
+            'is_abnormal': status != 1,
+            'status': str(self.STATUSES[status]),
+            'message': self.messages[rule, status],
+            'reference_range': self.reference[rule]
+        }
+
+    def results(self, terms: Sequence[str], evaluation: Dict[str, np.ndarray]) -> List[Dict]:
+        """Per-value result dicts in the same shape as ``ValueAnalyzer.analyze_value``"""
+        rule, status = evaluation['rule'], evaluation['status']
+        known = rule >= 0
+        messages = np.empty(len(rule), dtype=object)
+        messages[known] = self.messages[rule[known], status[known]]
+        statuses = self.STATUSES[np.maximum(status, 0)]
+
+        results = []
+        for i, term in enumerate(terms):
+            if not known[i]:
+                results.append({
+                    'is_abnormal': False,
+                    'status': 'unknown',
+                    'message': f'Reference range for {term} not available'
+                })
+                continue
+            results.append({
+                'is_abnormal': bool(evaluation['is_abnormal'][i]),
+                'status': str(statuses[i]),
+                'message': messages[i],
+                'reference_range': self.reference[rule[i]]
+            })
+        return results
+
+
 class ValueAnalyzer:
     """Analyze medical test values against reference ranges"""
 
     def __init__(self):
         self.REFERENCE_RANGES = self._load_reference_ranges()
+        self.table = ReferenceTable(self.REFERENCE_RANGES)
+        self.units = UnitRegistry(self.REFERENCE_RANGES)
 
     def _load_reference_ranges(self) -> Dict:
         json_path = "data/reference_ranges.json"
@@ -34,51 +253,37 @@ class ValueAnalyzer:
         age: Optional[int] = None,
         gender: Optional[str] = None
     ) -> Dict:
-        """Analyze if a value is within normal range"""
+        """Analyze if a value is within normal range, converting it to the range's unit first"""
+        return self.table.result(term, self.units.convert_value(term, value, unit), gender, age)
 
-        # Get reference range
-        if term not in self.REFERENCE_RANGES:
-            return {
-                'is_abnormal': False,
-                'status': 'unknown',
-                'message': f'Reference range for {term} not available'
-            }
+    def analyze_values(
+        self,
+        terms: Sequence[str],
+        values: Sequence[float],
+        units: Optional[Sequence[str]] = None,
+        ages: Union[None, float, Sequence[Optional[float]]] = None,
+        genders: Union[None, str, Sequence[Optional[str]]] = None
+    ) -> List[Dict]:
+        """Analyze many values at once (a whole report or cohort), returning analyze_value dicts"""
+        return self.table.results(terms, self.evaluate(terms, values, ages, genders, units))
 
-        ranges = self.REFERENCE_RANGES[term]
-        # Robust gender logic
-        g = (gender or '').lower()
-
-        if g and g in ranges:
-            ref_range = ranges[g]
-        elif 'default' in ranges:
-            ref_range = ranges['default']
-        elif 'all' in ranges:
-            ref_range = ranges['all']
-        elif 'female' in ranges:
-            ref_range = ranges['female']
-        elif 'male' in ranges:
-            ref_range = ranges['male']
-        else:
-            ref_range = list(ranges.values())[0]
-
-        # Value comparison
-        is_low = value < ref_range['min']
-        is_high = value > ref_range['max']
-        is_abnormal = is_low or is_high
-
-        if is_low:
-            status = 'low'
-            message = f'{term} is below normal range (normal: {ref_range["min"]}-{ref_range["max"]} {ref_range["unit"]})'
-        elif is_high:
-            status = 'high'
-            message = f'{term} is above normal range (normal: {ref_range["min"]}-{ref_range["max"]} {ref_range["unit"]})'
-        else:
-            status = 'normal'
-            message = f'{term} is within normal range ({ref_range["min"]}-{ref_range["max"]} {ref_range["unit"]})'
+    def evaluate(
+        self,
+        terms: Sequence[str],
+        values: Sequence[float],
+        ages: Union[None, float, Sequence[Optional[float]]] = None,
+        genders: Union[None, str, Sequence[Optional[str]]] = None,
+        units: Optional[Sequence[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Array-only evaluation for bulk screening jobs (no per-value dicts or messages).
 
-        return {
-            'is_abnormal': is_abnormal,
-            'status': status,
-            'message': message,
-            'reference_range': f'{ref_range["min"]}-{ref_range["max"]} {ref_range["unit"]}'
-        }
+        With ``units`` the values are first converted to each range's unit in the same pass; the
+        result then also has the converted ``value`` and a ``compatible`` mask (False where the
+        unit is known but can't be converted, so the value was compared as extracted).
+        """
+        values, compatible = self.units.convert(terms, values, units)
+        evaluation = self.table.evaluate(terms, values, genders, ages)
+        if units is not None:
+            evaluation['value'] = values
+            evaluation['compatible'] = compatible
+        return evaluation
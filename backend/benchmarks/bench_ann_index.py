@@ -0,0 +1,110 @@
+"""Compare FAISS index types: recall@k against exact search, query latency, build time and size.
+
+Uses clustered synthetic unit vectors shaped like sentence embeddings (or the embedded knowledge
+base with --knowledge), builds every index with app.ann_index.build_index and the current
+Settings, and queries the memory-mapped file exactly as the API does.
+
+Run from backend/:  python -m benchmarks.bench_ann_index --vectors 1000000 --types flat ivf_flat hnsw ivf_pq
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.ann_index import INDEX_TYPES, build_index, configure_search
+from app.config import get_settings
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around ``clusters`` random centers"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        stop = min(start + 100_000, count)
+        vectors[start:stop] = centers[rng.integers(clusters, size=stop - start)]
+        vectors[start:stop] += 0.6 * rng.standard_normal((stop - start, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def knowledge_vectors(settings) -> np.ndarray:
+    from app.embeddings import create_embeddings
+    from benchmarks.bench_embeddings import load_chunks
+
+    return np.array(create_embeddings(settings).embed_documents(load_chunks(settings)), dtype=np.float32)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(row) & set(expected)) / k for row, expected in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--top-k", type=int, default=get_settings().TOP_K_RESULTS)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS threads (1 = per-request latency)")
+    parser.add_argument("--knowledge", action="store_true", help="Use the embedded knowledge base instead")
+    args = parser.parse_args()
+
+    import faiss
+
+    faiss.omp_set_num_threads(args.threads)
+    settings = get_settings()
+    if args.knowledge:
+        vectors = knowledge_vectors(settings)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, args.clusters)
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.top_k)
+    del exact
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{args.top_k}, {args.threads} thread(s)")
+    print(f"{'index':<9} {'build s':>8} {'size MB':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'batch QPS':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type in args.types:
+            config = settings.model_copy(update={"INDEX_TYPE": index_type})
+            start = time.perf_counter()
+            index = build_index(vectors, config)
+            build_seconds = time.perf_counter() - start
+
+            path = os.path.join(tmp, f"{index_type}.faiss")
+            faiss.write_index(index, path)
+            del index
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            configure_search(index, config)
+
+            latencies = []
+            found = []
+            for query in queries:
+                start = time.perf_counter()
+                _, ids = index.search(query[None, :], args.top_k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append(ids[0])
+
+            start = time.perf_counter()
+            index.search(queries, args.top_k)
+            qps = len(queries) / (time.perf_counter() - start)
+
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(
+                f"{index_type:<9} {build_seconds:>8.1f} {os.path.getsize(path) / 1e6:>8.1f} "
+                f"{recall(np.array(found), truth):>7.3f} {p50:>7.2f} {p95:>7.2f} {p99:>7.2f} {qps:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
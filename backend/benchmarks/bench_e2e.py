@@ -0,0 +1,311 @@
+"""End-to-end benchmark: pipeline stages and API endpoints on synthetic lab reports.
+
+Generates report PDFs of several sizes, times each stage of ReportAnalyzer in-process
+(PDF extraction, value analysis, explanations, summary; peak Python memory from a separate
+traced pass), then drives /upload-report, /chat, /chat/stream and /check-values with
+concurrent clients and reports p50/p95/p99 latency and throughput.
+
+The LLM is the deterministic fake provider (LLM_PROVIDER=fake) with the latency given here,
+so the numbers measure the service's own overhead; result, explanation and query caches are
+off unless --caches is given. Endpoints run in-process, or against a running server with --url.
+
+Run from backend/:
+    python -m benchmarks.bench_e2e --save-baseline benchmarks/baselines/e2e.json
+    python -m benchmarks.bench_e2e --baseline benchmarks/baselines/e2e.json   # exits 1 on regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic_reports import generate_reports
+
+
+QUESTIONS = [
+    "What does a high hemoglobin level mean?",
+    "Is my cholesterol something to worry about?",
+    "What is HbA1c used for?",
+    "Why would platelets be low?",
+    "What does creatinine tell my doctor?",
+    "How can I improve my vitamin D?",
+]
+
+
+def stats(latencies: List[float], wall: float, errors: int = 0, peak_bytes: Optional[int] = None) -> Dict:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (float("nan"),) * 3
+    result = {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": round(float(p50) * 1000, 2),
+        "p95_ms": round(float(p95) * 1000, 2),
+        "p99_ms": round(float(p99) * 1000, 2),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+    if peak_bytes is not None:
+        result["peak_mb"] = round(peak_bytes / 1e6, 2)
+    return result
+
+
+async def time_stage(calls: List[Callable[[], Awaitable]], repeat: int) -> Dict:
+    """Run every call ``repeat`` times sequentially, then once more under tracemalloc for peak memory"""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for call in calls:
+            call_start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - call_start)
+    wall = time.perf_counter() - start
+
+    peak = 0
+    for call in calls:
+        tracemalloc.start()
+        await call()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return stats(latencies, wall, peak_bytes=peak)
+
+
+async def bench_stages(analyzer, reports: List[Dict], repeat: int) -> Dict[str, Dict]:
+    from app.report_analyzer import detect_age
+
+    extracted = [await asyncio.to_thread(analyzer.extract, report["path"]) for report in reports]
+    checked = [analyzer.analyze_values(terms, gender, detect_age(text)) for text, gender, terms in extracted]
+
+    async def extract(path):
+        await asyncio.to_thread(analyzer.extract, path)
+
+    async def check(text, gender, terms):
+        analyzer.analyze_values(terms, gender, detect_age(text))
+
+    async def explain(terms):
+        await analyzer.rag_pipeline.aexplain_terms(terms)
+
+    async def summary(text, terms, statuses):
+        medical_terms = [analyzer.build_term(term, "", statuses[term["term"]]) for term in terms]
+        await analyzer.summarize(medical_terms, text)
+
+    async def first_token(question):
+        async for event in analyzer.rag_pipeline.astream_answer(question):
+            if event["type"] == "token":
+                break
+
+    results = {}
+    for report, (text, gender, terms), statuses in zip(reports, extracted, checked):
+        label = f"{report['pages']}p"
+        results[f"stage.pdf_extraction.{label}"] = await time_stage([lambda: extract(report["path"])], repeat)
+        results[f"stage.value_analysis.{label}"] = await time_stage([lambda: check(text, gender, terms)], repeat)
+        results[f"stage.explanations.{label}"] = await time_stage([lambda: explain(terms)], repeat)
+        results[f"stage.summary.{label}"] = await time_stage([lambda: summary(text, terms, statuses)], repeat)
+    results["stage.chat_first_token"] = await time_stage([lambda question=question: first_token(question) for question in QUESTIONS], repeat)
+    return results
+
+
+async def drive(requests: List[Callable[[], Awaitable]], concurrency: int) -> Dict:
+    """Send all requests with at most ``concurrency`` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(request):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await request()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(request) for request in requests))
+    return stats(latencies, time.perf_counter() - start, errors)
+
+
+async def bench_endpoints(client, reports: List[Dict], requests: int, concurrency: int, streaming: bool) -> Dict[str, Dict]:
+    """Load-test the endpoints; ``streaming`` is False in-process, where httpx buffers whole responses"""
+    payloads = {report["path"]: open(report["path"], "rb").read() for report in reports}
+
+    def upload(i: int):
+        report = reports[i % len(reports)]
+
+        async def call():
+            # Unique names: concurrent uploads must not share a temp file
+            files = {"file": (f"bench_{i}.pdf", payloads[report["path"]], "application/pdf")}
+            response = await client.post("/upload-report", files=files)
+            response.raise_for_status()
+        return call
+
+    def chat(i: int):
+        async def call():
+            question = f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"
+            response = await client.post("/chat", json={"question": question, "report_context": ""})
+            response.raise_for_status()
+        return call
+
+    first_tokens = []
+
+    def chat_stream(i: int):
+        async def call():
+            question = f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"
+            start = time.perf_counter()
+            async with client.stream("POST", "/chat/stream", json={"question": question, "report_context": ""}) as response:
+                response.raise_for_status()
+                first_token = None
+                async for line in response.aiter_lines():
+                    if first_token is None and line == "event: token":
+                        first_token = time.perf_counter() - start
+            if first_token is not None:
+                first_tokens.append(first_token)
+        return call
+
+    rng = np.random.default_rng(0)
+    terms = ["Hemoglobin", "Glucose", "WBC", "Platelets", "Cholesterol", "Creatinine", "TSH", "Sodium"]
+
+    def check_values(i: int):
+        async def call():
+            values = [
+                {"term": str(term), "value": float(value), "unit": "", "age": 40, "gender": "female"}
+                for term, value in zip(rng.choice(terms, 50), rng.uniform(0, 300, 50))
+            ]
+            response = await client.post("/check-values", json={"values": values})
+            response.raise_for_status()
+        return call
+
+    results = {}
+    for name, factory in [
+        ("upload_report", upload),
+        ("chat", chat),
+        ("chat_stream", chat_stream),
+        ("check_values", check_values),
+    ]:
+        results[f"endpoint.{name}"] = await drive([factory(i) for i in range(requests)], concurrency)
+    if streaming and first_tokens:
+        results["endpoint.chat_stream.first_token"] = stats(first_tokens, 0)
+    return results
+
+
+def compare(current: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float, min_delta_ms: float) -> List[str]:
+    """Scenarios whose p95 latency rose or throughput fell by more than ``tolerance``.
+
+    p95 rises smaller than ``min_delta_ms`` are ignored, so sub-millisecond stages don't
+    fail on timer noise; throughput and error counts are always checked.
+    """
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        rise = result["p95_ms"] - before["p95_ms"]
+        if rise >= min_delta_ms and result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if before.get("throughput_rps") and result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        if result["errors"] > before.get("errors", 0):
+            regressions.append(f"{name}: errors {before.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict]):
+    print(f"{'scenario':<36} {'n':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'peak MB':>8}")
+    for name, r in results.items():
+        peak = f"{r['peak_mb']:>8.2f}" if "peak_mb" in r else f"{'':>8}"
+        print(
+            f"{name:<36} {r['count']:>5} {r['errors']:>4} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+            f"{r['p99_ms']:>9.2f} {r['throughput_rps']:>8.1f} {peak}"
+        )
+
+
+def configure(args):
+    """Settings for the run; must happen before app.config.get_settings() is first called"""
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["LLM_FAKE_LATENCY"] = str(args.llm_latency)
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = str(args.llm_tokens_per_second)
+    os.environ["LLM_CASSETTE_MODE"] = ""
+    os.environ["LAZY_STARTUP"] = "false"
+    os.environ["INDEX_RELOAD_INTERVAL"] = "0"
+    if not args.caches:
+        for setting in ("RESULT_CACHE_ENABLED", "EXPLANATION_CACHE_ENABLED", "QUERY_CACHE_ENABLED"):
+            os.environ[setting] = "false"
+
+
+async def run(args, reports: List[Dict]) -> Dict[str, Dict]:
+    import httpx
+
+    results = {}
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=300) as client:
+            results.update(await bench_endpoints(client, reports, args.requests, args.concurrency, True))
+        return results
+
+    import app.main as api
+
+    # Runs the app's startup and shutdown handlers, as uvicorn would
+    async with api.app.router.lifespan_context(api.app):
+        if api.report_analyzer is None:
+            raise RuntimeError(f"Pipeline failed to start: {api.startup_state['error']}")
+        if not args.skip_stages:
+            results.update(await bench_stages(api.report_analyzer, reports, args.repeat))
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            results.update(await bench_endpoints(client, reports, args.requests, args.concurrency, False))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20], help="Report sizes to generate")
+    parser.add_argument("--analytes", type=int, default=25, help="Result rows per page")
+    parser.add_argument("--repeat", type=int, default=5, help="Sequential runs per stage and report size")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM seconds to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--caches", action="store_true", help="Keep result/explanation/query caches on")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--url", help="Benchmark a running server instead (stages are skipped)")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore smaller p95 changes")
+    args = parser.parse_args()
+
+    configure(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        reports = generate_reports(tmp, args.pages, args.analytes)
+        results = asyncio.run(run(args, reports))
+
+    print_table(results)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "environment": {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "cpus": os.cpu_count(),
+                    "args": {key: value for key, value in vars(args).items() if key not in ("save_baseline", "baseline")},
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
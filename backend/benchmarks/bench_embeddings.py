@@ -0,0 +1,122 @@
+"""Compare embedding backends: load time, encode latency, peak memory and retrieval agreement.
+
+Each backend runs in a fresh process so its peak RSS is measured on its own. Backends are
+"huggingface" or "onnx:<file>", e.g. onnx:onnx/model.onnx or onnx:onnx/model_qint8_avx512.onnx.
+Agreement is measured against the first backend over the knowledge-base chunks.
+
+Run from backend/:  python -m benchmarks.bench_embeddings huggingface onnx:onnx/model.onnx
+"""
+import argparse
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import get_settings
+from app.knowledge import load_documents
+from app.pdf_processor import PDFProcessor
+
+
+def load_chunks(settings) -> List[str]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP
+    )
+    return [
+        chunk
+        for text in load_documents(settings.KNOWLEDGE_PATH).values()
+        for chunk in splitter.split_text(text)
+    ]
+
+
+def queries() -> List[str]:
+    return [f"What is {term} and what does an abnormal value mean?" for term in PDFProcessor.MEDICAL_PATTERNS]
+
+
+def run_backend(spec: str, chunks: List[str], query_texts: List[str], repeat: int, top_k: int) -> Dict:
+    """Load one backend and time it (runs in its own process)"""
+    from app.embeddings import create_embeddings
+
+    backend, _, onnx_file = spec.partition(":")
+    settings = get_settings()
+    if onnx_file:
+        settings = settings.model_copy(update={"EMBEDDING_ONNX_FILE": onnx_file})
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    embeddings = create_embeddings(settings, backend)
+    load_seconds = time.perf_counter() - start
+
+    chunk_vectors = np.array(embeddings.embed_documents(chunks), dtype=np.float32)
+
+    batched, single = float("inf"), float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query_vectors = np.array(embeddings.embed_documents(query_texts), dtype=np.float32)
+        batched = min(batched, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for text in query_texts:
+            embeddings.embed_query(text)
+        single = min(single, time.perf_counter() - start)
+
+    distances = ((query_vectors[:, None, :] - chunk_vectors[None, :, :]) ** 2).sum(axis=2)
+    return {
+        "spec": spec,
+        "load_s": load_seconds,
+        "batched_ms_per_query": batched / len(query_texts) * 1000,
+        "single_ms_per_query": single / len(query_texts) * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "model_rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+        "query_vectors": query_vectors,
+        "top_k": np.argsort(distances, axis=1)[:, :top_k],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backends", nargs="+", help="huggingface or onnx:<file>")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=get_settings().TOP_K_RESULTS)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    chunks = load_chunks(settings)
+    query_texts = queries()
+    top_k = min(args.top_k, len(chunks))
+
+    results = []
+    for spec in args.backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(run_backend, spec, chunks, query_texts, args.repeat, top_k).result())
+
+    reference = results[0]
+    print(f"{len(chunks)} chunks, {len(query_texts)} queries, agreement vs {reference['spec']} at top-{top_k}")
+    print(
+        f"{'backend':<36} {'load s':>7} {'batch ms/q':>11} {'single ms/q':>12} "
+        f"{'peak MB':>8} {'model MB':>9} {'cosine':>7} {'overlap':>8} {'top-1':>6}"
+    )
+    for result in results:
+        if result["query_vectors"].shape == reference["query_vectors"].shape:
+            cosine = float(np.mean(np.sum(result["query_vectors"] * reference["query_vectors"], axis=1)))
+        else:
+            cosine = float("nan")
+        overlap = np.mean([
+            len(set(mine) & set(theirs)) / top_k
+            for mine, theirs in zip(result["top_k"], reference["top_k"])
+        ])
+        top1 = np.mean(result["top_k"][:, 0] == reference["top_k"][:, 0])
+        print(
+            f"{result['spec']:<36} {result['load_s']:>7.2f} {result['batched_ms_per_query']:>11.2f} "
+            f"{result['single_ms_per_query']:>12.2f} {result['peak_rss_mb']:>8.0f} {result['model_rss_mb']:>9.0f} "
+            f"{cosine:>7.4f} {overlap:>8.2%} {top1:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare the single-pass TermExtractor against the per-pattern regex scan.
+
+Run from backend/:  python -m benchmarks.bench_term_extraction [--pages 1 10 100]
+"""
+import argparse
+import random
+import time
+
+from app.pdf_processor import PDFProcessor
+
+
+FILLER = (
+    "Patient Name Age Sex Female Ref By Dr Sample collected on reported on "
+    "Investigation Result Reference Value Unit Method Remarks Page of "
+)
+
+
+def synthetic_report(pages: int, seed: int = 0) -> str:
+    """Lab-report-like text with a random subset of catalog aliases and values per page"""
+    rng = random.Random(seed)
+    aliases = []
+    for pattern in PDFProcessor.MEDICAL_PATTERNS.values():
+        aliases.extend(pattern[3:-3].replace('\\.', '.').split('|'))
+    units = ["g/dL", "%", "fL", "mg/dL", "mmol/L", "10^3/uL", "Cells/cumm", "mm/hr", "pg"]
+
+    lines = []
+    for _ in range(pages):
+        lines.append(FILLER * 3)
+        for alias in rng.sample(aliases, k=min(25, len(aliases))):
+            lines.append(f"{alias} {rng.uniform(0.1, 400):.1f} {rng.choice(units)} {FILLER[:80]}")
+    return PDFProcessor().clean_text("\n".join(lines))
+
+
+def best_of(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    processor = PDFProcessor()
+    print(f"{'pages':>6} {'chars':>10} {'per-pattern ms':>15} {'single-pass ms':>15} {'speedup':>8} {'MB/s':>8}")
+    for pages in args.pages:
+        text = synthetic_report(pages)
+        assert processor.extract_medical_terms(text) == processor._extract_medical_terms_per_pattern(text)
+
+        legacy = best_of(processor._extract_medical_terms_per_pattern, text, args.repeat)
+        fast = best_of(processor.extract_medical_terms, text, args.repeat)
+        print(
+            f"{pages:>6} {len(text):>10} {legacy * 1000:>15.2f} {fast * 1000:>15.2f} "
+            f"{legacy / fast:>7.1f}x {len(text) / fast / 1e6:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare per-value analyze_value calls against the vectorized ReferenceTable evaluation.
+
+Run from backend/:  python -m benchmarks.bench_value_analysis [--values 10000 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.value_analyzer import ValueAnalyzer
+
+
+def cohort(analyzer: ValueAnalyzer, count: int, seed: int = 0):
+    """Random terms (plus some unknown ones), values, genders and ages"""
+    rng = np.random.default_rng(seed)
+    terms = rng.choice(list(analyzer.REFERENCE_RANGES) + ["Unknown Test"], size=count).tolist()
+    values = rng.uniform(0, 400, size=count)
+    genders = rng.choice(["male", "female", "", "Female"], size=count).tolist()
+    ages = rng.uniform(0, 90, size=count)
+    ages[rng.random(count) < 0.2] = np.nan
+    return terms, values, genders, ages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--values", type=int, nargs="+", default=[10_000, 1_000_000])
+    args = parser.parse_args()
+
+    analyzer = ValueAnalyzer()
+    print(f"{'values':>10} {'per-value s':>12} {'vectorized s':>13} {'dicts s':>8} {'speedup':>8} {'M values/s':>11}")
+    for count in args.values:
+        terms, values, genders, ages = cohort(analyzer, count)
+        age_list = [None if np.isnan(age) else age for age in ages]
+
+        start = time.perf_counter()
+        single = [
+            analyzer.analyze_value(term, value, "", age, gender)
+            for term, value, age, gender in zip(terms, values.tolist(), age_list, genders)
+        ]
+        per_value = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyzer.evaluate(terms, values, ages, genders)
+        vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = analyzer.analyze_values(terms, values, ages=ages, genders=genders)
+        with_dicts = time.perf_counter() - start
+        assert batch == single
+
+        print(
+            f"{count:>10} {per_value:>12.3f} {vectorized:>13.3f} {with_dicts:>8.3f} "
+            f"{per_value / vectorized:>7.1f}x {count / vectorized / 1e6:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Synthetic lab-report PDFs for benchmarks: ruled result tables written as raw PDF, no extra dependencies.
+
+Run from backend/:  python -m benchmarks.synthetic_reports out_dir --pages 1 5 20 --analytes 25
+"""
+import argparse
+import json
+import os
+import random
+from typing import Dict, List, Tuple
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+ROW_HEIGHT = 16
+ROWS_PER_PAGE = 40
+COLUMNS = [("Investigation", 50), ("Result", 250), ("Unit", 330), ("Reference Range", 420)]
+TABLE_RIGHT = 560
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text(x: float, y: float, text: str, size: int = 9) -> str:
+    return f"BT /F1 {size} Tf {x} {y} Td ({_escape(text)}) Tj ET"
+
+
+def _page_stream(header: List[str], rows: List[Tuple[str, str, str, str]]) -> bytes:
+    ops = []
+    y = PAGE_HEIGHT - 50
+    for line in header:
+        ops.append(_text(50, y, line, 10))
+        y -= 14
+
+    top = y - 10
+    table = [tuple(name for name, _ in COLUMNS)] + list(rows)
+    bottom = top - ROW_HEIGHT * len(table)
+    ops.append("0.5 w")
+    for i in range(len(table) + 1):
+        line_y = top - ROW_HEIGHT * i
+        ops.append(f"{COLUMNS[0][1] - 4} {line_y} m {TABLE_RIGHT} {line_y} l S")
+    for x in [x for _, x in COLUMNS] + [TABLE_RIGHT + 4]:
+        ops.append(f"{x - 4} {top} m {x - 4} {bottom} l S")
+    for i, cells in enumerate(table):
+        cell_y = top - ROW_HEIGHT * (i + 1) + 5
+        for (_, x), cell in zip(COLUMNS, cells):
+            ops.append(_text(x, cell_y, cell))
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_pdf(path: str, pages: List[Tuple[List[str], List[Tuple[str, str, str, str]]]]):
+    """Write a PDF with one ruled results table (plus header lines) per page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for header, rows in pages:
+        stream = _page_stream(header, rows)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _analyte_rows(reference_ranges: Dict, count: int, rng: random.Random) -> List[Tuple[str, str, str, str]]:
+    """Random analytes with values spread around (and sometimes outside) their reference ranges"""
+    candidates = []
+    for term, ranges in reference_ranges.items():
+        entry = next(iter(ranges.values()))
+        band = entry[-1] if isinstance(entry, list) else entry
+        if band["unit"] not in ("", "titer"):
+            candidates.append((term, band))
+
+    rows = []
+    for term, band in rng.choices(candidates, k=count):
+        low, high = band["min"], band["max"]
+        value = rng.uniform(low * 0.7, high * 1.3 if high else 1)
+        unit = band["unit"].replace("μ", "u").replace("µ", "u")
+        rows.append((term, f"{value:.1f}", unit, f"{low}-{high}"))
+    return rows
+
+
+def generate_reports(
+    out_dir: str,
+    pages: List[int],
+    analytes: int,
+    per_size: int = 1,
+    seed: int = 0,
+    reference_path: str = "data/reference_ranges.json"
+) -> List[Dict]:
+    """Write ``per_size`` reports for every page count; returns their paths, sizes and row counts"""
+    with open(reference_path) as f:
+        reference_ranges = json.load(f)
+
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    reports = []
+    for page_count in pages:
+        for i in range(per_size):
+            age = rng.randint(18, 85)
+            sex = rng.choice(["Male", "Female"])
+            header = [
+                "Synthetic Diagnostics Laboratory",
+                f"Patient Name: Test Patient {page_count}-{i}    Age: {age} Years    Sex: {sex}",
+                "Sample: Blood    Ref By: Dr. Example",
+            ]
+            report_pages = [
+                (header, _analyte_rows(reference_ranges, min(analytes, ROWS_PER_PAGE), rng))
+                for _ in range(page_count)
+            ]
+            path = os.path.join(out_dir, f"report_{page_count}p_{i}.pdf")
+            write_pdf(path, report_pages)
+            reports.append({
+                "path": path,
+                "pages": page_count,
+                "rows": sum(len(rows) for _, rows in report_pages),
+                "bytes": os.path.getsize(path),
+            })
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--analytes", type=int, default=25, help=f"Result rows per page (max {ROWS_PER_PAGE})")
+    parser.add_argument("--per-size", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for report in generate_reports(args.out_dir, args.pages, args.analytes, args.per_size, args.seed):
+        print(f"{report['path']}: {report['pages']} pages, {report['rows']} rows, {report['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
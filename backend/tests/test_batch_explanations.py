@@ -0,0 +1,51 @@
+from app.rag_pipeline import MedicalRAGPipeline
+
+parse = MedicalRAGPipeline._parse_batch_response
+
+TERMS = ["Hemoglobin", "WBC", "Vitamin D"]
+
+
+def test_json_answer_maps_onto_requested_terms():
+    answer = '{"hemoglobin": " Carries oxygen. ", "WBC": "Fights infection.", "Vitamin D ": "Helps bones."}'
+    assert parse(answer, TERMS) == {
+        "Hemoglobin": "Carries oxygen.",
+        "WBC": "Fights infection.",
+        "Vitamin D": "Helps bones.",
+    }
+
+
+def test_json_inside_a_code_fence_or_prose_is_found():
+    fenced = '```json\n{"Hemoglobin": "Carries oxygen."}\n```'
+    assert parse(fenced, TERMS) == {"Hemoglobin": "Carries oxygen."}
+    chatty = 'Here are the explanations:\n{"WBC": "Fights infection."}\nHope this helps!'
+    assert parse(chatty, TERMS) == {"WBC": "Fights infection."}
+
+
+def test_unrequested_and_empty_json_entries_are_dropped():
+    answer = '{"Hemoglobin": "", "Platelets": "Help clotting.", "WBC": 12, "Vitamin D": "Helps bones."}'
+    assert parse(answer, TERMS) == {"Vitamin D": "Helps bones."}
+
+
+def test_numbered_list_answer_is_parsed_when_json_is_missing():
+    answer = (
+        "1. Hemoglobin: Carries oxygen.\n"
+        "2) **WBC**: Fights infection.\n"
+        "Vitamin D: Helps bones.\n"
+        "Note: consult your doctor."
+    )
+    assert parse(answer, TERMS) == {
+        "Hemoglobin": "Carries oxygen.",
+        "WBC": "Fights infection.",
+        "Vitamin D": "Helps bones.",
+    }
+
+
+def test_first_numbered_line_per_term_wins():
+    answer = "1. WBC: Fights infection.\n2. WBC: Something else."
+    assert parse(answer, TERMS) == {"WBC": "Fights infection."}
+
+
+def test_unparseable_answer_yields_nothing():
+    # Missing terms fall back to single-term calls, so nothing is invented here
+    assert parse("Sorry, I can't help with that.", TERMS) == {}
+    assert parse('{"Hemoglobin": "unterminated', TERMS) == {}
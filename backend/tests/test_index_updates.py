@@ -0,0 +1,117 @@
+import hashlib
+import multiprocessing
+import os
+
+import faiss
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import app.embeddings
+from app.ann_index import INDEX_TYPES, read_index_mapped
+from app.config import Settings
+from app.rag_pipeline import MedicalRAGPipeline
+
+DIM = 32
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic, well-separated vectors so each chunk is its own nearest neighbour"""
+
+    def _vector(self, text: str):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def _documents(ids):
+    return {f"doc{i}": f"Document {i} about analyte number {i}." for i in ids}
+
+
+def _settings(path, index_type="flat"):
+    return Settings(
+        _env_file=None,
+        VECTOR_DB_PATH=path,
+        INDEX_TYPE=index_type,
+        INDEX_PQ_M=8,
+        INDEX_PQ_BITS=4,
+        LLM_PROVIDER="fake",
+        EXPLANATION_CACHE_ENABLED=False,
+        QUERY_CACHE_ENABLED=False,
+    )
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_delete_then_add_keeps_ids_aligned(index_type, tmp_path, monkeypatch):
+    monkeypatch.setattr(app.embeddings, "create_local_embeddings", lambda config, backend=None: HashEmbeddings())
+    pipeline = MedicalRAGPipeline(_settings(str(tmp_path / "index"), index_type))
+    pipeline.update_knowledge_base(_documents(range(200)))
+
+    # Remove ten documents, then add five new ones
+    documents = _documents(list(range(10, 200)) + list(range(200, 205)))
+    pipeline.update_knowledge_base(documents)
+
+    store = pipeline.vector_store
+    assert store.index.ntotal == len(documents)
+    embeddings = HashEmbeddings()
+    hits = sum(
+        store.similarity_search_by_vector(embeddings.embed_query(text), k=1)[0].page_content == text
+        for text in documents.values()
+    )
+    # IVF-PQ and HNSW are approximate; a misaligned id map gets nearly every query wrong
+    assert hits >= 0.95 * len(documents)
+
+
+def _update_in_worker(path, ids, results):
+    pipeline = MedicalRAGPipeline(_settings(path))
+    results.put(pipeline.update_knowledge_base(_documents(ids))["mode"])
+
+
+def test_concurrent_updates_from_several_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(app.embeddings, "create_local_embeddings", lambda config, backend=None: HashEmbeddings())
+    path = str(tmp_path / "index")
+    MedicalRAGPipeline(_settings(path)).update_knowledge_base(_documents(range(50)))
+
+    # Every worker handling /knowledge/reload at once: they must take turns on the index directory
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_update_in_worker, args=(path, range(5, 60), results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    assert sorted(results.get() for _ in workers) == ["incremental", "unchanged", "unchanged", "unchanged"]
+
+    pipeline = MedicalRAGPipeline(_settings(path))
+    pipeline.load_knowledge_base()
+    assert pipeline.vector_store.index.ntotal == 55
+
+
+def _anonymous_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon"):
+                return int(line.split()[1]) / 1024
+
+
+@pytest.mark.skipif(not hasattr(faiss, "IO_FLAG_MMAP_IFC"), reason="faiss build can't map flat or HNSW indexes")
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_served_index_is_mapped_not_copied(index_type, tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((40000, 256)).astype(np.float32)
+    index = faiss.IndexFlatL2(256) if index_type == "flat" else faiss.IndexHNSWFlat(256, 8)
+    index.add(vectors[:40000 if index_type == "flat" else 5000])
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(index, path)
+    del index, vectors
+
+    before = _anonymous_rss_mb()
+    mapped = read_index_mapped(path)
+    mapped.search(np.zeros((1, 256), dtype=np.float32), 1)
+    # Worker processes share the mapped pages; a heap copy would be the size of the file
+    assert _anonymous_rss_mb() - before < os.path.getsize(path) / 2 ** 20 / 4
@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.value_analyzer import ReferenceTable, _select_range
+
+REFERENCE_RANGES = os.path.join(os.path.dirname(__file__), "..", "data", "reference_ranges.json")
+
+# Inclusive, touching and overlapping bands, an adult band without bounds, and shared ranges
+SYNTHETIC = {
+    "Banded": {
+        "male": [
+            {"min": 10, "max": 20, "unit": "u", "max_age": 1},
+            {"min": 11, "max": 21, "unit": "u", "min_age": 1, "max_age": 12},
+            {"min": 12, "max": 22, "unit": "u", "min_age": 10, "max_age": 17.5},
+            {"min": 13, "max": 23, "unit": "u"},
+        ],
+        "female": {"min": 5, "max": 15, "unit": "u"},
+    },
+    "ChildOnly": {
+        "default": [
+            {"min": 1, "max": 2, "unit": "u", "min_age": 0, "max_age": 5},
+            {"min": 3, "max": 4, "unit": "u", "min_age": 6, "max_age": 18},
+        ],
+    },
+    "Flat": {"all": {"min": 0, "max": 100, "unit": "u"}},
+}
+
+AGES = [None, -1, 0, 0.5, 1, 1.5, 5, 5.5, 6, 10, 12, 12.01, 17.5, 18, 40, 120]
+GENDERS = [None, "male", "Female", "FEMALE", "other", ""]
+
+
+@pytest.mark.parametrize("age, expected_min", [
+    (0.2, 10),
+    (1, 10),        # bounds are inclusive and the first matching band wins
+    (1.01, 11),
+    (11, 11),       # overlapping bands: the earlier one wins
+    (12.5, 12),
+    (17.5, 12),
+    (17.6, 13),
+    (None, 13),     # unknown age: the band without age bounds
+])
+def test_age_band_selection(age, expected_min):
+    assert _select_range(SYNTHETIC["Banded"], "male", age)["min"] == expected_min
+
+
+def test_gender_fallbacks():
+    assert _select_range(SYNTHETIC["Banded"], "Female", 3)["min"] == 5
+    # An unknown or missing gender falls back to the female range before the male one
+    assert _select_range(SYNTHETIC["Banded"], "other", 3)["min"] == 5
+    assert _select_range(SYNTHETIC["Flat"], "male", 3)["max"] == 100
+
+
+def test_bands_without_an_adult_range_fall_back_to_the_last_band():
+    assert _select_range(SYNTHETIC["ChildOnly"], None, 5.5)["min"] == 3
+    assert _select_range(SYNTHETIC["ChildOnly"], None, None)["min"] == 3
+    assert _select_range(SYNTHETIC["ChildOnly"], None, 3)["min"] == 1
+
+
+def _assert_table_matches_select_range(reference_ranges):
+    table = ReferenceTable(reference_ranges)
+    cases = [(term, gender, age) for term in reference_ranges for gender in GENDERS for age in AGES]
+    terms = [term for term, _, _ in cases]
+    genders = [gender for _, gender, _ in cases]
+    ages = [np.nan if age is None else age for _, _, age in cases]
+
+    evaluation = table.evaluate(terms, np.zeros(len(cases)), genders, ages)
+    for i, (term, gender, age) in enumerate(cases):
+        expected = _select_range(reference_ranges[term], gender, age)
+        assert (evaluation['low'][i], evaluation['high'][i]) == (expected['min'], expected['max']), (term, gender, age)
+        single = table.result(term, expected['min'], gender, age)
+        assert single['reference_range'] == f'{expected["min"]}-{expected["max"]} {expected["unit"]}', (term, gender, age)
+
+
+def test_vectorized_and_single_lookups_agree_with_select_range():
+    _assert_table_matches_select_range(SYNTHETIC)
+
+
+def test_shipped_reference_ranges_compile_consistently():
+    with open(REFERENCE_RANGES) as f:
+        _assert_table_matches_select_range(json.load(f))
+
+
+def test_status_against_the_selected_band():
+    table = ReferenceTable(SYNTHETIC)
+    evaluation = table.evaluate(["Banded"] * 3 + ["Unknown"], [10.5, 10.5, 30, 1], "male", [0.5, 40, 40, 40])
+    assert evaluation['status'].tolist() == [1, 0, 2, -1]
+    assert evaluation['is_abnormal'].tolist() == [False, True, True, False]
+    assert table.result("Unknown", 1)['status'] == 'unknown'
@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from app.resilience import BudgetExhausted, CircuitBreaker, CircuitOpen, LLMGuard, request_budget
+
+
+def test_call_sync_stops_waiting_after_the_timeout():
+    guard = LLMGuard(timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        guard.call_sync(lambda: time.sleep(2))
+    assert time.monotonic() - start < 1
+
+
+def test_call_sync_stays_within_the_request_budget():
+    guard = LLMGuard(timeout=10)
+    with request_budget(0.1) as budget:
+        with pytest.raises(BudgetExhausted):
+            guard.call_sync(lambda: time.sleep(2))
+    assert budget.degraded
+
+
+def test_late_failures_do_not_extend_the_open_window():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.2)
+    breaker.record_failure()
+    breaker.record_failure()
+    opened_at = breaker.opened_at
+    time.sleep(0.05)
+    # A call admitted before the circuit opened fails afterwards
+    breaker.record_failure()
+    assert breaker.opened_at == opened_at
+    assert breaker.times_opened == 1
+
+
+def test_breaker_opens_then_lets_one_trial_call_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.1)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial at a time; a trial that ends without a verdict is given back
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_failed_trial_call_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.1)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow()
+
+
+def test_zero_threshold_disables_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=0, reset_seconds=60)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+class Flaky:
+    """Fails the first ``failures`` calls, then returns "ok" """
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError(f"failure {self.calls}")
+        return "ok"
+
+
+def test_retries_transient_failures():
+    request = Flaky(failures=2)
+    guard = LLMGuard(max_retries=2, backoff_base=0.01)
+    assert guard.call_sync(request) == "ok"
+    assert request.calls == 3
+
+    async def arequest():
+        return request()
+
+    request.calls = 0
+    assert asyncio.run(guard.call(arequest)) == "ok"
+    assert request.calls == 3
+
+
+def test_gives_up_after_the_last_retry_and_opens_the_breaker():
+    request = Flaky(failures=10)
+    guard = LLMGuard(max_retries=2, backoff_base=0.01, breaker=CircuitBreaker(failure_threshold=3, reset_seconds=60))
+    with request_budget(10) as budget:
+        with pytest.raises(ConnectionError, match="failure 3"):
+            guard.call_sync(request)
+    assert budget.degraded
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+    # While open, calls fail fast without reaching the provider
+    with pytest.raises(CircuitOpen):
+        guard.call_sync(request)
+    assert request.calls == 3
+
+
+def test_hedged_copy_wins_when_the_first_call_stalls():
+    guard = LLMGuard(hedge_delay=0.05)
+    delays = [1.0, 0.0]
+
+    async def request():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return f"answered after {delay}s"
+
+    start = time.monotonic()
+    assert asyncio.run(guard.call(request)) == "answered after 0.0s"
+    assert time.monotonic() - start < 0.5
+    assert not delays
+
+
+def test_hedged_copy_wins_when_the_first_call_fails():
+    guard = LLMGuard(hedge_delay=0.05)
+    outcomes = [ConnectionError("first copy"), "second copy"]
+
+    async def request():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            await asyncio.sleep(0.1)
+            raise outcome
+        await asyncio.sleep(0.2)
+        return outcome
+
+    assert asyncio.run(guard.call(request)) == "second copy"
+
+
+def test_fast_calls_are_not_hedged():
+    guard = LLMGuard(hedge_delay=0.5)
+    request = Flaky(failures=0)
+
+    async def arequest():
+        return request()
+
+    assert asyncio.run(guard.call(arequest)) == "ok"
+    assert request.calls == 1
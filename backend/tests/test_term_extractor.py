@@ -0,0 +1,68 @@
+import random
+import re
+
+import pytest
+
+from app.pdf_processor import PDFProcessor
+from app.term_extractor import TermExtractor
+
+processor = PDFProcessor()
+
+REPORTS = [
+    "",
+    "No recognised analytes here.",
+    "Haemoglobin 13.1 g/dL 12-20 g/dL (0-1Month) Total WBC Count 9800 Cells/cumm",
+    "Mean Corpuscular Hemoglobin Concentration 33.2 g/dL MCH 29 pg MCV 88 fL",
+    "HbA1c 6.1 % Glycated Hemoglobin, Fasting Blood Sugar 104 mg/dL",
+    "Widal Test: S.Typhi O 1:80, Salmonella Typhi H 1:160",
+    "Serum Sodium 139 mmol/L, Na+ K 4.2 Cl 101 Ca 9.4 mg/dL",
+    "Kidney Kalium CAT sodiumchloride: none of these are whole-word matches",
+    "tsh 2.1 uIU/mL free t4 1.2 ng/dL triiodothyronine 110 ng/dL",
+    "Platelet Count 250000 /cumm, Platelets clumped, MPV 9.1 fL, RDW 13 %",
+    "LDL 130 mg/dL (Bad Cholesterol) HDL 45 VLDL 25 Total Cholesterol 200 Triglycerides 150",
+    "Vitamin B12 400 pg/mL 25-OH Vitamin D 30 ng/mL Ferritin 80 Serum Iron 90 Fe",
+]
+
+
+def _vocabulary():
+    words = []
+    for pattern in PDFProcessor.MEDICAL_PATTERNS.values():
+        words.extend(alias.replace('\\.', '.') for alias in pattern[3:-3].split('|'))
+    return words + ["12.5", "g/dL", "mg/dL", "%", "result", "range", "(", ")", ":", "-", "Kal", "Nat", "sodiumX"]
+
+
+@pytest.mark.parametrize("text", REPORTS)
+def test_single_scan_matches_per_pattern_scan(text):
+    assert processor.extract_medical_terms(text) == processor._extract_medical_terms_per_pattern(text)
+
+
+def test_single_scan_matches_per_pattern_scan_on_random_reports():
+    words = _vocabulary()
+    rng = random.Random(0)
+    for _ in range(300):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 80)))
+        # Vary the case and spacing the way PDF text extraction does
+        text = "".join(c.upper() if rng.random() < 0.1 else c for c in text).replace("  ", rng.choice([" ", "\n", "  "]))
+        assert processor.extract_medical_terms(text) == processor._extract_medical_terms_per_pattern(text), text
+
+
+def test_first_match_spans_agree_with_re_search():
+    text = "The MCHC was normal; MCH 29 pg and Mean Corpuscular Hemoglobin Concentration 33"
+    found = processor.term_extractor.find_first_matches(text)
+    for term, pattern in PDFProcessor.MEDICAL_PATTERNS.items():
+        match = re.search(pattern, text, re.IGNORECASE)
+        assert found.get(term) == (match.span() if match else None)
+
+
+def test_patterns_outside_the_alias_form_are_rejected():
+    with pytest.raises(ValueError):
+        TermExtractor({"Glucose": r"Glucose\s+\d+"})
+
+
+def test_table_rows_take_the_longest_matching_term():
+    rows = [
+        {'test': 'Mean Corpuscular Hemoglobin Concentration', 'value': '33.2', 'unit': 'g/dL', 'reference_range': '32-36'},
+        {'test': 'Haemoglobin', 'value': '13.1', 'unit': 'g/dL', 'reference_range': '12-20'},
+        {'test': 'Comments', 'value': '1', 'unit': '', 'reference_range': ''},
+    ]
+    assert [term['term'] for term in processor.terms_from_rows(rows)] == ['MCHC', 'Hemoglobin']
@@ -0,0 +1,69 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.units import UnitRegistry, normalize_unit
+
+REFERENCE_RANGES = os.path.join(os.path.dirname(__file__), "..", "data", "reference_ranges.json")
+
+
+@pytest.fixture(scope="module")
+def registry():
+    with open(REFERENCE_RANGES) as f:
+        return UnitRegistry(json.load(f))
+
+
+@pytest.mark.parametrize("term, value, unit, expected", [
+    ("Glucose", 5.5, "mmol/L", 99.09),
+    ("Hemoglobin", 135, "g/L", 13.5),
+    ("Hemoglobin", 13.5, "gm%", 13.5),
+    ("HbA1c", 48, "mmol/mol", 6.543),
+    ("Platelets", 2.5, "lakhs/cumm", 250),
+    ("Platelets", 250000, "Cells/cumm", 250),
+    ("WBC", 7.2, "10^9/L", 7.2),
+    ("RBC", 4.8, "10^12/L", 4.8),
+    ("Creatinine", 88.4, "µmol/L", 1.0),
+    ("Sodium", 140, "mmol/L", 140),
+    ("Calcium", 2.5, "mmol/L", 10.02),
+    ("T4", 100, "nmol/L", 7.77),
+    ("TSH", 2.5, "µIU/mL", 2.5),
+    ("TSH", 0.0025, "mIU/mL", 2.5),
+    ("TSH", 2.5e-6, "IU/mL", 2.5),
+])
+def test_converts_to_the_reference_unit(registry, term, value, unit, expected):
+    assert registry.convert_value(term, value, unit) == pytest.approx(expected, rel=1e-3)
+    converted, compatible = registry.convert([term], np.array([value]), [unit])
+    assert converted[0] == pytest.approx(expected, rel=1e-3)
+    assert compatible[0]
+
+
+@pytest.mark.parametrize("term, value, unit", [
+    # Labelled cells/cumm but really 10^3/uL: converting would give an impossible 0.386
+    ("Platelets", 386, "Cells/cumm"),
+    # g/dL misread as mg/dL
+    ("Hemoglobin", 14.2, "mg/dL"),
+])
+def test_implausible_conversions_keep_the_extracted_value(registry, term, value, unit):
+    assert registry.convert_value(term, value, unit) == value
+    converted, _ = registry.convert([term], np.array([value]), [unit])
+    assert converted[0] == value
+
+
+def test_incompatible_and_unknown_units(registry):
+    converted, compatible = registry.convert(["ALT", "Glucose"], np.array([30.0, 95.0]), ["mg/dL", "furlongs"])
+    assert list(converted) == [30.0, 95.0]
+    # No bridge from enzyme activity to mass; an unknown spelling is compared as extracted
+    assert list(compatible) == [False, True]
+
+
+@pytest.mark.parametrize("raw, canonical", [
+    ("Cells/cumm", "/ul"),
+    ("x10^3/µL", "10^3/ul"),
+    ("gm/dl", "g/dl"),
+    ("mm/1st hr", "mm/hr"),
+    ("µIU/mL", "miu/l"),
+])
+def test_normalize_unit(raw, canonical):
+    assert normalize_unit(raw) == canonical